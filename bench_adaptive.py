@@ -0,0 +1,79 @@
+"""おまかせモードの出題候補の選択と推定値の更新の所要時間を計測する (ディスプレイ不要)
+
+擬似問題のバンクを作り、シミュレーションのプレイヤー (真の能力が分かっている) に
+回答させながら、1問の選択 (pick) と回答の反映 (record) にかかる時間を測る。
+
+    python bench_adaptive.py --questions 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from quiz_adaptive import AdaptiveSelector, ItemIndex, probability
+from quiz_bank import QuizBank, question_id, write_bank
+
+DIFFICULTIES = ["初級", "中級", "上級"]
+
+
+def make_records(count, genres, seed=0):
+    """(ジャンル, 難易度, 問題) の擬似問題を作る"""
+    rng = random.Random(seed)
+    for i in range(count):
+        genre, difficulty = f"ジャンル{i % genres}", DIFFICULTIES[i // genres % len(DIFFICULTIES)]
+        quiz = {"type": "choice", "question": f"問題 {i}", "choices": ["1. はい", "2. いいえ"],
+                "correct_choice_index": rng.randrange(2)}
+        quiz["id"] = question_id(genre, difficulty, quiz)
+        yield genre, difficulty, quiz
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    print(f"{label:<10}  p50 {statistics.median(samples):6.3f} ms  "
+          f"p99 {samples[int(len(samples) * 0.99)]:6.3f} ms  max {samples[-1]:6.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=100000)
+    parser.add_argument("--genres", type=int, default=20)
+    parser.add_argument("--answers", type=int, default=2000, help="シミュレーションで回答する数")
+    parser.add_argument("--ability", type=float, default=1.5, help="シミュレーションのプレイヤーの真の能力")
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as directory:
+        bank_path = os.path.join(directory, "bench.bank")
+        write_bank(make_records(args.questions, args.genres), bank_path, [])
+        bank = QuizBank(bank_path)
+        start = time.perf_counter()
+        index = ItemIndex(bank).build()
+        print(f"索引        {len(index)} 問 {(time.perf_counter() - start) * 1000:7.0f} ms")
+
+        # 問題の真の難しさは、区分の初期値のまわりにばらつかせる
+        true_difficulty = [index.difficulty[item] + rng.gauss(0, 0.5) for item in range(len(index))]
+        selector = AdaptiveSelector(index, length=args.answers, rng=rng)
+        picks, records = [], []
+        for n in range(args.answers):
+            start = time.perf_counter()
+            item = selector.pick()
+            picks.append((time.perf_counter() - start) * 1000)
+            if item is None:
+                break
+            selector._asked.add(item)
+            quiz = index.question(item)
+            is_correct = rng.random() < probability(args.ability, true_difficulty[item])
+            start = time.perf_counter()
+            selector.record(quiz, is_correct)
+            records.append((time.perf_counter() - start) * 1000)
+            if n + 1 in (10, 20, 50, 100, args.answers):
+                print(f"{n + 1:5} 問回答後の能力の推定値 {selector.ability:+.2f} (真の値 {args.ability:+.2f})")
+        report("選択", picks)
+        report("推定値の更新", records)
+        bank.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""画面遷移のレイテンシを、フレーム使い回しと毎回作り直す方式とで比較する
+(結果画面の表示中に次の問題を先読みした場合の「次へ」の所要時間もあわせて計測する)
+
+ディスプレイ (Xvfb など) のある環境で実行する。recreate が変更前の方式、pooled が使い回し:
+    python bench_frames.py --rounds 200
+    xvfb-run -a python bench_frames.py --rounds 200    # ディスプレイのないサーバーの場合
+"""
+import argparse
+import statistics
+import sys
+import time
+import tkinter as tk
+
+import kanzi
+from quiz_session import QuizSession, endless
+
+
+def legacy_switch(app, frame_class_name, **kwargs):
+    """変更前と同じく、毎回フレームを破棄して作り直す"""
+    for frame in app._frames.values():
+        frame.destroy()
+    app._frames.clear()
+    app._frame = None
+    app.switch_frame(frame_class_name, **kwargs)
+
+
+def run_transitions(app, switch, rounds):
+    """問題画面と結果画面を交互に表示し、1遷移ごとの所要時間(ms)を返す"""
+    genre = app.bank.genres()[0]
+    difficulty = app.bank.difficulties(genre)[0]
+    section = app.bank.section(genre, difficulty)
+    app.session = QuizSession(lambda: endless(section))
+    result_info = {"is_correct": False, "player_answer": "x", "correct_answer": "y"}
+
+    samples = []
+    for _ in range(rounds):
+        app.session.advance()
+        for name, kwargs in (("QuizFrame", {}), ("ResultFrame", {"result_info": result_info})):
+            start = time.perf_counter()
+            switch(app, name, **kwargs)
+            app.update_idletasks() # ジオメトリ計算と描画までを計測に含める
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run_prefetched(app, rounds):
+    """結果画面の表示中に先読みさせてから「次へ」を押し、問題画面への遷移時間(ms)を返す"""
+    genre = app.bank.genres()[0]
+    difficulty = app.bank.difficulties(genre)[0]
+    section = app.bank.section(genre, difficulty)
+    app.session = QuizSession(lambda: endless(section))
+    result_info = {"is_correct": False, "player_answer": "x", "correct_answer": "y"}
+
+    samples = []
+    app.switch_frame("QuizFrame")
+    for _ in range(rounds):
+        app.switch_frame("ResultFrame", result_info=result_info)
+        app.update() # 結果画面を読んでいる間の空き時間 (ここで先読みが進む)
+        start = time.perf_counter()
+        app.next_question()
+        app.update_idletasks()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"{label:<11} mean {statistics.mean(samples):7.3f} ms  "
+          f"p50 {statistics.median(samples):7.3f} ms  p99 {p99:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    try:
+        app = kanzi.QuizApp().finish_startup()
+    except tk.TclError as e:
+        sys.exit(f"ディスプレイに接続できません ({e})。xvfb-run -a で実行してください")
+    app.update()
+    try:
+        report("recreate", run_transitions(app, legacy_switch, args.rounds))
+        report("pooled", run_transitions(app, kanzi.QuizApp.switch_frame, args.rounds))
+        report("prefetched", run_prefetched(app, args.rounds))
+    finally:
+        app.destroy()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""問題1問あたりのメモリ使用量を、dict のままの場合と Question に変換した場合とで比較する
+
+バンクのレコードと同じ JSON から擬似問題を作り、tracemalloc で確保量を測る。
+既定では問題文・選択肢・正解をすべて別々の文字列にする (実際の問題ファイルに近く、共有による節約は小さい)。
+--shared では選択肢と正解を小さな語彙から選び、同じ文字列の共有が効く場合を測る。
+
+    python bench_memory.py --questions 300000
+    python bench_memory.py --questions 300000 --shared
+"""
+import argparse
+import json
+import random
+import string
+import tracemalloc
+
+from quiz_model import Question, QuestionTable
+from quiz_normalize import build_answer_keys
+
+WORDS = ["CPU", "GPU", "RAM", "HTML", "CSS", "Python", "HTTP", "FTP", "SMTP", "SQL", "DNS", "IP",
+         "リスト", "タプル", "辞書", "集合", "関数", "変数", "クラス", "メソッド"]
+
+
+def random_word(rng, low=3, high=12):
+    """他と重ならない語の代わりに使う、英字とかなの混じった文字列"""
+    letters = string.ascii_letters + "あいうえおかきくけこさしすせそたちつてとなにぬねのリストタプル"
+    return "".join(rng.choice(letters) for _ in range(rng.randint(low, high)))
+
+
+def make_records(count, shared=False, seed=0):
+    """バンクのレコードと同じ形式の JSON 文字列を作る (選択式と記述式が半々)"""
+    rng = random.Random(seed)
+    word = (lambda: rng.choice(WORDS)) if shared else (lambda: random_word(rng))
+    records = []
+    for i in range(count):
+        quiz = {"id": f"{rng.getrandbits(64):016x}",
+                "question": f"問題 {i}: {random_word(rng, 10, 40)} について正しいものはどれですか？"}
+        if i % 2 == 0:
+            quiz["type"] = "choice"
+            quiz["choices"] = [f"{n + 1}. {word()}" for n in range(3)]
+            quiz["correct_choice_index"] = rng.randrange(3)
+        else:
+            quiz["type"] = "fill_in"
+            quiz["answer"] = word()
+        records.append(json.dumps(quiz, ensure_ascii=False))
+    return records
+
+
+def decode_dict(record, genre, difficulty, table):
+    """変更前と同じく、dict のまま正解集合を付ける"""
+    quiz = json.loads(record)
+    if quiz["type"] == "fill_in":
+        quiz["answer_keys"] = build_answer_keys([quiz["answer"], *quiz.get("aliases", ())])
+    return quiz
+
+
+def decode_question(record, genre, difficulty, table):
+    return Question.from_dict(json.loads(record), genre, difficulty, table)
+
+
+def measure(decode, records):
+    """全レコードをデコードして保持したときの確保量 (バイト)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    table = QuestionTable()   # バンクの1区間と同じく、全問題で1つの表を共有する
+    questions = [decode(record, "ジャンル", "初級", table) for record in records]
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del questions, table
+    return used
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=300000)
+    parser.add_argument("--shared", action="store_true", help="選択肢と正解を小さな語彙から選ぶ")
+    args = parser.parse_args()
+
+    records = make_records(args.questions, args.shared)
+    for label, decode in (("dict", decode_dict), ("Question", decode_question)):
+        used = measure(decode, records)
+        print(f"{label:<9} {used / 2**20:8.1f} MiB  {used / args.questions:6.0f} B/問")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""成績の保存先に大量の成績を入れて、記録とランキングの取り出しの所要時間を計測する
+
+    python bench_scores.py --sessions 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from quiz_scores import ScoreStore
+
+MODES = ["通常", "エンドレス", "タイムアタック"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=1000000)
+    parser.add_argument("--boards", type=int, default=30, help="ジャンル・難易度の組の数")
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    keys = [(f"ジャンル{i // 3}", f"難易度{i % 3}", rng.choice(MODES)) for i in range(args.boards)]
+    with tempfile.TemporaryDirectory() as directory:
+        store = ScoreStore(os.path.join(directory, "scores.db"), batch_size=10000)
+        start = time.perf_counter()
+        futures = []
+        for _ in range(args.sessions):
+            answered = rng.randint(5, 30)
+            futures.append(store.record(*rng.choice(keys), answered, rng.randint(0, answered),
+                                        rng.randint(5000, 300000)))
+            if len(futures) >= 100000:
+                futures[-1].result()
+                futures.clear()
+        if futures:
+            futures[-1].result()
+        elapsed = time.perf_counter() - start
+        print(f"記録        {args.sessions} 件 {elapsed:6.1f} 秒 ({args.sessions / elapsed:,.0f} 件/秒)")
+
+        for label, query in (("ランキング", lambda key: store.leaderboard(*key, limit=10)),
+                             ("集計", lambda key: store.stats(*key))):
+            samples = []
+            for _ in range(args.queries):
+                key = rng.choice(keys)
+                start = time.perf_counter()
+                query(key)
+                samples.append((time.perf_counter() - start) * 1000)
+            samples.sort()
+            print(f"{label:<10}  p50 {statistics.median(samples):6.3f} ms  "
+                  f"p99 {samples[int(len(samples) * 0.99)]:6.3f} ms")
+
+        one = store.record(*keys[0], 10, 10, 1000)
+        start = time.perf_counter()
+        one.result()
+        print(f"1件の記録の待ち時間  {(time.perf_counter() - start) * 1000:6.2f} ms")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""QuizSession の採点処理のスループットを計測する (ディスプレイ不要)
+
+    python bench_session.py --sessions 20000
+    python bench_session.py --save bench_session.json      # 基準値を保存
+    python bench_session.py --compare bench_session.json   # 基準値から劣化していれば終了コード 1
+"""
+import argparse
+import itertools
+import json
+import random
+import statistics
+import sys
+import time
+
+from quiz_model import Question, QuestionType
+from quiz_session import QuizSession
+
+
+def make_questions(count, seed=0):
+    """選択式と記述式が半々の擬似問題を作る"""
+    rng = random.Random(seed)
+    questions = []
+    for i in range(count):
+        if i % 2 == 0:
+            questions.append(Question(i, QuestionType.CHOICE, f"問題 {i}",
+                                      choices=[f"{n + 1}. 選択肢{n}" for n in range(3)],
+                                      correct_choice_index=rng.randrange(3)))
+        else:
+            questions.append(Question(i, QuestionType.FILL_IN, f"問題 {i}", answer=f"Answer{i}"))
+    return questions
+
+
+def make_answers(questions, seed=1):
+    """各問題に対する擬似的な回答 (半分ほど正解) を作る"""
+    rng = random.Random(seed)
+    answers = []
+    for quiz in questions:
+        if quiz.type is QuestionType.CHOICE:
+            answers.append(rng.randrange(len(quiz.choices)))
+        elif rng.random() < 0.5:
+            answers.append(f"  {quiz.answer.upper()} ")
+        else:
+            answers.append("wrong")
+    return answers
+
+
+def play(session, answers):
+    """セッションを最後まで解く"""
+    session.restart()
+    for answer in answers:
+        if isinstance(answer, int):
+            session.answer_choice(answer)
+        else:
+            session.answer_text(answer)
+        session.advance()
+
+
+def run(sessions, questions_per_session, latency_samples):
+    questions = make_questions(questions_per_session)
+    answers = make_answers(questions)
+    session = QuizSession(questions)
+
+    # スループット: セッションを丸ごと繰り返し解く
+    start = time.perf_counter()
+    for _ in range(sessions):
+        play(session, answers)
+    elapsed = time.perf_counter() - start
+    total_answers = sessions * questions_per_session
+
+    # 1回答あたりのレイテンシ: 問題を繰り返し出題しながら採点だけを個別に計測する
+    latencies = []
+    session = QuizSession(lambda: itertools.cycle(questions))
+    for answer in itertools.islice(itertools.cycle(answers), latency_samples):
+        t0 = time.perf_counter_ns()
+        if isinstance(answer, int):
+            session.answer_choice(answer)
+        else:
+            session.answer_text(answer)
+        latencies.append(time.perf_counter_ns() - t0)
+        session.advance()
+    latencies.sort()
+
+    return {
+        "sessions_per_s": sessions / elapsed,
+        "answers_per_s": total_answers / elapsed,
+        "answer_ns_mean": statistics.mean(latencies),
+        "answer_ns_p50": latencies[len(latencies) // 2],
+        "answer_ns_p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20000)
+    parser.add_argument("--questions", type=int, default=10, help="1セッションあたりの問題数")
+    parser.add_argument("--latency-samples", type=int, default=100000)
+    parser.add_argument("--save", metavar="FILE", help="結果を基準値として保存する")
+    parser.add_argument("--compare", metavar="FILE", help="保存済みの基準値と比較する")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="許容する劣化率 (既定: 20%%)")
+    args = parser.parse_args()
+
+    result = run(args.sessions, args.questions, args.latency_samples)
+    print(f"sessions/s  {result['sessions_per_s']:12.0f}")
+    print(f"answers/s   {result['answers_per_s']:12.0f}")
+    print(f"answer mean {result['answer_ns_mean']:10.0f} ns")
+    print(f"answer p50  {result['answer_ns_p50']:10.0f} ns")
+    print(f"answer p99  {result['answer_ns_p99']:10.0f} ns")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        limit = baseline["answers_per_s"] * (1 - args.tolerance)
+        if result["answers_per_s"] < limit:
+            print(f"劣化を検出: answers/s {result['answers_per_s']:.0f} < {limit:.0f}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""起動時間 (最初の描画まで・操作できるようになるまで) を計測する
+
+毎回新しいプロセスで QuizApp を起動し、プロセスを起動した時刻から
+「読み込み中」の画面を描いた時刻 (first paint) と、ジャンル選択画面を描いて
+操作を受け付けるようになった時刻 (interactive) までを測る。
+
+ディスプレイのない環境では --xvfb で Xvfb を起動して計測する:
+    python bench_startup.py --runs 20 --xvfb
+    python bench_startup.py --runs 20 --xvfb --cold   # ~/.kanzi (フォントのキャッシュなど) のない初回起動
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+XVFB_SCREEN = "1024x768x24"
+
+
+def child():
+    """計測される側: 起動して操作できるようになったら、節目の時刻を出力して終了する"""
+    import kanzi
+    app = kanzi.QuizApp()
+
+    def check():
+        if "interactive" in app.startup_times:
+            print(json.dumps(app.startup_times))
+            app.destroy()
+        else:
+            app.after(1, check)
+
+    app.after(1, check)
+    app.mainloop()
+
+
+def start_xvfb():
+    """空いているディスプレイ番号で Xvfb を起動し、(プロセス, DISPLAY) を返す"""
+    for number in range(99, 199):
+        if os.path.exists(f"/tmp/.X11-unix/X{number}") or os.path.exists(f"/tmp/.X{number}-lock"):
+            continue
+        process = subprocess.Popen(["Xvfb", f":{number}", "-screen", "0", XVFB_SCREEN, "-nolisten", "tcp"],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if os.path.exists(f"/tmp/.X11-unix/X{number}"):
+                return process, f":{number}"
+            if process.poll() is not None:
+                break
+            time.sleep(0.01)
+        process.kill()
+    raise RuntimeError("Xvfb を起動できませんでした")
+
+
+def run_once(env):
+    """1回起動して (first paint, interactive) をミリ秒で返す"""
+    start = time.time()
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"], env=env,
+                               capture_output=True, text=True, timeout=120)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip())
+    times = json.loads(completed.stdout.strip().splitlines()[-1])
+    return (times["first_paint"] - start) * 1000, (times["interactive"] - start) * 1000
+
+
+def report(label, samples):
+    samples = sorted(samples)
+    p90 = samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+    print(f"{label:<12} median {statistics.median(samples):7.1f} ms  p90 {p90:7.1f} ms  "
+          f"min {samples[0]:7.1f} ms  max {samples[-1]:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1, help="計測に含めない最初の起動の回数")
+    parser.add_argument("--xvfb", action="store_true", help="Xvfb を起動してその上で計測する")
+    parser.add_argument("--cold", action="store_true", help="毎回空のホームディレクトリで起動する")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    xvfb = None
+    env = dict(os.environ)
+    if args.xvfb:
+        xvfb, env["DISPLAY"] = start_xvfb()
+    try:
+        first_paint, interactive = [], []
+        for n in range(args.warmup + args.runs):
+            with tempfile.TemporaryDirectory() as home:
+                if args.cold:
+                    env["HOME"] = env["USERPROFILE"] = home
+                paint_ms, ready_ms = run_once(env)
+            if n >= args.warmup:
+                first_paint.append(paint_ms)
+                interactive.append(ready_ms)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+            xvfb.wait()
+    print(f"{args.runs} 回{' (cold)' if args.cold else ''}")
+    report("first paint", first_paint)
+    report("interactive", interactive)
+
+
+if __name__ == "__main__":
+    main()
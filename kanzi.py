@@ -1,6 +1,24 @@
+import logging
+import os
+import sys
+import time
 import tkinter as tk
+from functools import cached_property
 from tkinter import font as tkfont
-from tkinter import ttk  # OptionMenuのためにインポート
+
+from quiz_adaptive import AdaptiveSelector, ItemIndex, load_params, save_params
+from quiz_bank import BankError, SourceWatcher, open_bank, read_sections
+from quiz_fonts import load_fonts
+from quiz_index import NgramIndex, QuestionIndex
+from quiz_layout import TextLayout
+from quiz_media import MediaLoader
+from quiz_log import AnswerLog
+from quiz_metrics import LagMonitor, Metrics, NullMetrics
+from quiz_model import QuestionType
+from quiz_scheduler import SpacedRepetitionScheduler, load_state, save_state
+from quiz_session import QuizSession, endless
+
+logger = logging.getLogger("kanzi")
 
 # --- ゲーム設定 ---
 GAME_TITLE = "Tkinter 総合クイズ"
@@ -8,90 +26,61 @@ FONT_FAMILY = "Yu Gothic UI"
 FONT_SIZE_S = 12
 FONT_SIZE_M = 16
 FONT_SIZE_L = 24
+# 使用するフォントの希望順 (見つからなければ Tk の既定のフォントを使う)
+FONT_PREFERENCES = (FONT_FAMILY, "MisakiGothic", "美咲ゴシック", "MisakiGothic2nd", "美咲ゴシック第2", "MisakiMincho", "美咲明朝")
+FILL_IN_TYPO_TOLERANCE = 1 # 記述式で許容する打ち間違いの文字数 (0で完全一致のみ。keep_symbols の問題は常に完全一致)
+QUESTION_WRAP_LENGTH = 450 # 問題文を折り返す幅の初期値 (ウィンドウの大きさに合わせて変わる)
+QUESTION_TEXT_MARGIN = 10  # 問題画面の幅から差し引く余白
+RESIZE_DEBOUNCE_MS = 80    # ウィンドウの大きさの変更が落ち着いてから問題文を折り返し直すまでの待ち時間
 
 # --- クイズデータ ---
-# ジャンルと難易度で管理する新しいデータ構造
-ALL_QUIZZES = {
-    "プログラミング基礎": {
-        "初級": [
-            {
-                "type": "choice",
-                "question": "以下の３つの中で、主にwebページの装飾をする用途で用いられる言語は？",
-                "choices": ["1. Java", "2. CSS", "3. C#"],
-                "correct_choice_index": 1,
-            },
-            {
-                "type": "fill_in",
-                "question": "Pythonでリストの要素数を取得する関数は len() ですが、文字列の長さを取得する場合も同じ関数を使います。この関数 len は何の略でしょう？",
-                "answer": "length",
-            },
-            {
-                "type": "choice",
-                "question": "プログラミングにおいて、同じ処理を何度も繰り返す構造を何と呼びますか？",
-                "choices": ["1. 条件分岐", "2. ループ", "3. 変数"],
-                "correct_choice_index": 1,
-            },
-        ]
-    },
-    "プログラミング実践 (Python)": {
-        "未実装": [
-            {
-                "type": "fill_in",
-                "question": "あなたの名前と年齢をそれぞれnameとageという変数に代入し、print()関数を使って「（名前）さんの年齢は（年齢）歳です。」と表示するプログラムを作成してください。",
-                "answer": "with open",
-            },
-            {
-                "type": "fill_in",
-                "question": "リスト `numbers = [1, 2, 3, 4]` の各要素を2乗した新しいリストを作るための内包表記を記述してください。(例: [x ... for x in numbers])",
-                "answer": "[x**2 for x in numbers]",
-            },
-            {
-                "type": "fill_in",
-                "question": "クラスのインスタンスが作成されるときに、初期化のために自動的に呼び出されるメソッドは何ですか？ (アンダースコア4つで囲む)",
-                "answer": "__init__",
-            },
-        ]
-    },
-    "IT言語基礎": {
-        "初級": [
-            {
-                "type": "choice",
-                "question": "コンピュータの頭脳に相当する、中央処理装置をアルファベット3文字で何と呼びますか？",
-                "choices": ["1. GPU", "2. RAM", "3. CPU"],
-                "correct_choice_index": 2,
-            },
-            {
-                "type": "choice",
-                "question": "Webページを作成するために使われる、基本的なマークアップ言語は何ですか？",
-                "choices": ["1. HTML", "2. CSS", "3. Python"],
-                "correct_choice_index": 0,
-            },
-            {
-                "type": "fill_in",
-                "question": "インターネット上でコンピュータを識別するための、数字で構成された住所のようなものを何と呼びますか？ (○○アドレス)",
-                "answer": "IP",
-            },
-        ],
-        "中級": [
-            {
-                "type": "choice",
-                "question": "WebブラウザとWebサーバ間でデータをやり取りする際に使われる、主要なプロトコルは何ですか？",
-                "choices": ["1. FTP", "2. HTTP", "3. SMTP"],
-                "correct_choice_index": 1,
-            },
-            {
-                "type": "fill_in",
-                "question": "データベースを操作するための問い合わせ言語で、データの検索や更新に広く使われているものは何ですか？ (アルファベット3文字)",
-                "answer": "SQL",
-            },
-            {
-                "type": "fill_in",
-                "question": "DNSが担う主な役割は、ドメイン名と何を相互に変換することですか？ (○○アドレス)",
-                "answer": "IP",
-            },
-        ]
-    }
-}
+# 問題は quizzes/kanzi/ 以下の JSON / CSV で管理し、起動時にバンクファイルへコンパイルして読み込む
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUIZ_SOURCE_DIR = os.path.join(BASE_DIR, "quizzes", "kanzi")
+QUIZ_BANK_PATH = os.path.join(BASE_DIR, "quizzes", "kanzi.bank")
+# 問題に添える画像 (問題の "image" はこのフォルダからの相対パス)
+MEDIA_DIR = os.path.join(BASE_DIR, "quizzes", "media")
+IMAGE_MAX_SIZE = (480, 200)     # 問題画面に表示する画像の最大の大きさ (これを超える画像は縮小する)
+IMAGE_CACHE_BYTES = 32 << 20    # デコード済みの画像を保持する上限 (バイト)
+# 実行中も問題ファイルの変更を見張り、変わった区間だけを読み直す (ミリ秒ごとに確認)
+RELOAD_POLL_MS = 500
+STARTUP_POLL_MS = 10 # 起動時に問題バンクを開き終わるのを待つ間隔 (ミリ秒)
+
+# --- フォント ---
+# 同梱の美咲フォントを起動時に登録し、決定したフォントと寸法をキャッシュする
+FONT_FILES = [os.path.join(BASE_DIR, name)
+              for name in ("misaki_gothic.ttf", "misaki_gothic_2nd.ttf", "misaki_mincho.ttf")]
+
+# --- 学習記録 ---
+DATA_DIR = os.path.join(os.path.expanduser("~"), ".kanzi")
+REVIEW_STATE_PATH = os.path.join(DATA_DIR, "review.json") # 間隔反復の学習状態
+ANSWER_LOG_PATH = os.path.join(DATA_DIR, "answers.log")   # 回答イベントのログ
+FONT_CACHE_PATH = os.path.join(DATA_DIR, "fonts.json")     # 決定したフォント
+SCORE_DB_PATH = os.path.join(DATA_DIR, "scores.db")        # 終わったクイズの成績とランキング
+ADAPTIVE_STATE_PATH = os.path.join(DATA_DIR, "adaptive.json") # おまかせモードの能力と問題の難しさの推定値
+LEADERBOARD_SIZE = 5 # 最終結果画面に表示するランキングの件数
+SCORE_POLL_MS = 50     # 成績の書き込みが終わったかを確かめる間隔 (ミリ秒)
+SCORE_WAIT_MS = 5000   # 成績の書き込みを待つ上限 (これを過ぎたらランキングの表示をあきらめる)
+
+# --- 計測 ---
+# 環境変数 KANZI_METRICS=1 で起動すると、画面遷移・採点・描画の所要時間とイベントループの遅れを計測する。
+# F12 で計測結果を画面に重ねて表示し、終了時に METRICS_PATH へ書き出す
+METRICS_PATH = os.path.join(DATA_DIR, "metrics.txt")
+METRICS_OVERLAY_INTERVAL = 500 # 重ねて表示する計測結果の更新間隔 (ミリ秒)
+
+# --- 出題モード ---
+MODE_NORMAL = "通常"        # 区間の問題を順番に1回ずつ出題する
+MODE_ENDLESS = "エンドレス"  # 区間の問題を順番を入れ替えながら終わりなく出題する
+MODE_REVIEW = "復習"        # 間隔反復で、期限の来た問題・間違えた問題から出題する
+MODE_TIMED = "タイムアタック" # 区間の問題を制限時間つきで出題する
+MODE_ADAPTIVE = "おまかせ"   # 能力の推定値に合わせて、ジャンル全体 (またはバンク全体) から難しさを選んで出題する
+QUIZ_MODES = [MODE_NORMAL, MODE_ENDLESS, MODE_REVIEW, MODE_TIMED, MODE_ADAPTIVE]
+QUESTION_TIME_LIMIT = 20    # タイムアタックの1問あたりの制限時間 (秒)
+TOTAL_TIME_LIMIT = 180      # タイムアタックの回答時間の合計の上限 (秒)
+COUNTDOWN_STEP_NS = 100_000_000 # 残り時間の表示を更新する間隔 (0.1秒)
+ADAPTIVE_QUESTION_COUNT = 20 # おまかせモードの1回の出題数
+ALL_GENRES = "すべてのジャンル" # おまかせモードでバンク全体から出題するときのジャンルの項目
+ADAPTIVE_DIFFICULTY = "おまかせ" # おまかせモードの成績を記録するときの難易度の名前
 
 
 class QuizApp(tk.Tk):
@@ -103,44 +92,351 @@ class QuizApp(tk.Tk):
         self.geometry("600x450")
         self.minsize(500, 400)
 
-        # フォントオブジェクトを定義
-        self.title_font = tkfont.Font(family=FONT_FAMILY, size=FONT_SIZE_L, weight="bold")
-        self.question_font = tkfont.Font(family=FONT_FAMILY, size=FONT_SIZE_M)
-        self.result_font = tkfont.Font(family=FONT_FAMILY, size=FONT_SIZE_L, weight="bold")
-        self.default_font = tkfont.Font(family=FONT_FAMILY, size=FONT_SIZE_M)
-        self.small_font = tkfont.Font(family=FONT_FAMILY, size=FONT_SIZE_S)
-        
-        # --- 変更点: ttkウィジェットのスタイルを設定 ---
-        # これにより、OptionMenu (選択ボックス) の見た目を変更する
-        style = ttk.Style(self)
-        style.configure("TMenubutton", font=self.default_font, padding=5)
-
+        # 計測しないときは何も記録しない NullMetrics を使い、計測箇所の負担をなくす
+        if os.environ.get("KANZI_METRICS"):
+            self.metrics = Metrics()
+            self.lag_monitor = LagMonitor(self, self.metrics)
+            self.lag_monitor.start()
+            self.bind("<F12>", lambda event: self.toggle_metrics_overlay())
+        else:
+            self.metrics = NullMetrics()
+            self.lag_monitor = None
+        self._metrics_overlay = None
+        self._metrics_overlay_job = None
 
-        # クイズの状態を管理
-        self.selected_quiz_data = []
-        self.current_quiz_index = 0
-        self.wrong_answer_count = 0 
+        # クイズの状態を管理 (出題順と採点は QuizSession が受け持つ)
+        self.session = None
+        self.scheduler = None # 復習モードのときだけ使う
+        self.selector = None  # おまかせモードのときだけ使う
 
         # 選択されたジャンルと難易度を保持するための変数
         self.selected_genre = None
         self.selected_difficulty = None
+        self.selected_mode = MODE_NORMAL
 
+        # 問題文の折り返し位置のキャッシュ (問題画面どうしで共有する)
+        self.text_layout = TextLayout()
+        self.question_wrap_width = QUESTION_WRAP_LENGTH
 
+        # 一度生成したフレームはクラス名ごとに保持し、画面遷移では中身だけを差し替える
+        self._frames = {}
         self._frame = None
+        # 結果画面の表示中に次の問題を組み立てておく予備の問題画面と、その進行状況
+        self._spare_quiz_frame = None
+        self._prefetch_steps = None
+        self._prefetch_job = None
+        self._countdown_job = None
+        self._countdown_label = None
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
+
+        # 問題バンク・全文検索の索引・問題ファイルの見張りは、最初の画面を出してから用意する
+        self.bank = None
+        self.question_index = None
+        self._index_steps = None
+        self._index_job = None
+        self._reload_executor = None
+        self._reload_future = None
+        self._reload_job = None
+        # おまかせモードの出題候補の索引 (モードが選ばれたら空き時間に作る)
+        self.item_index = None
+        self._item_index_steps = None
+        self._item_index_job = None
+
+        # まず Tk の既定のフォントだけで「読み込み中」を描き、残りの準備は描いた後に少しずつ進める
+        self.ready = False
+        self.startup_error = None # 起動の準備に失敗したときの例外
+        self.startup_times = {} # 起動の節目の時刻 (time.time()。起動時間の計測に使う)
+        self._startup_start = time.perf_counter_ns()
+        self._splash = tk.Label(self, text="読み込み中…")
+        self._splash.grid(row=0, column=0)
+        self.update()
+        self._startup_mark("first_paint")
+        self._startup_steps = self._startup()
+        self._startup_job = self.after_idle(self._startup_step)
+
+    # --- フォント (初めて使うときに作る) ---
+
+    @cached_property
+    def title_font(self):
+        return tkfont.Font(family=self.fonts.family, size=FONT_SIZE_L, weight="bold")
+
+    @cached_property
+    def question_font(self):
+        return tkfont.Font(family=self.fonts.family, size=FONT_SIZE_M)
+
+    @cached_property
+    def result_font(self):
+        return tkfont.Font(family=self.fonts.family, size=FONT_SIZE_L, weight="bold")
+
+    @cached_property
+    def default_font(self):
+        return tkfont.Font(family=self.fonts.family, size=FONT_SIZE_M)
+
+    @cached_property
+    def small_font(self):
+        return tkfont.Font(family=self.fonts.family, size=FONT_SIZE_S)
+
+    # --- 起動 ---
+
+    @cached_property
+    def answer_log(self):
+        """回答イベントのログ (書き込みは別スレッドで行う)。最初の画面を出した後の空き時間に開く"""
+        os.makedirs(DATA_DIR, exist_ok=True)
+        return AnswerLog(ANSWER_LOG_PATH)
+
+    @cached_property
+    def scores(self):
+        """成績の保存先 (書き込みは別スレッドでまとめて行う)"""
+        from quiz_scores import ScoreStore  # sqlite3 の読み込みを最初の描画の後に回す
+        return ScoreStore(SCORE_DB_PATH)
+
+    @cached_property
+    def media(self):
+        """問題に添える画像の読み込み (スレッドプールで読み込み、デコード済みのものをキャッシュする)"""
+        return MediaLoader(self, MEDIA_DIR, IMAGE_MAX_SIZE, IMAGE_CACHE_BYTES)
+
+    def _startup(self):
+        """最初の画面を出すまでの準備を区切りごとに進めるジェネレータ
+
+        yield した値はミリ秒単位の待ち時間で、0 なら次の空き時間に続きを行う。
+        """
+        # フォントファミリーは同梱フォントを含めた候補から一度だけ決める
+        self.fonts = load_fonts(self, FONT_PREFERENCES, FONT_FILES, FONT_CACHE_PATH)
+        yield 0
+
+        # 問題バンク (索引だけを読み込み、問題本体は選択された区間だけをデコードする)。
+        # コンパイルし直す場合もあるので別スレッドで開き、その間も画面を止めない
+        from concurrent.futures import ThreadPoolExecutor
+        self.source_watcher = SourceWatcher(QUIZ_SOURCE_DIR)
+        # 問題ファイルの読み直しも同じスレッドで行い、差し替えだけを画面のスレッドで行う
+        self._reload_executor = ThreadPoolExecutor(max_workers=1)
+        future = self._reload_executor.submit(open_bank, QUIZ_BANK_PATH, self.source_watcher.sources)
+        while not future.done():
+            yield STARTUP_POLL_MS
+        self.bank = future.result()
+
+        # OptionMenu (選択ボックス) の見た目を変更する
+        from tkinter import ttk
+        style = ttk.Style(self)
+        style.configure("TMenubutton", font=self.default_font, padding=5)
+
+        self._splash.destroy()
         self.switch_frame("SelectionFrame") # 最初に表示するフレームを変更
+        self.ready = True
+        self.after_idle(self._startup_mark, "interactive")
+        yield 0
+
+        # ここからは操作を受け付けながら、空き時間に進める
+        self.answer_log # 回答ログと成績の保存先を開いておく (最初のクイズの開始・終了を待たせない)
+        self.scores
+        self._reload_job = self.after(RELOAD_POLL_MS, self._poll_sources)
+        # 問題の全文検索の索引 (起動を待たせないよう、画面の空き時間に少しずつ作る)
+        self.question_index = QuestionIndex(self.bank)
+        self._index_steps = self.question_index.build_steps()
+        self._index_job = self.after_idle(self._build_index_step)
+
+    def _startup_step(self):
+        try:
+            delay = next(self._startup_steps)
+        except StopIteration:
+            self._startup_steps = None
+            self._startup_job = None
+        except Exception as e:
+            self._startup_steps = None
+            self._startup_job = None
+            self._startup_failed(e)
+        else:
+            self._startup_job = self.after(delay, self._startup_step) if delay else self.after_idle(self._startup_step)
+
+    def _startup_failed(self, error):
+        """起動の準備に失敗したら、理由を表示してから終了する (「読み込み中」のまま止めない)"""
+        logger.error("起動できませんでした", exc_info=error)
+        self.startup_error = error
+        message = f"起動できませんでした:\n{error}"
+        self._splash.config(text=message)
+        try:
+            from tkinter import messagebox
+            messagebox.showerror(GAME_TITLE, message, parent=self)
+        except (ImportError, tk.TclError):
+            pass
+        self.destroy()
+
+    def _startup_mark(self, name):
+        self.startup_times[name] = time.time()
+        self.metrics.record(f"startup:{name}", time.perf_counter_ns() - self._startup_start)
+
+    def finish_startup(self):
+        """起動の準備を待たずに最後まで済ませる (計測用のスクリプトなどから使う)"""
+        if self._startup_job is not None:
+            self.after_cancel(self._startup_job)
+            self._startup_job = None
+        if self._startup_steps is not None:
+            for delay in self._startup_steps:
+                time.sleep(delay / 1000)
+            self._startup_steps = None
+        return self
+
+    def destroy(self):
+        """ウィンドウを閉じる前に、未書き込みの回答ログを書き出す"""
+        if self._startup_job is not None:
+            self.after_cancel(self._startup_job)
+        if self._index_job is not None:
+            self.after_cancel(self._index_job)
+        if self._reload_job is not None:
+            self.after_cancel(self._reload_job)
+        if self._item_index_job is not None:
+            self.after_cancel(self._item_index_job)
+        if self._reload_executor is not None:
+            self._reload_executor.shutdown(wait=False, cancel_futures=True)
+        if "media" in self.__dict__:
+            self.media.close()
+        self.cancel_countdown()
+        if self.metrics.enabled:
+            self.lag_monitor.stop()
+            if self._metrics_overlay_job is not None:
+                self.after_cancel(self._metrics_overlay_job)
+            self.metrics.dump(METRICS_PATH)
+        if "answer_log" in self.__dict__:
+            self.answer_log.close()
+        if "scores" in self.__dict__:
+            self.scores.close()
+        super().destroy()
+
+    def _build_index_step(self):
+        # 全文検索の索引を1区切りぶん作る。できあがったら検索画面の結果を更新する
+        try:
+            next(self._index_steps)
+        except StopIteration:
+            self._index_steps = None
+            self._index_job = None
+            if isinstance(self._frame, SearchFrame):
+                self._frame.update_results()
+        else:
+            self._index_job = self.after_idle(self._build_index_step)
+
+    def prepare_item_index(self):
+        """おまかせモードの出題候補の索引を、まだなければ空き時間に少しずつ作り始める"""
+        if self.item_index is not None or self.bank is None:
+            return
+        self.item_index = ItemIndex(self.bank, load_params(ADAPTIVE_STATE_PATH)["items"])
+        self._item_index_steps = self.item_index.build_steps()
+        self._item_index_job = self.after_idle(self._build_item_index_step)
+
+    def _build_item_index_step(self):
+        try:
+            next(self._item_index_steps)
+        except StopIteration:
+            self._item_index_steps = None
+            self._item_index_job = None
+        else:
+            self._item_index_job = self.after_idle(self._build_item_index_step)
+
+    def _finish_item_index(self):
+        # 作り途中なら残りをここで済ませる
+        self.prepare_item_index()
+        if self._item_index_job is not None:
+            self.after_cancel(self._item_index_job)
+            self._item_index_job = None
+        if self._item_index_steps is not None:
+            for _ in self._item_index_steps:
+                pass
+            self._item_index_steps = None
+        return self.item_index
+
+    def _poll_sources(self):
+        # 読み直しの最中は終わるのを待ち、終わってから次の変更を確かめる
+        if self._reload_future is None:
+            if self.source_watcher.changed():
+                self._reload_future = self._reload_executor.submit(read_sections, self.source_watcher.sources)
+        elif self._reload_future.done():
+            future, self._reload_future = self._reload_future, None
+            self._apply_reload(future)
+        self._reload_job = self.after(RELOAD_POLL_MS, self._poll_sources)
+
+    def _apply_reload(self, future):
+        """読み直した問題ファイルの内容で、変わった区間だけを差し替える
+
+        出題中のクイズは開始した時点の区間の内容を使い続ける。
+        """
+        try:
+            sections = future.result()
+        except (BankError, OSError) as e:
+            # 保存途中のファイルを読んだ場合など。次の保存で読み直す
+            logger.warning("問題ファイルを読み込めませんでした: %s", e)
+            return
+        added, changed, removed = self.bank.patch(sections)
+        if not (added or changed or removed):
+            return
+        logger.info("問題を読み直しました (追加 %d / 変更 %d / 削除 %d 区間)", len(added), len(changed), len(removed))
+
+        # 全文検索の索引を作り直す (作り終わるまでは、作った分だけを検索する)
+        if self._index_job is not None:
+            self.after_cancel(self._index_job)
+        self.question_index = QuestionIndex(self.bank)
+        self._index_steps = self.question_index.build_steps()
+        self._index_job = self.after_idle(self._build_index_step)
+        # おまかせモードの索引も作り直す (出題中の回は作った時点の索引を使い続ける)
+        if self._item_index_job is not None:
+            self.after_cancel(self._item_index_job)
+            self._item_index_job = None
+        self.item_index = None
+        self._item_index_steps = None
+        if self.selected_mode == MODE_ADAPTIVE:
+            self.prepare_item_index()
+        selection_frame = self._frames.get("SelectionFrame")
+        if selection_frame is not None:
+            selection_frame.reload_genres()
 
     def switch_frame(self, frame_class_name, **kwargs):
         """指定された名前のフレームに切り替える"""
+        start = time.perf_counter_ns()
         self.unbind_all_keys()
-        if self._frame:
-            self._frame.destroy()
-        
-        FrameClass = globals()[frame_class_name]
-        self._frame = FrameClass(master=self, controller=self, **kwargs)
-        self.grid_rowconfigure(0, weight=1)
-        self.grid_columnconfigure(0, weight=1)
-        self._frame.grid(
-            row=0, column=0, sticky="nsew", padx=20, pady=20)
+        self.cancel_prefetch()
+        self.cancel_countdown()
+        frame = self._frames.get(frame_class_name)
+        if frame is None:
+            FrameClass = globals()[frame_class_name]
+            with self.metrics.timed(f"construct:{frame_class_name}"):
+                frame = FrameClass(master=self, controller=self)
+            self._frames[frame_class_name] = frame
+
+        # 表示内容を新しいデータで差し替えてから表示する
+        frame.rebind(**kwargs)
+        if frame is not self._frame:
+            if self._frame:
+                self._frame.grid_remove()
+            frame.grid(row=0, column=0, sticky="nsew", padx=20, pady=20)
+            self._frame = frame
+
+        if self.metrics.enabled:
+            self.metrics.record(f"switch:{frame_class_name}", time.perf_counter_ns() - start)
+            # 描画は空き時間に行われるため、その後の空き時間の処理で描き終わった時刻とみなす
+            self.after_idle(self._record_first_paint, frame_class_name, start)
+
+    def _record_first_paint(self, frame_class_name, start):
+        self.metrics.record(f"first_paint:{frame_class_name}", time.perf_counter_ns() - start)
+
+    def toggle_metrics_overlay(self):
+        """計測結果を画面の上に重ねて表示する / 隠す"""
+        if not self.ready:
+            return
+        if self._metrics_overlay is None:
+            self._metrics_overlay = tk.Label(self, font=self.small_font, justify="left", anchor="nw",
+                                             bg="black", fg="lime")
+        if self._metrics_overlay_job is not None:
+            self.after_cancel(self._metrics_overlay_job)
+            self._metrics_overlay_job = None
+            self._metrics_overlay.place_forget()
+        else:
+            self._metrics_overlay.place(x=0, y=0)
+            self._refresh_metrics_overlay()
+
+    def _refresh_metrics_overlay(self):
+        self._metrics_overlay.config(text=self.metrics.report())
+        self._metrics_overlay.lift()
+        self._metrics_overlay_job = self.after(METRICS_OVERLAY_INTERVAL, self._refresh_metrics_overlay)
 
     def unbind_all_keys(self):
         """キー入力の衝突を避けるため、既存のキーバインドを全て解除する"""
@@ -152,24 +448,238 @@ class QuizApp(tk.Tk):
         """選択されたクイズを開始する"""
         # start_quizが直接呼ばれる際には、controllerに保持されているジャンルと難易度を使用
         if self.selected_genre and self.selected_difficulty:
-            self.selected_quiz_data = ALL_QUIZZES[self.selected_genre][self.selected_difficulty]
-            self.current_quiz_index = 0
-            self.wrong_answer_count = 0
-            self.switch_frame("QuizFrame")
+            self.scheduler = None
+            self.selector = None
+            if self.selected_mode == MODE_ADAPTIVE:
+                # 回答結果で能力の推定値が変わり、次の問題が決まるため、先読みはしない
+                genre = None if self.selected_genre == ALL_GENRES else self.selected_genre
+                ability, responses = load_params(ADAPTIVE_STATE_PATH)["ability"]
+                self.selector = AdaptiveSelector(self._finish_item_index(), ability, responses, genre,
+                                                 ADAPTIVE_QUESTION_COUNT)
+                self.session = QuizSession(self.selector, lookahead=0, max_typos=FILL_IN_TYPO_TOLERANCE,
+                                           listeners=[self.selector.on_answer, self.answer_log.on_answer])
+                self.show_first_question()
+                return
+            # 問題は区間から1問ずつデコードするので、区間全体をメモリに載せない
+            section = self.bank.section(self.selected_genre, self.selected_difficulty)
+            if self.selected_mode == MODE_ENDLESS:
+                self.session = QuizSession(lambda: endless(section), max_typos=FILL_IN_TYPO_TOLERANCE,
+                                           listeners=[self.answer_log.on_answer])
+            elif self.selected_mode == MODE_REVIEW:
+                # 回答結果で次の問題が決まるため、先読みはしない
+                self.scheduler = SpacedRepetitionScheduler(section, load_state(REVIEW_STATE_PATH))
+                self.session = QuizSession(self.scheduler, lookahead=0, max_typos=FILL_IN_TYPO_TOLERANCE,
+                                           listeners=[self.scheduler.on_answer, self.answer_log.on_answer])
+            elif self.selected_mode == MODE_TIMED:
+                self.session = QuizSession(section, max_typos=FILL_IN_TYPO_TOLERANCE,
+                                           listeners=[self.answer_log.on_answer],
+                                           question_time_limit=QUESTION_TIME_LIMIT,
+                                           total_time_limit=TOTAL_TIME_LIMIT)
+            else:
+                self.session = QuizSession(section, max_typos=FILL_IN_TYPO_TOLERANCE,
+                                           listeners=[self.answer_log.on_answer])
+            self.show_first_question()
         else:
             print("ジャンルと難易度が選択されていません。") # エラーハンドリング（必要であればGUIで表示）
 
     def next_question(self):
         """次の問題に進むか、最終結果を表示する"""
-        self.current_quiz_index += 1
-        if self.current_quiz_index < len(self.selected_quiz_data):
+        if self.session.time_over():
+            self.finish_quiz()
+        elif self.session.advance():
+            self._take_prefetched_frame()
             self.switch_frame("QuizFrame")
         else:
-            self.switch_frame("FinalResultFrame")
-            
-    def record_wrong_answer(self):
-        """不正解の数をカウント"""
-        self.wrong_answer_count += 1
+            self.finish_quiz()
+
+    def prefetch_next_question(self):
+        """次の問題の画面を、表示されていない予備のフレームに空き時間で少しずつ組み立てる"""
+        self.cancel_prefetch()
+        quiz = self.session.peek()
+        if quiz is None: # 最後の問題、または回答結果で次の問題が決まるモード
+            return
+        if self._spare_quiz_frame is None:
+            with self.metrics.timed("construct:QuizFrame"):
+                self._spare_quiz_frame = QuizFrame(master=self, controller=self)
+        self._prefetch_steps = self._spare_quiz_frame.prepare(quiz)
+        self._prefetch_job = self.after_idle(self._prefetch_step)
+
+    def _prefetch_step(self):
+        # 1区切りぶん組み立てたら、残りは次の空き時間に回してイベント処理を妨げない
+        try:
+            next(self._prefetch_steps)
+        except StopIteration:
+            self._prefetch_steps = None
+            self._prefetch_job = None
+        else:
+            self._prefetch_job = self.after_idle(self._prefetch_step)
+
+    def cancel_prefetch(self):
+        """組み立て途中の先読みを取り消す"""
+        if self._prefetch_job is not None:
+            self.after_cancel(self._prefetch_job)
+            self._prefetch_job = None
+        self._prefetch_steps = None
+
+    def _take_prefetched_frame(self):
+        # 先読みが途中なら残りをここで済ませ、組み立て済みの予備のフレームを問題画面として使う
+        spare = self._spare_quiz_frame
+        if spare is None:
+            return
+        if self._prefetch_steps is not None:
+            for _ in self._prefetch_steps:
+                pass
+        self.cancel_prefetch()
+        if spare.prepared_quiz is self.session.current:
+            self._spare_quiz_frame = self._frames.get("QuizFrame")
+            self._frames["QuizFrame"] = spare
+
+    def start_countdown(self, label):
+        """制限時間のある問題で、残り時間を label に表示し始める"""
+        self.cancel_countdown()
+        if self.session.deadline_ns() is not None:
+            self._countdown_label = label
+            self._countdown_tick()
+
+    def _countdown_tick(self):
+        # 残り時間は毎回時計から計算し直すので、after の遅れが積み重ならない
+        remaining = self.session.deadline_ns() - time.perf_counter_ns()
+        if remaining <= 0:
+            self._countdown_job = None
+            result_info = self.session.answer_timeout()
+            self.switch_frame("ResultFrame", result_info=result_info)
+            return
+        # 表示は 0.1 秒単位で切り上げ、次の更新は表示が変わる時刻 (0.1 秒の境目) に合わせる
+        steps = -(-remaining // COUNTDOWN_STEP_NS)
+        self._countdown_label.config(text=f"残り {steps / 10:.1f} 秒")
+        delay_ms = -(-(remaining - (steps - 1) * COUNTDOWN_STEP_NS) // 1_000_000)
+        self._countdown_job = self.after(delay_ms, self._countdown_tick)
+
+    def cancel_countdown(self):
+        """残り時間の表示を止める"""
+        if self._countdown_job is not None:
+            self.after_cancel(self._countdown_job)
+            self._countdown_job = None
+
+    def show_first_question(self):
+        """最初の問題を表示する (出題できる問題がなければ最終結果へ)"""
+        if self.session.is_finished():
+            self.finish_quiz()
+        else:
+            self.switch_frame("QuizFrame")
+
+    def finish_quiz(self):
+        """クイズを終えて最終結果を表示する"""
+        if self.scheduler is not None:
+            save_state(REVIEW_STATE_PATH, self.scheduler.state())
+        if self.selector is not None:
+            save_params(ADAPTIVE_STATE_PATH, self.selector.state())
+        # 成績を記録する (書き込みの結果は最終結果画面で受け取る)
+        session = self.session
+        score = None
+        if session.answered_count:
+            score = self.scores.record(self.selected_genre, self.selected_difficulty, self.selected_mode,
+                                       session.answered_count, session.answered_count - session.wrong_count,
+                                       session.used_ns // 1_000_000)
+        self.switch_frame("FinalResultFrame", score=score)
+
+
+class VirtualList(tk.Frame):
+    """見えている行の分だけボタンを作り、スクロールでは表示する文字列だけを差し替えるリスト
+
+    項目が何千あっても、作るウィジェットは表示できる行数ぶんで済む。
+    ボタンが押されると command(項目) を呼ぶ。ボタンの表示には label(項目) を使う。
+    """
+    def __init__(self, master, font, command, width=30, pady=3, label=str, **kwargs):
+        super().__init__(master, **kwargs)
+        self.font = font
+        self.command = command
+        self.label = label
+        self.width = width
+        self.pady = pady
+        self.items = []
+        self.top = 0           # 先頭の行に表示している項目の位置
+        self.visible_rows = 0  # 今の高さで表示できる行数
+        self.row_height = None
+        self.buttons = []
+
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+        # 中のボタンの数で大きさが変わらないよう、行を並べる領域は伝搬を止めておく
+        self.body = tk.Frame(self, height=300)
+        self.body.grid_propagate(False)
+        self.body.grid_columnconfigure(0, weight=1)
+        self.body.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self.yview)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.body.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.body)
+
+    def set_items(self, items):
+        """表示する項目を差し替え、先頭までスクロールする"""
+        self.items = list(items)
+        self.top = 0
+        self._refresh()
+
+    def yview(self, *args):
+        """スクロールバーからの操作 (moveto / scroll) を処理する"""
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.items)))
+        elif args[0] == "scroll":
+            step = int(args[1]) * (max(1, self.visible_rows - 1) if args[2] == "pages" else 1)
+            self.scroll_to(self.top + step)
+
+    def scroll_to(self, top):
+        """top 番目の項目が先頭の行に来るようにスクロールする"""
+        top = max(0, min(top, len(self.items) - self.visible_rows))
+        if top != self.top:
+            self.top = top
+            self._refresh()
+
+    def _on_resize(self, event):
+        if self.row_height is None:
+            self._add_button()
+            self.row_height = self.buttons[0].winfo_reqheight() + 2 * self.pady
+        self.visible_rows = max(1, event.height // self.row_height)
+        while len(self.buttons) < self.visible_rows:
+            self._add_button()
+        self.top = max(0, min(self.top, len(self.items) - self.visible_rows))
+        self._refresh()
+
+    def _add_button(self):
+        row = len(self.buttons)
+        btn = tk.Button(self.body, font=self.font, width=self.width, command=lambda: self._select(row))
+        self._bind_wheel(btn)
+        self.buttons.append(btn)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_wheel)  # Windows / macOS
+        widget.bind("<Button-4>", self._on_wheel)    # X11
+        widget.bind("<Button-5>", self._on_wheel)
+
+    def _on_wheel(self, event):
+        up = event.num == 4 or getattr(event, "delta", 0) > 0
+        self.scroll_to(self.top + (-3 if up else 3))
+
+    def _select(self, row):
+        index = self.top + row
+        if index < len(self.items):
+            self.command(self.items[index])
+
+    def _refresh(self):
+        for row, btn in enumerate(self.buttons):
+            index = self.top + row
+            if row < self.visible_rows and index < len(self.items):
+                btn.config(text=self.label(self.items[index]))
+                btn.grid(row=row, column=0, pady=self.pady)
+            else:
+                btn.grid_remove()
+        total = len(self.items)
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.visible_rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
 
 
 class SelectionFrame(tk.Frame):
@@ -180,23 +690,49 @@ class SelectionFrame(tk.Frame):
         
         self.grid_columnconfigure(0, weight=1)
         self.grid_rowconfigure(0, weight=0) # タイトル行は伸縮させない
-        self.grid_rowconfigure(1, weight=1) # ジャンル・難易度表示エリアを伸縮させる
-        self.grid_rowconfigure(2, weight=0) # ボタン行は伸縮させない
+        self.grid_rowconfigure(2, weight=1) # ジャンル・難易度の一覧を伸縮させる
 
-        title_label = tk.Label(self, text="クイズのジャンルを選択", font=controller.title_font)
-        title_label.grid(row=0, column=0, pady=20)
+        self.title_label = tk.Label(self, text="クイズのジャンルを選択", font=controller.title_font)
+        self.title_label.grid(row=0, column=0, pady=20)
 
-        # ジャンルボタンを配置するフレーム
-        self.genre_button_frame = tk.Frame(self)
-        self.genre_button_frame.grid(row=1, column=0, pady=10, sticky="nsew")
-        self.genre_button_frame.grid_columnconfigure(0, weight=1) # ボタンを中央に寄せるため
+        # ジャンルの絞り込み (入力のたびに n-gram 索引で部分一致検索する)
+        self._build_genre_index()
+
+        self.search_frame = tk.Frame(self)
+        self.search_frame.grid(row=1, column=0, pady=(0, 10))
+        search_label = tk.Label(self.search_frame, text="さがす:", font=controller.default_font)
+        search_label.grid(row=0, column=0, padx=5)
+        self.query_var = tk.StringVar(self)
+        self.search_entry = tk.Entry(self.search_frame, textvariable=self.query_var, font=controller.default_font)
+        self.search_entry.grid(row=0, column=1, padx=5)
+        self.search_entry.bind("<Return>", self.select_first)
+        self.query_var.trace_add("write", lambda *args: self.create_genre_buttons())
+
+        # ジャンル・難易度の一覧 (見えている行のボタンだけを作る)
+        self.showing_difficulties = False
+        self.item_list = VirtualList(self, font=controller.default_font, command=self.select_item)
+        self.item_list.grid(row=2, column=0, pady=10, sticky="nsew")
+
+        # 難易度の一覧を表示している間だけ出す
+        self.back_to_genre_button = tk.Button(self, text="ジャンル選択に戻る", font=controller.default_font,
+                                              command=self.back_to_genre_selection)
 
-        # 難易度ボタンを配置するフレーム
-        self.difficulty_button_frame = tk.Frame(self)
-        # 最初は非表示
-        
         self.create_genre_buttons()
 
+        # 出題モードの選択
+        mode_frame = tk.Frame(self)
+        mode_frame.grid(row=4, column=0, pady=10)
+        mode_label = tk.Label(mode_frame, text="出題モード:", font=controller.default_font)
+        mode_label.grid(row=0, column=0, padx=5)
+        self.mode_var = tk.StringVar(self, value=controller.selected_mode)
+        from tkinter import ttk  # OptionMenuのためにインポート (起動を速くするため、使うときに読み込む)
+        mode_menu = ttk.OptionMenu(mode_frame, self.mode_var, controller.selected_mode, *QUIZ_MODES,
+                                   command=self.select_mode)
+        mode_menu.grid(row=0, column=1, padx=5)
+        search_button = tk.Button(mode_frame, text="問題を検索", font=controller.default_font,
+                                  command=lambda: controller.switch_frame("SearchFrame"))
+        search_button.grid(row=0, column=2, padx=(20, 5))
+
         # 戻るボタン
         back_button = tk.Button(self, text="タイトルに戻る", font=controller.default_font, command=lambda: controller.switch_frame("SelectionFrame"))
         # これは現状のSelectionFrameが最初の画面なので、意味がないが、他の画面からの遷移を考慮すると必要
@@ -204,58 +740,84 @@ class SelectionFrame(tk.Frame):
         # 仮にこのボタンを残すなら、QuizAppのswitch_frameで引数を渡すように修正が必要
         # back_button.grid(row=3, column=0, pady=10) # この行は削除またはコメントアウト
 
-    def create_genre_buttons(self):
-        """ジャンル選択ボタンを生成する"""
-        for widget in self.genre_button_frame.winfo_children():
-            widget.destroy() # 既存のボタンをクリア
-
-        row_idx = 0
-        for genre in ALL_QUIZZES.keys():
-            btn = tk.Button(self.genre_button_frame, text=genre, font=self.controller.default_font,
-                            width=30, command=lambda g=genre: self.show_difficulty_buttons(g))
-            btn.grid(row=row_idx, column=0, pady=5)
-            row_idx += 1
-            self.genre_button_frame.grid_rowconfigure(row_idx-1, weight=1) # 各行を均等に広げる
+    def rebind(self, **kwargs):
+        """再表示時はジャンル選択の状態に戻す"""
+        if self.showing_difficulties:
+            self.back_to_genre_selection()
+        self.search_entry.focus_set()
 
-    def show_difficulty_buttons(self, selected_genre):
-        """選択されたジャンルの難易度ボタンを表示する"""
-        self.controller.selected_genre = selected_genre # コントローラにジャンルを保存
+    def _build_genre_index(self):
+        self.genres = self.controller.bank.genres()
+        self.genre_index = NgramIndex()
+        for genre in self.genres:
+            self.genre_index.add(genre)
 
-        # ジャンルボタンを非表示にする
-        self.genre_button_frame.grid_forget()
+    def reload_genres(self):
+        """問題ファイルを読み直した後、ジャンル・難易度の一覧を作り直す"""
+        self._build_genre_index()
+        if not self.showing_difficulties:
+            self.create_genre_buttons()
+        elif self.controller.selected_genre in self.genres:
+            self.item_list.set_items(self.controller.bank.difficulties(self.controller.selected_genre))
+        else:
+            self.back_to_genre_selection()
 
-        # 難易度ボタンフレームを表示
-        self.difficulty_button_frame.grid(row=1, column=0, pady=10, sticky="nsew")
-        self.difficulty_button_frame.grid_columnconfigure(0, weight=1)
+    def select_mode(self, mode):
+        """出題モードをコントローラに保存する
 
-        # 既存の難易度ボタンをクリア
-        for widget in self.difficulty_button_frame.winfo_children():
-            widget.destroy()
+        おまかせモードでは難易度を選ばないので、ジャンルの一覧に戻る。
+        """
+        self.controller.selected_mode = mode
+        if mode == MODE_ADAPTIVE:
+            self.controller.prepare_item_index()
+        if self.showing_difficulties:
+            self.back_to_genre_selection()
+        else:
+            self.create_genre_buttons()
 
-        # 難易度ボタンのタイトル
-        difficulty_title_label = tk.Label(self.difficulty_button_frame, text=f"{selected_genre} の難易度を選択", font=self.controller.question_font)
-        difficulty_title_label.grid(row=0, column=0, pady=10)
-        
-        row_idx = 1
-        difficulties = ALL_QUIZZES[selected_genre].keys()
-        for difficulty in difficulties:
-            btn = tk.Button(self.difficulty_button_frame, text=difficulty, font=self.controller.default_font,
-                            width=30, command=lambda d=difficulty: self.start_selected_quiz(selected_genre, d))
-            btn.grid(row=row_idx, column=0, pady=5)
-            row_idx += 1
-            self.difficulty_button_frame.grid_rowconfigure(row_idx-1, weight=1) # 各行を均等に広げる
-
-        # 戻るボタン（ジャンル選択に戻る）
-        back_to_genre_button = tk.Button(self.difficulty_button_frame, text="ジャンル選択に戻る", font=self.controller.default_font,
-                                          command=self.back_to_genre_selection)
-        back_to_genre_button.grid(row=row_idx, column=0, pady=20)
-        self.difficulty_button_frame.grid_rowconfigure(row_idx, weight=1)
+    def create_genre_buttons(self):
+        """検索語に一致するジャンルを一覧に表示する (先頭一致を前に並べる)"""
+        if self.showing_difficulties:
+            return
+        matches = self.genre_index.search(self.query_var.get(), prefix_first=True)
+        items = [self.genres[i] for i in matches]
+        if self.controller.selected_mode == MODE_ADAPTIVE:
+            items.insert(0, ALL_GENRES)
+        self.item_list.set_items(items)
+
+    def select_item(self, item):
+        """一覧の項目が選ばれたとき、ジャンルなら難易度の一覧へ、難易度ならクイズを開始する
+
+        おまかせモードではジャンルを選んだらすぐに開始する。
+        """
+        if self.showing_difficulties:
+            self.start_selected_quiz(self.controller.selected_genre, item)
+        elif self.controller.selected_mode == MODE_ADAPTIVE:
+            self.start_selected_quiz(item, ADAPTIVE_DIFFICULTY)
+        else:
+            self.show_difficulty_buttons(item)
+
+    def select_first(self, event=None):
+        """検索欄で Enter を押したら、一覧の先頭の項目を選ぶ"""
+        if self.item_list.items:
+            self.select_item(self.item_list.items[0])
+
+    def show_difficulty_buttons(self, selected_genre):
+        """選択されたジャンルの難易度を一覧に表示する"""
+        self.controller.selected_genre = selected_genre # コントローラにジャンルを保存
+        self.showing_difficulties = True
+        self.title_label.config(text=f"{selected_genre} の難易度を選択")
+        self.search_frame.grid_remove()
+        self.item_list.set_items(self.controller.bank.difficulties(selected_genre))
+        self.back_to_genre_button.grid(row=3, column=0, pady=10)
 
     def back_to_genre_selection(self):
-        """ジャンル選択画面に戻る"""
-        self.difficulty_button_frame.grid_forget() # 難易度ボタンフレームを非表示
-        self.create_genre_buttons() # ジャンルボタンを再生成して表示
-        self.genre_button_frame.grid(row=1, column=0, pady=10, sticky="nsew") # ジャンルフレームを表示
+        """ジャンル選択画面に戻る (検索語はそのまま残す)"""
+        self.showing_difficulties = False
+        self.title_label.config(text="クイズのジャンルを選択")
+        self.back_to_genre_button.grid_remove()
+        self.search_frame.grid()
+        self.create_genre_buttons()
 
     def start_selected_quiz(self, genre, difficulty):
         """選択されたジャンルと難易度でクイズを開始する"""
@@ -264,6 +826,79 @@ class SelectionFrame(tk.Frame):
         self.controller.start_quiz()
 
 
+class SearchFrame(tk.Frame):
+    """問題文・選択肢・正解から問題を探す画面 (問題の編集者向け)"""
+    RESULT_LIMIT = 200
+
+    def __init__(self, master, controller, **kwargs):
+        super().__init__(master)
+        self.controller = controller
+        self.grid_columnconfigure(0, weight=1)
+        self.grid_rowconfigure(2, weight=1) # 検索結果の一覧を伸縮させる
+
+        title_label = tk.Label(self, text="問題を検索", font=controller.title_font)
+        title_label.grid(row=0, column=0, pady=(0, 10))
+
+        search_frame = tk.Frame(self)
+        search_frame.grid(row=1, column=0)
+        self.query_var = tk.StringVar(self)
+        self.search_entry = tk.Entry(search_frame, textvariable=self.query_var, font=controller.default_font, width=30)
+        self.search_entry.grid(row=0, column=0, padx=5)
+        self.status_label = tk.Label(search_frame, font=controller.small_font)
+        self.status_label.grid(row=0, column=1, padx=5)
+        self.query_var.trace_add("write", lambda *args: self.update_results())
+
+        # 検索結果の一覧 ([ジャンル / 難易度] 問題文)
+        self.result_list = VirtualList(self, font=controller.small_font, command=self.show_detail, width=60, pady=1,
+                                       label=lambda hit: f"[{hit[0]} / {hit[1]}] {hit[2].question}")
+        self.result_list.grid(row=2, column=0, pady=10, sticky="nsew")
+
+        # 選んだ問題の詳細
+        self.detail_label = tk.Label(self, font=controller.small_font, wraplength=540, justify="left", anchor="w")
+        self.detail_label.grid(row=3, column=0, sticky="ew")
+
+        back_button = tk.Button(self, text="ジャンル選択に戻る", font=controller.default_font,
+                                command=lambda: controller.switch_frame("SelectionFrame"))
+        back_button.grid(row=4, column=0, pady=(10, 0))
+
+    def rebind(self, **kwargs):
+        """表示するたびに最新の索引で検索し直す"""
+        self.update_results()
+        self.search_entry.focus_set()
+
+    def update_results(self):
+        """入力中の検索語で検索し、結果の一覧を差し替える"""
+        query = self.query_var.get()
+        index = self.controller.question_index
+        hits = index.search(query, limit=self.RESULT_LIMIT) if query.strip() else []
+        self.result_list.set_items(hits)
+        self.detail_label.config(text="")
+
+        if not query.strip():
+            status = ""
+        elif len(hits) >= self.RESULT_LIMIT:
+            status = f"{self.RESULT_LIMIT} 件以上"
+        else:
+            status = f"{len(hits)} 件"
+        if not index.complete:
+            status += f" (索引を作成中: {len(index)} 問まで)"
+        self.status_label.config(text=status)
+
+    def show_detail(self, hit):
+        """選ばれた問題の内容を表示する"""
+        genre, difficulty, quiz = hit
+        lines = [f"{genre} / {difficulty}  (ID: {quiz.id})", quiz.question]
+        if quiz.type is QuestionType.CHOICE:
+            for i, choice in enumerate(quiz.choices):
+                mark = "○" if i == quiz.correct_choice_index else "・"
+                lines.append(f"{mark} {choice}")
+        else:
+            lines.append(f"せいかい: {quiz.answer}")
+            if quiz.aliases:
+                lines.append(f"別解: {', '.join(quiz.aliases)}")
+        self.detail_label.config(text="\n".join(lines))
+
+
 class QuizFrame(tk.Frame):
     """クイズ画面"""
     def __init__(self, master, controller, **kwargs):
@@ -271,46 +906,146 @@ class QuizFrame(tk.Frame):
         self.controller = controller
         self.grid_columnconfigure(0, weight=1)
 
-        # controllerから選択されたクイズデータを取得
-        quiz = self.controller.selected_quiz_data[controller.current_quiz_index]
-        
-        question_label = tk.Label(self, text=quiz["question"], font=controller.question_font, 
-                                 wraplength=450, justify="left")
-        question_label.grid(row=0, column=0, pady=20, sticky="w")
-
-        if quiz["type"] == "choice":
-            for i, choice in enumerate(quiz["choices"]):
-                btn = tk.Button(self, text=choice, font=controller.default_font, 
-                                 command=lambda choice_idx=i: self.check_choice_answer(choice_idx))
-                btn.grid(row=i+1, column=0, pady=5, sticky="ew")
+        # 残り時間 (制限時間のない問題では空欄)。幅を固定して、表示の更新で配置を計算し直さないようにする
+        self.timer_label = tk.Label(self, font=controller.default_font, width=12, anchor="e")
+        self.timer_label.grid(row=0, column=0, sticky="e")
+
+        # 問題文は TextLayout で折り返した行を表示する (Tk の wraplength は使わない)
+        self.question_label = tk.Label(self, font=controller.question_font, justify="left")
+        self.question_label.grid(row=1, column=0, pady=(0, 20), sticky="w")
+
+        # 問題に添える画像 (画像のある問題のときだけ表示する)
+        self.image_label = tk.Label(self, font=controller.small_font)
+        self._image_name = None
+        self._image = None # 表示中の画像の参照 (キャッシュから外れても消えないように持っておく)
+        self._question_text = None
+        self._wrap_width = None   # いまの問題文を折り返した幅
+        self._resize_job = None
+        self.bind("<Configure>", self._on_resize)
+
+        # 選択肢ボタンは必要な数だけ作り、以降の問題では使い回す
+        self.choice_buttons = []
+
+        # 記述式の入力欄 (記述式の問題のときだけ表示する)
+        self.input_frame = tk.Frame(self)
+        self.input_frame.grid_columnconfigure(1, weight=1)
+
+        answer_label = tk.Label(self.input_frame, text="こたえ:", font=controller.default_font)
+        answer_label.grid(row=0, column=0)
+
+        self.entry = tk.Entry(self.input_frame, font=controller.default_font)
+        self.entry.grid(row=0, column=1, padx=10, sticky="ew")
+        self.entry.bind("<Return>", self.check_fill_in_answer)
+
+        self.submit_button = tk.Button(self, text="決定", font=controller.default_font, command=self.check_fill_in_answer)
+        self.prepared_quiz = None # 組み立て済みで、まだ表示していない問題
+
+    def prepare(self, quiz):
+        """問題の内容でウィジェットを組み立てる
+
+        少しずつ進められるように、区切りごとに yield するジェネレータになっている。
+        キーの割り当てとフォーカスは表示するときに rebind で行う。
+        """
+        self.prepared_quiz = None
+        self._question_text = quiz.question
+        self._layout_question(self.controller.question_wrap_width)
+        self._show_image(quiz.image)
+        yield
+
+        if quiz.type is QuestionType.CHOICE:
+            self.input_frame.grid_remove()
+            self.submit_button.grid_remove()
+            choices = quiz.choices
+            while len(self.choice_buttons) < len(choices):
+                i = len(self.choice_buttons)
+                btn = tk.Button(self, font=self.controller.default_font,
+                                command=lambda choice_idx=i: self.check_choice_answer(choice_idx))
+                self.choice_buttons.append(btn)
+            for i, btn in enumerate(self.choice_buttons):
+                if i < len(choices):
+                    btn.config(text=choices[i])
+                    btn.grid(row=i+3, column=0, pady=5, sticky="ew")
+                    yield
+                else:
+                    btn.grid_remove()
+        else: # "fill_in"
+            for btn in self.choice_buttons:
+                btn.grid_remove()
+            self.input_frame.grid(row=3, column=0, pady=20, sticky="ew")
+            self.submit_button.grid(row=4, column=0, pady=10)
+            self.entry.delete(0, tk.END)
+        self.prepared_quiz = quiz
+
+    def _show_image(self, name):
+        # 読み込み済みならすぐに表示し、まだなら読み込みを頼んで届いたときに表示する
+        self._image_name = name
+        if name is None:
+            self._image = None
+            self.image_label.config(image="", text="")
+            self.image_label.grid_remove()
+            return
+        self.image_label.grid(row=2, column=0, pady=(0, 10))
+        image = self.controller.media.get(name)
+        if image is not None:
+            self._set_image(name, image)
+        else:
+            self._image = None
+            self.image_label.config(image="", text="画像を読み込んでいます…")
+            self.controller.media.request(name, lambda image: self._set_image(name, image))
+
+    def _set_image(self, name, image):
+        if name != self._image_name: # 読み込み中に別の問題に変わった
+            return
+        self._image = image
+        if image is None:
+            self.image_label.config(image="", text=f"画像を読み込めませんでした ({name})")
+        else:
+            self.image_label.config(image=image, text="")
+
+    def _layout_question(self, width):
+        # 同じ問題文を同じ幅で折り返した結果はキャッシュから取り出す
+        self._wrap_width = width
+        with self.controller.metrics.timed("wrap_question"):
+            lines = self.controller.text_layout.wrap(self._question_text, self.controller.question_font, width)
+        self.question_label.config(text="\n".join(lines))
+
+    def _on_resize(self, event):
+        # 大きさの変更中は何度も呼ばれるので、落ち着くまで折り返しを待つ
+        width = max(1, event.width - QUESTION_TEXT_MARGIN)
+        if self._resize_job is not None:
+            self.after_cancel(self._resize_job)
+            self._resize_job = None
+        if width != self._wrap_width:
+            self._resize_job = self.after(RESIZE_DEBOUNCE_MS, self._apply_resize, width)
+
+    def _apply_resize(self, width):
+        self._resize_job = None
+        self.controller.question_wrap_width = width
+        if self._question_text is not None and width != self._wrap_width:
+            self._layout_question(width)
+
+    def rebind(self, **kwargs):
+        """現在の問題を表示する (先読みで組み立て済みなら、キーの割り当てだけを行う)"""
+        quiz = self.controller.session.current
+        if self.prepared_quiz is not quiz:
+            for _ in self.prepare(quiz):
+                pass
+        self.prepared_quiz = None # 表示したら組み立て済みの扱いをやめる (入力が残るため)
+        self.timer_label.config(text="")
+        self.controller.session.mark_shown()
+        self.controller.start_countdown(self.timer_label)
+        # 問題を解いているあいだに、次以降の問題の画像を読み込んでおく
+        self.controller.media.prefetch(q.image for q in self.controller.session.upcoming() if q.image)
+
+        if quiz.type is QuestionType.CHOICE:
+            for i in range(len(quiz.choices)):
                 self.controller.bind(f"<KeyPress-{i+1}>", lambda event, choice_idx=i: self.check_choice_answer(choice_idx))
         else: # "fill_in"
-            input_frame = tk.Frame(self)
-            input_frame.grid(row=1, column=0, pady=20, sticky="ew")
-            input_frame.grid_columnconfigure(1, weight=1)
-            
-            answer_label = tk.Label(input_frame, text="こたえ:", font=controller.default_font)
-            answer_label.grid(row=0, column=0)
-            
-            self.entry = tk.Entry(input_frame, font=controller.default_font)
-            self.entry.grid(row=0, column=1, padx=10, sticky="ew")
-            self.entry.bind("<Return>", self.check_fill_in_answer)
             self.entry.focus_set()
 
-            submit_button = tk.Button(self, text="決定", font=controller.default_font, command=self.check_fill_in_answer)
-            submit_button.grid(row=2, column=0, pady=10)
-
     def check_choice_answer(self, choice_index):
-        quiz = self.controller.selected_quiz_data[self.controller.current_quiz_index]
-        is_correct = (choice_index == quiz["correct_choice_index"])
-        if not is_correct:
-            self.controller.record_wrong_answer()
-        
-        result_info = {
-            "is_correct": is_correct,
-            "player_answer": quiz["choices"][choice_index],
-            "correct_answer_text": f'せいかいは: {quiz["choices"][quiz["correct_choice_index"]]}'
-        }
+        with self.controller.metrics.timed("grade"):
+            result_info = self.controller.session.answer_choice(choice_index)
         self.controller.switch_frame("ResultFrame", result_info=result_info)
         
     def check_fill_in_answer(self, event=None):
@@ -318,83 +1053,189 @@ class QuizFrame(tk.Frame):
         if not player_answer:
             return
 
-        quiz = self.controller.selected_quiz_data[self.controller.current_quiz_index]
-        # 大文字小文字、前後の空白を無視して比較
-        is_correct = (player_answer.lower().strip() == quiz["answer"].lower().strip())
-        if not is_correct:
-            self.controller.record_wrong_answer()
-
-        result_info = {
-            "is_correct": is_correct,
-            "player_answer": player_answer,
-            "correct_answer_text": f'せいかいは: {quiz["answer"]}'
-        }
+        with self.controller.metrics.timed("grade"):
+            result_info = self.controller.session.answer_text(player_answer)
         self.controller.switch_frame("ResultFrame", result_info=result_info)
 
 class ResultFrame(tk.Frame):
     """各問題の結果表示画面"""
-    def __init__(self, master, controller, result_info, **kwargs):
+    def __init__(self, master, controller, **kwargs):
         super().__init__(master)
         self.controller = controller
         self.grid_rowconfigure((0, 4), weight=1)
         self.grid_columnconfigure(0, weight=1)
 
-        result_msg, result_color = ("正解！", "green") if result_info["is_correct"] else (" ざんねん…", "red")
-            
-        result_label = tk.Label(self, text=result_msg, font=controller.result_font, fg=result_color)
-        result_label.grid(row=0, column=0, pady=20)
+        self.result_label = tk.Label(self, font=controller.result_font)
+        self.result_label.grid(row=0, column=0, pady=20)
         
-        answer_label = tk.Label(self, text=f"あなたの回答: {result_info['player_answer']}", font=controller.default_font)
-        answer_label.grid(row=1, column=0, pady=10)
+        self.answer_label = tk.Label(self, font=controller.default_font)
+        self.answer_label.grid(row=1, column=0, pady=10)
         
+        # 不正解のときだけ表示する
+        self.correct_label = tk.Label(self, font=controller.default_font)
+
+        self.next_button = tk.Button(self, text="次へ", font=controller.default_font, width=15, command=controller.next_question)
+        self.next_button.grid(row=3, column=0, pady=20)
+
+        # 問題数に終わりのないモードでは、好きなところで終了できるようにする
+        self.finish_button = tk.Button(self, text="ここで終了", font=controller.default_font, width=15,
+                                       command=controller.finish_quiz)
+
+    def rebind(self, result_info, **kwargs):
+        """今回の回答結果で表示を差し替える"""
+        result_msg, result_color = ("正解！", "green") if result_info["is_correct"] else (" ざんねん…", "red")
+        self.result_label.config(text=result_msg, fg=result_color)
+        self.answer_label.config(text=f"あなたの回答: {result_info['player_answer']}")
+
         if not result_info["is_correct"]:
-            correct_label = tk.Label(self, text=result_info["correct_answer_text"], font=controller.default_font)
-            correct_label.grid(row=2, column=0, pady=10)
+            self.correct_label.config(text=f'せいかいは: {result_info["correct_answer"]}')
+            self.correct_label.grid(row=2, column=0, pady=10)
+        else:
+            self.correct_label.grid_remove()
 
-        next_button = tk.Button(self, text="次へ", font=controller.default_font, width=15, command=controller.next_question)
-        next_button.grid(row=3, column=0, pady=20)
+        if self.controller.session.total is None:
+            self.finish_button.grid(row=4, column=0, pady=(0, 20))
+        else:
+            self.finish_button.grid_remove()
 
-        next_button.focus_set()
+        self.next_button.focus_set()
         self.controller.bind("<Return>", lambda event: self.controller.next_question())
 
+        # 結果を読んでいる間に次の問題の画面を組み立てておく
+        self.controller.prefetch_next_question()
+
 
 class FinalResultFrame(tk.Frame):
     """全問終了後の最終結果画面"""
     def __init__(self, master, controller, **kwargs):
         super().__init__(master)
         self.controller = controller
-        self.grid_rowconfigure((0, 4), weight=1)
+        self.grid_rowconfigure((0, 5), weight=1)
         self.grid_columnconfigure(0, weight=1)
 
-        total_questions = len(controller.selected_quiz_data)
-        wrong_answers = controller.wrong_answer_count
-
         final_msg_label = tk.Label(self, text="クイズ終了！", font=controller.title_font)
         final_msg_label.grid(row=0, column=0, pady=20)
 
-        score_text = f"全{total_questions}問中、不正解は {wrong_answers} 問でした。"
-        score_label = tk.Label(self, text=score_text, font=controller.question_font)
-        score_label.grid(row=1, column=0, pady=10)
+        self.score_label = tk.Label(self, font=controller.question_font)
+        self.score_label.grid(row=1, column=0, pady=10)
+
+        # 回答時間の合計・平均と、1問ごとの回答時間の一覧 (左) と、同じ区分のランキング (右)
+        self.time_label = tk.Label(self, font=controller.default_font)
+        self.time_label.grid(row=2, column=0)
+        lists_frame = tk.Frame(self)
+        lists_frame.grid(row=3, column=0, pady=5)
+        self.time_list = tk.Listbox(lists_frame, font=controller.small_font, height=6, width=30, activestyle="none")
+        self.time_list.grid(row=1, column=0, padx=(0, 10))
+        self.leaderboard_label = tk.Label(lists_frame, font=controller.small_font)
+        self.leaderboard_label.grid(row=0, column=1, sticky="w")
+        self.leaderboard_list = tk.Listbox(lists_frame, font=controller.small_font, height=LEADERBOARD_SIZE + 1,
+                                           width=26, activestyle="none")
+        self.leaderboard_list.grid(row=1, column=1, sticky="n")
 
         # やり直すボタン
         retry_button = tk.Button(self, text="同じクイズをやり直す", font=controller.default_font, width=20, command=self.retry_quiz)
-        retry_button.grid(row=2, column=0, pady=10)
+        retry_button.grid(row=4, column=0, pady=10)
 
         # ジャンル選択に戻るボタン
         back_to_selection_button = tk.Button(self, text="ジャンル選択に戻る", font=controller.default_font, width=20, command=lambda: controller.switch_frame("SelectionFrame"))
-        back_to_selection_button.grid(row=3, column=0, pady=5)
+        back_to_selection_button.grid(row=5, column=0, pady=5)
 
         exit_button = tk.Button(self, text="終了する", font=controller.default_font, width=15, command=self.controller.destroy)
-        exit_button.grid(row=4, column=0, pady=(20, 0))
+        exit_button.grid(row=6, column=0, pady=(20, 0))
+        self._leaderboard_job = None
+
+    def destroy(self):
+        self.cancel_leaderboard()
+        super().destroy()
+
+    def rebind(self, score=None, **kwargs):
+        """最新の成績で表示を差し替える (score は記録した成績の Future)"""
+        self.cancel_leaderboard()
+        self.show_leaderboard(score, time.monotonic() + SCORE_WAIT_MS / 1000)
+
+        # 出題数が事前に分からないモードもあるため、実際に回答した数を使う
+        session = self.controller.session
+        total_questions = session.answered_count
+        wrong_answers = session.wrong_count
+
+        if total_questions:
+            score_text = f"全{total_questions}問中、不正解は {wrong_answers} 問でした。"
+            if self.controller.selector is not None:
+                score_text += f"\n実力の推定値: {self.controller.selector.ability:+.2f}"
+        else:
+            score_text = "いま出題できる問題はありません。"
+        self.score_label.config(text=score_text)
+
+        self.time_list.delete(0, tk.END)
+        if not session.history:
+            self.time_label.config(text="")
+            return
+        total_time = session.used_ns / 1e9
+        time_text = f"回答時間: 合計 {total_time:.2f} 秒 / 平均 {total_time / total_questions:.2f} 秒"
+        if session.time_over():
+            time_text += " (制限時間に達しました)"
+        if len(session.history) < total_questions:
+            time_text += f"\n(一覧は直近の {len(session.history)} 問)"
+        self.time_label.config(text=time_text)
+        # 残っているのは直近の回答だけなので、番号は回答数から数え直す
+        first = total_questions - len(session.history) + 1
+        for n, (quiz, result) in enumerate(session.history, first):
+            mark = "○" if result["is_correct"] else "×"
+            self.time_list.insert(tk.END, f"{n:3}. {mark} {result['response_time']:6.2f} 秒  {quiz.question[:30]}")
+
+    def cancel_leaderboard(self):
+        """成績の書き込みを待つのをやめる"""
+        if self._leaderboard_job is not None:
+            self.after_cancel(self._leaderboard_job)
+            self._leaderboard_job = None
+
+    def show_leaderboard(self, score, deadline):
+        """同じジャンル・難易度・出題モードの上位の成績を表示し、今回の成績を選択状態にする
+
+        書き込みが終わっていなければ、画面を止めずに after で待つ (deadline を過ぎたらあきらめる)。
+        """
+        self._leaderboard_job = None
+        self.leaderboard_list.delete(0, tk.END)
+        if score is None:
+            self.leaderboard_label.config(text="")
+            return
+        # 書き込みは普段は数ミリ秒で終わる (他の成績とまとめて書く間だけ待つ)
+        if not score.done():
+            if time.monotonic() >= deadline:
+                self.leaderboard_label.config(text="成績の保存に時間がかかっています")
+                return
+            self.leaderboard_label.config(text="成績を保存しています…")
+            self._leaderboard_job = self.after(SCORE_POLL_MS, self.show_leaderboard, score, deadline)
+            return
+        if score.exception() is not None:
+            self.leaderboard_label.config(text=f"成績を保存できませんでした: {score.exception()}")
+            return
+        score = score.result()
+        scores = self.controller.scores
+        stats = scores.stats(score.genre, score.difficulty, score.mode)
+        heading = f"ランキング ({stats.plays} 回目"
+        heading += "・自己ベスト更新！)" if score.is_best else ")"
+        self.leaderboard_label.config(text=heading)
+        top = scores.leaderboard(score.genre, score.difficulty, score.mode, LEADERBOARD_SIZE)
+        for rank, entry in enumerate(top, 1):
+            date = time.strftime("%m/%d", time.localtime(entry.finished_at))
+            self.leaderboard_list.insert(
+                tk.END, f"{rank}. {entry.correct}/{entry.answered}問 {entry.total_ms / 1000:6.1f}秒 {date}")
+            if entry.id == score.id:
+                self.leaderboard_list.selection_set(rank - 1)
+        if all(entry.id != score.id for entry in top):
+            self.leaderboard_list.insert(tk.END, f"今回: {score.correct}/{score.answered}問 {score.total_ms / 1000:6.1f}秒")
 
     def retry_quiz(self):
         """同じ設定でクイズをやり直す"""
         # controller内のクイズ状態をリセットしてQuizFrameに遷移する
-        self.controller.current_quiz_index = 0
-        self.controller.wrong_answer_count = 0
-        self.controller.switch_frame("QuizFrame")
+        self.controller.session.restart()
+        self.controller.show_first_question()
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
     app = QuizApp()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
+    if app.startup_error is not None:
+        sys.exit(1)
\ No newline at end of file
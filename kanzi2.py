@@ -1,33 +1,32 @@
+import os
 import tkinter as tk
 from tkinter import font as tkfont
 
+from quiz_bank import find_sources, open_bank
+from quiz_fonts import load_fonts
+from quiz_model import QuestionType
+from quiz_session import QuizSession
+
 # --- ゲーム設定 ---
 GAME_TITLE = "Tkinter ハイブリッドクイズ"
 FONT_FAMILY = "Yu Gothic UI"
 FONT_SIZE_S = 12
 FONT_SIZE_M = 16
 FONT_SIZE_L = 24
+# 使用するフォントの希望順 (見つからなければ Tk の既定のフォントを使う)
+FONT_PREFERENCES = (FONT_FAMILY, "MisakiGothic", "美咲ゴシック", "MisakiGothic2nd", "美咲ゴシック第2", "MisakiMincho", "美咲明朝")
+
+# --- クイズデータ ---
+# 問題は quizzes/kanzi2/ 以下の JSON / CSV で管理し、起動時にバンクファイルへコンパイルして読み込む
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUIZ_SOURCE_DIR = os.path.join(BASE_DIR, "quizzes", "kanzi2")
+QUIZ_BANK_PATH = os.path.join(BASE_DIR, "quizzes", "kanzi2.bank")
 
-# --- クイズデータ (変更なし) ---
-QUIZ_DATA = [
-    {
-        "type": "choice",
-        "question": "日本で一番高い山は？",
-        "choices": ["1. 槍ヶ岳", "2. 富士山", "3. 北岳"],
-        "correct_choice_index": 1,
-    },
-    {
-        "type": "fill_in",
-        "question": "Pythonでリストの要素数を取得する関数は len() ですが、文字列の長さを取得する場合も同じ関数を使います。この関数 len は何の略でしょう？",
-        "answer": "length",
-    },
-    {
-        "type": "choice",
-        "question": "ことわざ「猫に○○」\n○○に入るのは？",
-        "choices": ["1. かつおぶし", "2. またたび", "3. こばん"],
-        "correct_choice_index": 2,
-    },
-]
+# --- フォント ---
+# 同梱の美咲フォントを起動時に登録し、決定したフォントと寸法をキャッシュする
+FONT_FILES = [os.path.join(BASE_DIR, name)
+              for name in ("misaki_gothic.ttf", "misaki_gothic_2nd.ttf", "misaki_mincho.ttf")]
+FONT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".kanzi", "fonts.json")
 
 class QuizApp(tk.Tk):
     """アプリケーション全体を管理するメインクラス"""
@@ -38,42 +37,51 @@ class QuizApp(tk.Tk):
         self.geometry("600x400") # ウィンドウサイズを少し拡大
         self.minsize(500, 350) # 最小サイズを指定
 
-        # フォントオブジェクトを定義
-        self.title_font = tkfont.Font(family=FONT_FAMILY, size=FONT_SIZE_L, weight="bold")
-        self.question_font = tkfont.Font(family=FONT_FAMILY, size=FONT_SIZE_M)
-        self.result_font = tkfont.Font(family=FONT_FAMILY, size=FONT_SIZE_L, weight="bold")
-        self.default_font = tkfont.Font(family=FONT_FAMILY, size=FONT_SIZE_M)
+        # フォントオブジェクトを定義 (ファミリーは同梱フォントを含めた候補から一度だけ決める)
+        self.fonts = load_fonts(self, FONT_PREFERENCES, FONT_FILES, FONT_CACHE_PATH)
+        self.title_font = tkfont.Font(family=self.fonts.family, size=FONT_SIZE_L, weight="bold")
+        self.question_font = tkfont.Font(family=self.fonts.family, size=FONT_SIZE_M)
+        self.result_font = tkfont.Font(family=self.fonts.family, size=FONT_SIZE_L, weight="bold")
+        self.default_font = tkfont.Font(family=self.fonts.family, size=FONT_SIZE_M)
 
-        # クイズの状態を管理
-        self.current_quiz_index = 0
-        self.wrong_answer_count = 0 # 間違えた問題数を記録
+        # 問題バンクの先頭の区間を出題する
+        self.bank = open_bank(QUIZ_BANK_PATH, find_sources(QUIZ_SOURCE_DIR))
+        genre = self.bank.genres()[0]
+        difficulty = self.bank.difficulties(genre)[0]
 
+        # クイズの状態を管理 (出題順と採点は QuizSession が受け持つ)
+        self.session = QuizSession(self.bank.section(genre, difficulty))
+
+        # 一度生成したフレームはクラス名ごとに保持し、画面遷移では中身だけを差し替える
+        self._frames = {}
         self._frame = None
+        # gridを使用してウィンドウサイズ変更に追従させる
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
         self.switch_frame("TitleFrame")
 
     def switch_frame(self, frame_class_name, **kwargs):
         """指定された名前のフレームに切り替える"""
-        if self._frame:
-            self._frame.destroy()
-        
-        FrameClass = globals()[frame_class_name]
-        self._frame = FrameClass(master=self, controller=self, **kwargs)
-        # gridを使用してウィンドウサイズ変更に追従させる
-        self.grid_rowconfigure(0, weight=1)
-        self.grid_columnconfigure(0, weight=1)
-        self._frame.grid(row=0, column=0, sticky="nsew", padx=20, pady=20)
+        frame = self._frames.get(frame_class_name)
+        if frame is None:
+            FrameClass = globals()[frame_class_name]
+            frame = FrameClass(master=self, controller=self)
+            self._frames[frame_class_name] = frame
+
+        # 表示内容を新しいデータで差し替えてから表示する
+        frame.rebind(**kwargs)
+        if frame is not self._frame:
+            if self._frame:
+                self._frame.grid_remove()
+            frame.grid(row=0, column=0, sticky="nsew", padx=20, pady=20)
+            self._frame = frame
 
     def next_question(self):
         """次の問題に進むか、最終結果を表示する"""
-        self.current_quiz_index += 1
-        if self.current_quiz_index < len(QUIZ_DATA):
+        if self.session.advance():
             self.switch_frame("QuizFrame")
         else:
             self.switch_frame("FinalResultFrame")
-            
-    def record_wrong_answer(self):
-        """不正解の数をカウント"""
-        self.wrong_answer_count += 1
 
 
 class TitleFrame(tk.Frame):
@@ -96,6 +104,9 @@ class TitleFrame(tk.Frame):
                                  command=lambda: controller.switch_frame("QuizFrame"))
         start_button.grid(row=2, column=0, pady=20)
 
+    def rebind(self, **kwargs):
+        """タイトル画面は表示内容が変わらない"""
+
 
 class QuizFrame(tk.Frame):
     """クイズ画面"""
@@ -104,85 +115,97 @@ class QuizFrame(tk.Frame):
         self.controller = controller
         self.grid_columnconfigure(0, weight=1)
 
-        quiz = QUIZ_DATA[controller.current_quiz_index]
-        
         # --- UI改善: wraplengthでテキストを自動折り返し ---
-        question_label = tk.Label(self, text=quiz["question"], font=controller.question_font, 
-                                  wraplength=450, justify="left")
-        question_label.grid(row=0, column=0, pady=20, sticky="w")
-
-        if quiz["type"] == "choice":
-            for i, choice in enumerate(quiz["choices"]):
-                btn = tk.Button(self, text=choice, font=controller.default_font, 
+        self.question_label = tk.Label(self, font=controller.question_font,
+                                       wraplength=450, justify="left")
+        self.question_label.grid(row=0, column=0, pady=20, sticky="w")
+
+        # 選択肢ボタンは必要な数だけ作り、以降の問題では使い回す
+        self.choice_buttons = []
+
+        # 記述式の入力欄 (記述式の問題のときだけ表示する)
+        self.input_frame = tk.Frame(self)
+        self.input_frame.grid_columnconfigure(1, weight=1)
+
+        answer_label = tk.Label(self.input_frame, text="こたえ:", font=controller.default_font)
+        answer_label.grid(row=0, column=0)
+
+        self.entry = tk.Entry(self.input_frame, font=controller.default_font)
+        self.entry.grid(row=0, column=1, padx=10, sticky="ew")
+        self.entry.bind("<Return>", self.check_fill_in_answer)
+
+        self.submit_button = tk.Button(self, text="決定", font=controller.default_font,
+                                       command=self.check_fill_in_answer)
+
+    def rebind(self, **kwargs):
+        """現在の問題の内容でウィジェットを差し替える"""
+        quiz = self.controller.session.current
+        self.question_label.config(text=quiz.question)
+
+        if quiz.type is QuestionType.CHOICE:
+            self.input_frame.grid_remove()
+            self.submit_button.grid_remove()
+            choices = quiz.choices
+            while len(self.choice_buttons) < len(choices):
+                i = len(self.choice_buttons)
+                btn = tk.Button(self, font=self.controller.default_font,
                                 command=lambda choice_idx=i: self.check_choice_answer(choice_idx))
-                btn.grid(row=i+1, column=0, pady=5, sticky="ew") # sticky="ew"で横幅を合わせる
+                self.choice_buttons.append(btn)
+            for i, btn in enumerate(self.choice_buttons):
+                if i < len(choices):
+                    btn.config(text=choices[i])
+                    btn.grid(row=i+1, column=0, pady=5, sticky="ew") # sticky="ew"で横幅を合わせる
+                else:
+                    btn.grid_remove()
         else: # "fill_in"
-            input_frame = tk.Frame(self)
-            input_frame.grid(row=1, column=0, pady=20, sticky="ew")
-            input_frame.grid_columnconfigure(1, weight=1)
-            
-            answer_label = tk.Label(input_frame, text="こたえ:", font=controller.default_font)
-            answer_label.grid(row=0, column=0)
-            
-            self.entry = tk.Entry(input_frame, font=controller.default_font)
-            self.entry.grid(row=0, column=1, padx=10, sticky="ew")
-            self.entry.bind("<Return>", self.check_fill_in_answer)
+            for btn in self.choice_buttons:
+                btn.grid_remove()
+            self.input_frame.grid(row=1, column=0, pady=20, sticky="ew")
+            self.submit_button.grid(row=2, column=0, pady=10)
+            self.entry.delete(0, tk.END)
             self.entry.focus_set() # 入力欄にフォーカスを合わせる
 
-            submit_button = tk.Button(self, text="決定", font=controller.default_font,
-                                      command=self.check_fill_in_answer)
-            submit_button.grid(row=2, column=0, pady=10)
-
     def check_choice_answer(self, choice_index):
-        quiz = QUIZ_DATA[self.controller.current_quiz_index]
-        is_correct = (choice_index == quiz["correct_choice_index"])
-        if not is_correct:
-            self.controller.record_wrong_answer() # 不正解を記録
-        
-        result_info = {
-            "is_correct": is_correct,
-            "player_answer": quiz["choices"][choice_index],
-            "correct_answer_text": f'せいかいは: {quiz["choices"][quiz["correct_choice_index"]]}'
-        }
+        result_info = self.controller.session.answer_choice(choice_index)
         self.controller.switch_frame("ResultFrame", result_info=result_info)
         
     def check_fill_in_answer(self, event=None):
         player_answer = self.entry.get()
-        quiz = QUIZ_DATA[self.controller.current_quiz_index]
-        is_correct = (player_answer.lower() == quiz["answer"].lower())
-        if not is_correct:
-            self.controller.record_wrong_answer() # 不正解を記録
-
-        result_info = {
-            "is_correct": is_correct,
-            "player_answer": player_answer,
-            "correct_answer_text": f'せいかいは: {quiz["answer"]}'
-        }
+        result_info = self.controller.session.answer_text(player_answer)
         self.controller.switch_frame("ResultFrame", result_info=result_info)
 
 class ResultFrame(tk.Frame):
     """各問題の結果表示画面"""
-    def __init__(self, master, controller, result_info, **kwargs):
+    def __init__(self, master, controller, **kwargs):
         super().__init__(master)
         self.controller = controller
         self.grid_rowconfigure((0, 4), weight=1)
         self.grid_columnconfigure(0, weight=1)
 
-        result_msg, result_color = ("★ せいかい！ ★", "green") if result_info["is_correct"] else ("＞ ざんねん…", "red")
-            
-        result_label = tk.Label(self, text=result_msg, font=controller.result_font, fg=result_color)
-        result_label.grid(row=0, column=0, pady=20)
+        self.result_label = tk.Label(self, font=controller.result_font)
+        self.result_label.grid(row=0, column=0, pady=20)
         
-        answer_label = tk.Label(self, text=f"あなたの回答: {result_info['player_answer']}", font=controller.default_font)
-        answer_label.grid(row=1, column=0, pady=10)
+        self.answer_label = tk.Label(self, font=controller.default_font)
+        self.answer_label.grid(row=1, column=0, pady=10)
         
-        if not result_info["is_correct"]:
-            correct_label = tk.Label(self, text=result_info["correct_answer_text"], font=controller.default_font)
-            correct_label.grid(row=2, column=0, pady=10)
+        # 不正解のときだけ表示する
+        self.correct_label = tk.Label(self, font=controller.default_font)
 
         next_button = tk.Button(self, text="次の問題へ", font=controller.default_font, width=15, command=controller.next_question)
         next_button.grid(row=3, column=0, pady=20)
 
+    def rebind(self, result_info, **kwargs):
+        """今回の回答結果で表示を差し替える"""
+        result_msg, result_color = ("★ せいかい！ ★", "green") if result_info["is_correct"] else ("＞ ざんねん…", "red")
+        self.result_label.config(text=result_msg, fg=result_color)
+        self.answer_label.config(text=f"あなたの回答: {result_info['player_answer']}")
+
+        if not result_info["is_correct"]:
+            self.correct_label.config(text=f'せいかいは: {result_info["correct_answer"]}')
+            self.correct_label.grid(row=2, column=0, pady=10)
+        else:
+            self.correct_label.grid_remove()
+
 
 class FinalResultFrame(tk.Frame):
     """全問終了後の最終結果画面"""
@@ -192,19 +215,23 @@ class FinalResultFrame(tk.Frame):
         self.grid_rowconfigure((0, 3), weight=1)
         self.grid_columnconfigure(0, weight=1)
 
-        total_questions = len(QUIZ_DATA)
-        wrong_answers = controller.wrong_answer_count
-
         final_msg_label = tk.Label(self, text="クイズ終了！", font=controller.title_font)
         final_msg_label.grid(row=0, column=0, pady=20)
 
-        score_text = f"全{total_questions}問中、不正解は {wrong_answers} 問でした。"
-        score_label = tk.Label(self, text=score_text, font=controller.question_font)
-        score_label.grid(row=1, column=0, pady=10)
+        self.score_label = tk.Label(self, font=controller.question_font)
+        self.score_label.grid(row=1, column=0, pady=10)
 
         exit_button = tk.Button(self, text="終了する", font=controller.default_font, width=15, command=self.controller.destroy)
         exit_button.grid(row=2, column=0, pady=20)
 
+    def rebind(self, **kwargs):
+        """最新の成績で表示を差し替える"""
+        total_questions = self.controller.session.answered_count
+        wrong_answers = self.controller.session.wrong_count
+
+        score_text = f"全{total_questions}問中、不正解は {wrong_answers} 問でした。"
+        self.score_label.config(text=score_text)
+
 
 if __name__ == "__main__":
     app = QuizApp()
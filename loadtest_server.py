@@ -0,0 +1,131 @@
+"""quiz_server の負荷試験
+
+多数の WebSocket クライアントを同時に接続し、それぞれがクイズを最後まで解く。
+同時セッション数、回答のスループット、採点レイテンシ (往復時間とサーバ内の採点時間) の
+p50 / p99 を表示する。
+
+    python loadtest_server.py --clients 300 --rounds 5           # サーバをこのプロセス内で起動する
+    python loadtest_server.py --url ws://192.168.0.10:8765/ws --clients 300
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+from urllib.parse import urlparse
+
+from quiz_server import (OP_CLOSE, OP_TEXT, encode_frame, read_message, start_server,
+                         websocket_accept)
+
+
+class Client:
+    """ロードテスト用の最小限の WebSocket クライアント"""
+    async def connect(self, url):
+        parsed = urlparse(url)
+        self.reader, self.writer = await asyncio.open_connection(parsed.hostname, parsed.port or 80)
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        self.writer.write((f"GET {parsed.path or '/'} HTTP/1.1\r\nHost: {parsed.netloc}\r\n"
+                           "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                           f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode("latin-1"))
+        status = await self.reader.readline()
+        headers = {}
+        while True:
+            line = (await self.reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if b" 101 " not in status or headers.get("sec-websocket-accept") != websocket_accept(key):
+            raise ConnectionError(f"WebSocket の接続に失敗しました: {status!r}")
+
+    async def request(self, message):
+        self.writer.write(encode_frame(OP_TEXT, json.dumps(message, ensure_ascii=False).encode("utf-8"), mask=True))
+        text = await read_message(self.reader, self.writer)
+        return json.loads(text)
+
+    async def close(self):
+        self.writer.write(encode_frame(OP_CLOSE, b"", mask=True))
+        await self.writer.drain()
+        self.writer.close()
+
+
+async def play(url, genre, difficulty, rounds, stats):
+    """1人ぶんのプレイ: rounds 回クイズを最後まで解く"""
+    client = Client()
+    await client.connect(url)
+    stats["active"] += 1
+    stats["peak"] = max(stats["peak"], stats["active"])
+    try:
+        for _ in range(rounds):
+            message = await client.request({"op": "start", "genre": genre, "difficulty": difficulty})
+            while message["op"] == "question":
+                if message["type"] == "choice":
+                    answer = {"op": "answer", "choice": 0}
+                else:
+                    answer = {"op": "answer", "text": "こたえ"}
+                start = time.perf_counter()
+                result = await client.request(answer)
+                stats["rtt"].append(time.perf_counter() - start)
+                stats["grade_us"].append(result["grade_us"])
+                message = await client.request({"op": "next"})
+    finally:
+        stats["active"] -= 1
+        await client.close()
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))]
+
+
+async def run(args):
+    server = None
+    url = args.url
+    if url is None:
+        server, quiz_server = await start_server("127.0.0.1", 0)
+        url = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}/ws"
+        bank = quiz_server.bank
+        genre = args.genre or bank.genres()[0]
+        difficulty = args.difficulty or bank.difficulties(genre)[0]
+    else:
+        genre, difficulty = args.genre, args.difficulty
+        if not genre or not difficulty:
+            raise SystemExit("--url を指定する場合は --genre と --difficulty も指定してください")
+
+    stats = {"rtt": [], "grade_us": [], "active": 0, "peak": 0}
+    start = time.perf_counter()
+    results = await asyncio.gather(*(play(url, genre, difficulty, args.rounds, stats)
+                                     for _ in range(args.clients)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+    errors = [r for r in results if isinstance(r, Exception)]
+    answers = len(stats["rtt"])
+    print(f"clients           {args.clients} (同時セッションの最大 {stats['peak']}, 失敗 {len(errors)})")
+    print(f"answers           {answers} in {elapsed:.2f} s")
+    print(f"answers/s         {answers / elapsed:.0f}")
+    if answers:
+        print(f"round trip  p50   {percentile(stats['rtt'], 0.5) * 1000:.2f} ms")
+        print(f"round trip  p99   {percentile(stats['rtt'], 0.99) * 1000:.2f} ms")
+        print(f"grading     p50   {percentile(stats['grade_us'], 0.5):.1f} us")
+        print(f"grading     p99   {percentile(stats['grade_us'], 0.99):.1f} us")
+    if errors:
+        print(f"最初のエラー: {errors[0]!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="quiz_server の負荷試験")
+    parser.add_argument("--url", help="接続先 (省略時はこのプロセス内でサーバを起動する)")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=3, help="1クライアントあたりのプレイ回数")
+    parser.add_argument("--genre")
+    parser.add_argument("--difficulty")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""項目反応理論 (ラッシュモデル) による適応型の出題
+
+プレイヤーの能力 θ と問題ごとの難しさ b を同じ尺度 (ロジット) で推定し、
+正解する確率を P = 1 / (1 + exp(-(θ - b))) とみなす。問題の情報量 P(1 - P) は
+b が θ に近いほど大きいので、今の θ に最も近い難しさの問題を出題する。
+
+推定は回答のたびに1歩ずつ更新する (Elo レーティングと同じ形の、対数尤度の確率的勾配法)。
+歩幅は回答数とともに小さくし、下限を設けて上達や難しさの見直しにも追従させる。
+問題の難しさは1人のプレイヤーの回答からしか分からないため、能力より小さい歩幅で動かす。
+難しさの初期値は問題ファイルの難易度の区分 (DIFFICULTY_PRIORS) から決める。
+
+出題候補は、全問題を難しさの幅 BUCKET_WIDTH ごとのバケットに分けた索引から選ぶ。
+θ のバケットから外側へ順に見て、最初に見つかった未出題の問題を (バケット内では無作為に) 選ぶので、
+バンク全体を対象にしても1問の選択はバケットの数に比例する時間で済む。
+バケット内の問題の情報量は最大値との差が BUCKET_WIDTH² / 16 以下に収まる。
+QuizSession の出題元 (lookahead=0) とリスナーとして組み合わせて使う。
+"""
+import json
+import math
+import os
+import random
+from array import array
+
+# 難易度の区分ごとの難しさの初期値 (ロジット。ない区分は 0)
+DIFFICULTY_PRIORS = {"初級": -1.0, "中級": 0.0, "上級": 1.0}
+MIN_LOGIT = -4.0
+MAX_LOGIT = 4.0
+BUCKET_WIDTH = 0.25
+N_BUCKETS = int((MAX_LOGIT - MIN_LOGIT) / BUCKET_WIDTH)
+STEP_DECAY = 10        # この回答数ごとに歩幅が 1/2, 1/3, ... になる
+# (回答数 0 のときの歩幅, 歩幅の下限)
+ABILITY_STEP = (1.0, 0.1)
+DIFFICULTY_STEP = (0.2, 0.05)
+
+
+def probability(ability, difficulty):
+    """能力 ability のプレイヤーが難しさ difficulty の問題に正解する確率"""
+    return 1.0 / (1.0 + math.exp(difficulty - ability))
+
+
+def step_size(responses, step):
+    """回答数 responses の推定値を1回答ぶん動かす歩幅 (step は (初期値, 下限))"""
+    initial, minimum = step
+    return max(minimum, initial / (1 + responses / STEP_DECAY))
+
+
+def bucket_of(value):
+    """ロジット value が入るバケットの番号"""
+    return min(N_BUCKETS - 1, max(0, int((value - MIN_LOGIT) / BUCKET_WIDTH)))
+
+
+def _clamp(value):
+    return min(MAX_LOGIT, max(MIN_LOGIT, value))
+
+
+def _move(buckets, positions, item, old, new):
+    # 末尾の問題を item の位置に移してから、item を新しいバケットの末尾に加える
+    items = buckets[old]
+    last = items.pop()
+    if last != item:
+        items[positions[item]] = last
+        positions[last] = positions[item]
+    positions[item] = len(buckets[new])
+    buckets[new].append(item)
+
+
+class ItemIndex:
+    """問題バンクの全問題を難しさでバケットに分けた索引
+
+    問題本体は持たず、問題ごとに区間番号・レコードのオフセット・難しさ・回答数だけを持つ。
+    バケットはバンク全体のものとジャンルごとのものを持つ。バケット内の位置も覚えておき、
+    難しさが変わった問題は末尾の問題と入れ替えて取り除くので、バケットの大きさによらず移せる。
+    """
+    def __init__(self, bank, params=None):
+        self.bank = bank
+        self.params = params or {}          # 保存済みの {問題ID: [難しさ, 回答数]}
+        self.sections = []                  # 区間番号 -> 区間 (BankSection。索引を作った時点の内容を読む)
+        self.ids = []                       # 問題番号 -> 問題ID
+        self._section_of = array("I")       # 問題番号 -> 区間番号
+        self._offsets = array("Q")          # 問題番号 -> レコードのオフセット
+        self.difficulty = array("d")        # 問題番号 -> 難しさ
+        self.responses = array("I")         # 問題番号 -> 回答数
+        self._item_of = {}                  # 問題ID -> 問題番号
+        self.buckets = {None: [[] for _ in range(N_BUCKETS)]}   # ジャンル (None は全体) -> バケットのリスト
+        self._positions = array("I")        # 問題番号 -> 全体のバケット内の位置
+        self._genre_positions = array("I")  # 問題番号 -> ジャンルのバケット内の位置
+        self.complete = False
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, section_no, offset, quiz):
+        """1問を索引に加える"""
+        item = len(self.ids)
+        saved = self.params.get(quiz.id)
+        if saved:
+            difficulty, responses = saved
+        else:
+            difficulty, responses = DIFFICULTY_PRIORS.get(quiz.difficulty, 0.0), 0
+        self.ids.append(quiz.id)
+        self._section_of.append(section_no)
+        self._offsets.append(offset)
+        self.difficulty.append(difficulty)
+        self.responses.append(responses)
+        self._item_of[quiz.id] = item
+        genre_buckets = self.buckets.get(quiz.genre)
+        if genre_buckets is None:
+            genre_buckets = self.buckets[quiz.genre] = [[] for _ in range(N_BUCKETS)]
+        bucket = bucket_of(difficulty)
+        self._positions.append(len(self.buckets[None][bucket]))
+        self.buckets[None][bucket].append(item)
+        self._genre_positions.append(len(genre_buckets[bucket]))
+        genre_buckets[bucket].append(item)
+
+    def build_steps(self, chunk_size=500):
+        """バンクの問題を chunk_size 問ずつ索引に加えるジェネレータ (区切りごとに yield する)"""
+        added = 0
+        for genre in self.bank.genres():
+            for difficulty in self.bank.difficulties(genre):
+                section_no = len(self.sections)
+                section = self.bank.section(genre, difficulty)
+                self.sections.append(section)
+                for offset, quiz in section.iter_records():
+                    self.add(section_no, offset, quiz)
+                    added += 1
+                    if added % chunk_size == 0:
+                        yield
+        self.complete = True
+
+    def build(self):
+        """索引をまとめて作る"""
+        for _ in self.build_steps():
+            pass
+        return self
+
+    def question(self, item):
+        """問題番号の問題を1問だけデコードする"""
+        return self.sections[self._section_of[item]].question_at(self._offsets[item])
+
+    def item_of(self, quiz):
+        """問題の問題番号 (索引にない問題は None)"""
+        return self._item_of.get(quiz.id)
+
+    def update(self, item, ability, is_correct):
+        """回答結果で問題の難しさを更新し、バケットを移す"""
+        old = self.difficulty[item]
+        residual = is_correct - probability(ability, old)
+        new = _clamp(old - step_size(self.responses[item], DIFFICULTY_STEP) * residual)
+        self.difficulty[item] = new
+        self.responses[item] += 1
+        if bucket_of(new) != bucket_of(old):
+            genre = self.sections[self._section_of[item]].genre
+            _move(self.buckets[None], self._positions, item, bucket_of(old), bucket_of(new))
+            _move(self.buckets[genre], self._genre_positions, item, bucket_of(old), bucket_of(new))
+
+    def state(self):
+        """保存用の難しさ {問題ID: [難しさ, 回答数]} (回答のあった問題だけ)"""
+        return {
+            question_id: [self.difficulty[item], self.responses[item]]
+            for item, question_id in enumerate(self.ids)
+            if self.responses[item]
+        }
+
+
+class AdaptiveSelector:
+    """今の能力の推定値で情報量が最大になる問題を1問ずつ出題する
+
+    genre を指定するとそのジャンルの問題だけ、None ならバンク全体から選ぶ。
+    length 問出題するか、未出題の問題がなくなると終わる。同じ回の中では同じ問題を出さない。
+    """
+    def __init__(self, index, ability=0.0, responses=0, genre=None, length=20, rng=random):
+        self.index = index
+        self.ability = ability
+        self.responses = responses    # これまでの回答数 (歩幅を決める)
+        self.length = length
+        self.rng = rng
+        self._buckets = index.buckets.get(genre) or [[] for _ in range(N_BUCKETS)]
+        self._asked = set()
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        self._asked = set()
+        for _ in range(self.length):
+            item = self.pick()
+            if item is None:
+                return
+            self._asked.add(item)
+            yield self.index.question(item)
+
+    def pick(self):
+        """情報量が最大の未出題の問題番号 (なければ None)"""
+        center = bucket_of(self.ability)
+        # 同じ距離のバケットは、θ に近い側を先に見る
+        upper_first = self.ability - MIN_LOGIT >= (center + 0.5) * BUCKET_WIDTH
+        for distance in range(N_BUCKETS):
+            below, above = center - distance, center + distance
+            order = (above, below) if upper_first else (below, above)
+            for bucket in order[:1] if distance == 0 else order:
+                if 0 <= bucket < N_BUCKETS:
+                    item = self._take(self._buckets[bucket])
+                    if item is not None:
+                        return item
+        return None
+
+    def _take(self, items):
+        # 無作為に数回引き、出題済みばかりなら順に探す
+        if not items:
+            return None
+        for _ in range(4):
+            item = items[self.rng.randrange(len(items))]
+            if item not in self._asked:
+                return item
+        for item in items:
+            if item not in self._asked:
+                return item
+        return None
+
+    def record(self, quiz, is_correct):
+        """回答結果で能力と問題の難しさを更新する"""
+        item = self.index.item_of(quiz)
+        if item is None:
+            return
+        difficulty = self.index.difficulty[item]
+        residual = is_correct - probability(self.ability, difficulty)
+        # 問題の難しさは更新前の能力で更新する (同じ回答で両方を同時に動かす)
+        self.index.update(item, self.ability, is_correct)
+        self.ability = _clamp(self.ability + step_size(self.responses, ABILITY_STEP) * residual)
+        self.responses += 1
+
+    def on_answer(self, session, quiz, result):
+        """QuizSession のリスナーとして回答結果を受け取る"""
+        self.record(quiz, result["is_correct"])
+
+    def state(self):
+        """保存用の推定値 {"ability": [能力, 回答数], "items": {問題ID: [難しさ, 回答数]}}"""
+        return {"ability": [self.ability, self.responses], "items": self.index.state()}
+
+
+def load_params(path):
+    """保存済みの推定値を読み込む (なければ初期値)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            params = json.load(f)
+    except FileNotFoundError:
+        params = {}
+    params.setdefault("ability", [0.0, 0])
+    params.setdefault("items", {})
+    return params
+
+
+def save_params(path, params):
+    """推定値を保存する (索引にない問題の難しさは残す)"""
+    merged = load_params(path)
+    merged["ability"] = params["ability"]
+    merged["items"].update(params["items"])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(merged, f)
+    os.replace(tmp_path, path)
@@ -0,0 +1,162 @@
+"""回答ログの項目分析 (オフライン用、NumPy が必要)
+
+回答ログ (quiz_log.AnswerLog) を列ごとの NumPy 配列に読み込み、問題ごとに
+正答率、識別力 (上位27%と下位27%の正答率の差)、選択肢ごとの選択率、
+平均回答時間をまとめて計算する。正答率から見た難易度が現在の区分と
+合わない問題は、区分の変更候補として出力する。
+
+    python quiz_analysis.py ~/.kanzi/answers.log --bank quizzes/kanzi.bank
+"""
+import argparse
+import csv
+import sys
+
+import numpy as np
+
+from quiz_bank import QuizBank
+from quiz_log import RECORD, iter_batches
+
+# quiz_log.RECORD と同じ並び (詰め物なし)
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("session_id", "<u8"),
+    ("question_id", "<u8"),
+    ("response_ms", "<u4"),
+    ("choice_index", "<i2"),
+    ("is_correct", "u1"),
+    ("_pad", "u1"),
+    ("text_offset", "<u4"),
+    ("text_length", "<u2"),
+])
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+# 正答率がこの値以上なら、その難易度に分類する (上から順に判定)
+DIFFICULTY_THRESHOLDS = [(0.8, "初級"), (0.5, "中級"), (0.0, "上級")]
+GROUP_RATIO = 0.27
+
+
+def load_columns(path):
+    """回答ログを列ごとの配列 {列名: ndarray} に読み込む"""
+    blocks = []
+    with open(path, "rb") as f:
+        for count, payload, _ in iter_batches(f):
+            blocks.append(np.frombuffer(payload, dtype=RECORD_DTYPE, count=count))
+    records = np.concatenate(blocks) if blocks else np.empty(0, dtype=RECORD_DTYPE)
+    return {name: records[name] for name in RECORD_DTYPE.names if not name.startswith("_")}
+
+
+def analyze(columns, group_ratio=GROUP_RATIO):
+    """問題ごとの統計量を計算する"""
+    question_ids, q = np.unique(columns["question_id"], return_inverse=True)
+    n_questions = len(question_ids)
+    correct = columns["is_correct"].astype(np.float64)
+
+    responses = np.bincount(q, minlength=n_questions)
+    p_correct = np.bincount(q, weights=correct, minlength=n_questions) / responses
+    mean_response_ms = np.bincount(q, weights=columns["response_ms"], minlength=n_questions) / responses
+
+    # 選択肢ごとの選択率 (選択式の回答だけを対象にする)
+    choice = columns["choice_index"].astype(np.int64)
+    is_choice = choice >= 0
+    n_choices = int(choice.max()) + 1 if is_choice.any() else 0
+    choice_counts = np.bincount(q[is_choice] * n_choices + choice[is_choice],
+                                minlength=n_questions * n_choices).reshape(n_questions, n_choices)
+    choice_totals = choice_counts.sum(axis=1, keepdims=True)
+    choice_rate = np.divide(choice_counts, choice_totals, out=np.zeros(choice_counts.shape),
+                            where=choice_totals > 0)
+
+    # 識別力: セッションの得点で上位・下位の群に分け、群ごとの正答率の差をとる
+    _, s = np.unique(columns["session_id"], return_inverse=True)
+    session_score = np.bincount(s, weights=correct) / np.bincount(s)
+    low_cut, high_cut = np.quantile(session_score, [group_ratio, 1 - group_ratio])
+    event_score = session_score[s]
+    upper = event_score >= high_cut
+    lower = event_score <= low_cut
+    p_upper = _rate(q[upper], correct[upper], n_questions)
+    p_lower = _rate(q[lower], correct[lower], n_questions)
+    discrimination = p_upper - p_lower
+
+    return {
+        "question_id": question_ids,
+        "responses": responses,
+        "p_correct": p_correct,
+        "discrimination": discrimination,
+        "mean_response_ms": mean_response_ms,
+        "choice_rate": choice_rate,
+    }
+
+
+def _rate(q, correct, n_questions):
+    totals = np.bincount(q, minlength=n_questions)
+    hits = np.bincount(q, weights=correct, minlength=n_questions)
+    return np.divide(hits, totals, out=np.full(n_questions, np.nan), where=totals > 0)
+
+
+def suggest_difficulty(p_correct):
+    """正答率から難易度の区分を決める"""
+    labels = np.empty(len(p_correct), dtype=object)
+    assigned = np.zeros(len(p_correct), dtype=bool)
+    for threshold, label in DIFFICULTY_THRESHOLDS:
+        hit = ~assigned & (p_correct >= threshold)
+        labels[hit] = label
+        assigned |= hit
+    return labels
+
+
+def bank_labels(bank_path):
+    """バンクの全問題について {問題ID(整数): (ジャンル, 難易度, 問題文)} を作る"""
+    bank = QuizBank(bank_path)
+    labels = {}
+    for genre in bank.genres():
+        for difficulty in bank.difficulties(genre):
+            for quiz in bank.iter_section(genre, difficulty):
+                labels[quiz.uid] = (genre, difficulty, quiz.question)
+    return labels
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="回答ログの項目分析と難易度区分の見直し")
+    parser.add_argument("log", help="回答ログ (answers.log)")
+    parser.add_argument("--bank", help="現在の難易度区分を読むバンクファイル")
+    parser.add_argument("--min-responses", type=int, default=30, help="判定に必要な最低回答数")
+    parser.add_argument("--csv", metavar="FILE", help="全問題の統計を CSV に書き出す")
+    args = parser.parse_args(argv)
+
+    columns = load_columns(args.log)
+    if not len(columns["question_id"]):
+        print("回答ログが空です。", file=sys.stderr)
+        return 1
+    stats = analyze(columns)
+    suggested = suggest_difficulty(stats["p_correct"])
+    labels = bank_labels(args.bank) if args.bank else {}
+
+    if args.csv:
+        with open(args.csv, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            n_choices = stats["choice_rate"].shape[1]
+            writer.writerow(["question_id", "genre", "difficulty", "suggested", "responses", "p_correct",
+                             "discrimination", "mean_response_ms"] + [f"choice_{i}" for i in range(n_choices)])
+            for i, question_id in enumerate(stats["question_id"]):
+                genre, difficulty, _ = labels.get(int(question_id), ("", "", ""))
+                writer.writerow([f"{question_id:016x}", genre, difficulty, suggested[i], stats["responses"][i],
+                                 f"{stats['p_correct'][i]:.3f}", f"{stats['discrimination'][i]:.3f}",
+                                 f"{stats['mean_response_ms'][i]:.0f}"]
+                                + [f"{rate:.3f}" for rate in stats["choice_rate"][i]])
+
+    # 区分の変更候補: 回答数が十分で、正答率から見た区分が現在と異なる問題
+    enough = stats["responses"] >= args.min_responses
+    print(f"回答 {len(columns['question_id'])} 件, 問題 {len(stats['question_id'])} 問 "
+          f"(判定対象 {int(enough.sum())} 問)")
+    for i in np.flatnonzero(enough):
+        question_id = int(stats["question_id"][i])
+        if question_id not in labels:
+            continue
+        genre, difficulty, question = labels[question_id]
+        if suggested[i] != difficulty:
+            print(f"{genre}\t{difficulty} -> {suggested[i]}\t正答率 {stats['p_correct'][i]:.2f}\t"
+                  f"識別力 {stats['discrimination'][i]:+.2f}\t{question[:40]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,445 @@
+"""問題バンクのコンパイルと読み込み
+
+JSON / JSONL / CSV の問題ファイルを1つのバイナリファイル (.bank) にまとめ、
+(ジャンル, 難易度) ごとのオフセット索引を付ける。実行時は mmap で開き、
+必要な区間の問題だけをデコードする。
+
+    python quiz_bank.py compile quizzes/kanzi.bank quizzes/kanzi/*.json
+    python quiz_bank.py list quizzes/kanzi.bank
+
+.bank のレイアウト:
+    ヘッダ  <4sHxxQ>  マジック "KZQB", バージョン, 索引のオフセット
+    問題    <I> + JSON (UTF-8) を区間ごとに連続して格納
+    索引    JSON: {"sources": [...], "sections": [[ジャンル, 難易度, 開始, 問題数, 終了, ハッシュ], ...]}
+
+ハッシュは区間のバイト列の内容のハッシュで、問題ファイルを読み直したときに
+内容の変わった区間だけを差し替える (QuizBank.patch) のに使う。
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+from quiz_model import Question, QuestionTable
+
+BANK_MAGIC = b"KZQB"
+BANK_VERSION = 2
+HEADER = struct.Struct("<4sHxxQ")
+RECORD_LEN = struct.Struct("<I")
+
+
+class BankError(ValueError):
+    """問題ファイルやバンクファイルの形式が正しくない"""
+
+
+# --- 問題ファイルの読み込み ---
+
+def question_id(genre, difficulty, quiz):
+    """ジャンル・難易度・問題文から安定した問題IDを作る"""
+    key = f"{genre}\x1f{difficulty}\x1f{quiz['question']}".encode("utf-8")
+    return hashlib.blake2b(key, digest_size=8).hexdigest()
+
+
+def _read_json(path):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        # {ジャンル: {難易度: [問題, ...]}} の入れ子形式
+        for genre, difficulties in data.items():
+            for difficulty, quizzes in difficulties.items():
+                for quiz in quizzes:
+                    yield genre, difficulty, quiz
+    elif isinstance(data, list):
+        # 各問題が genre / difficulty を持つフラットな形式
+        for quiz in data:
+            quiz = dict(quiz)
+            yield quiz.pop("genre"), quiz.pop("difficulty"), quiz
+    else:
+        raise BankError(f"{path}: 未対応のJSON形式です")
+
+
+def _read_jsonl(path):
+    # 1行に1問、各問題が genre / difficulty を持つ形式 (1行ずつ読むので巨大なファイルにも使える)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                quiz = json.loads(line)
+                yield quiz.pop("genre"), quiz.pop("difficulty"), quiz
+
+
+# CSV の列: choices と aliases は "|" 区切り、keep_symbols は true / false (空欄は false)
+CSV_COLUMNS = ("genre", "difficulty", "type", "question", "choices", "correct_choice_index", "answer",
+               "aliases", "keep_symbols", "image", "id")
+CSV_BOOLEANS = {"": False, "false": False, "0": False, "true": True, "1": True}
+
+
+def _read_csv(path):
+    with open(path, encoding="utf-8", newline="") as f:
+        reader = csv.DictReader(f)
+        unknown = [name for name in reader.fieldnames or () if name not in CSV_COLUMNS]
+        if unknown:
+            # 読まない列を黙って捨てないようにする (keep_symbols の綴り間違いなど)
+            raise BankError(f"{path}: 未対応の列があります: {', '.join(unknown)}")
+        for row in reader:
+            quiz = {"type": row["type"], "question": row["question"]}
+            if row.get("choices"):
+                quiz["choices"] = row["choices"].split("|")
+            if row.get("correct_choice_index"):
+                quiz["correct_choice_index"] = int(row["correct_choice_index"])
+            if row.get("answer"):
+                quiz["answer"] = row["answer"]
+            if row.get("aliases"):
+                quiz["aliases"] = row["aliases"].split("|")
+            keep_symbols = CSV_BOOLEANS.get((row.get("keep_symbols") or "").strip().lower())
+            if keep_symbols is None:
+                raise BankError(f"{path}: keep_symbols は true / false にしてください: {row['keep_symbols']!r}")
+            if keep_symbols:
+                quiz["keep_symbols"] = True
+            if row.get("image"):
+                quiz["image"] = row["image"]
+            if row.get("id"):
+                quiz["id"] = row["id"]
+            yield row["genre"], row["difficulty"], quiz
+
+
+def read_source(path):
+    """問題ファイルから (ジャンル, 難易度, 問題) を順に返す"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        reader = _read_json
+    elif ext == ".jsonl":
+        reader = _read_jsonl
+    elif ext == ".csv":
+        reader = _read_csv
+    else:
+        raise BankError(f"{path}: 未対応のファイル形式です")
+    try:
+        for genre, difficulty, quiz in reader(path):
+            quiz.setdefault("id", question_id(genre, difficulty, quiz))
+            yield genre, difficulty, quiz
+    except BankError:
+        raise
+    except (KeyError, ValueError, TypeError) as e:
+        raise BankError(f"{path}: 問題の読み込みに失敗しました ({e!r})") from e
+
+
+def find_sources(directory):
+    """ディレクトリ内の問題ファイルをファイル名順に返す"""
+    paths = []
+    for pattern in ("*.json", "*.jsonl", "*.csv"):
+        paths += glob.glob(os.path.join(directory, pattern))
+    return sorted(paths)
+
+
+def expand_paths(paths):
+    """問題ファイルとディレクトリの並びを、問題ファイルのリストに展開する"""
+    sources = []
+    for path in paths:
+        sources += find_sources(path) if os.path.isdir(path) else [path]
+    return sources
+
+
+class FileSource:
+    """問題ファイルを出題元として1問ずつ読み出す (走査するたびにファイルを読み直す)"""
+    def __init__(self, path, genre=None, difficulty=None):
+        self.path = path
+        self.genre = genre
+        self.difficulty = difficulty
+
+    def __iter__(self):
+        table = QuestionTable()   # 1回の走査で読んだ問題どうしで選択肢などを共有する
+        for genre, difficulty, quiz in read_source(self.path):
+            if self.genre is not None and genre != self.genre:
+                continue
+            if self.difficulty is not None and difficulty != self.difficulty:
+                continue
+            yield Question.from_dict(quiz, genre, difficulty, table)
+
+
+# --- コンパイル ---
+
+def compile_bank(sources, out_path):
+    """問題ファイルをまとめてバンクファイルを書き出す"""
+    records = (record for path in sources for record in read_source(path))
+    return write_bank(records, out_path, sources)
+
+
+def section_digest(data):
+    """区間のバイト列の内容のハッシュ"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def encode_sections(records):
+    """(ジャンル, 難易度, 問題) の並びを区間ごとのバイト列にまとめる
+
+    {(ジャンル, 難易度): (バイト列, 問題数, ハッシュ)} を区間の出現順で返す。
+    """
+    parts = {}
+    for genre, difficulty, quiz in records:
+        data = json.dumps(quiz, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        section = parts.setdefault((genre, difficulty), [])
+        section.append(RECORD_LEN.pack(len(data)))
+        section.append(data)
+    sections = {}
+    for key, section in parts.items():
+        data = b"".join(section)
+        sections[key] = (data, len(section) // 2, section_digest(data))
+    return sections
+
+
+def read_sections(sources):
+    """問題ファイルを読み直して、区間ごとのバイト列にまとめる (QuizBank.patch に渡す)"""
+    return encode_sections(record for path in sources for record in read_source(path))
+
+
+def write_bank(records, out_path, sources):
+    """(ジャンル, 難易度, 問題) の並びをバンクファイルに書き出す
+
+    sources には元の問題ファイルを渡す (再コンパイルが必要かの判定に使う)。
+    """
+    index = []
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(BANK_MAGIC, BANK_VERSION, 0))
+        for (genre, difficulty), (data, count, digest) in encode_sections(records).items():
+            start = f.tell()
+            f.write(data)
+            index.append([genre, difficulty, start, count, f.tell(), digest])
+
+        index_offset = f.tell()
+        meta = {"sources": [os.path.basename(p) for p in sources], "sections": index}
+        f.write(json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+        f.seek(0)
+        f.write(HEADER.pack(BANK_MAGIC, BANK_VERSION, index_offset))
+    # 書き込み途中のファイルを読まれないよう、最後に置き換える
+    os.replace(tmp_path, out_path)
+    return index
+
+
+def is_stale(bank_path, sources):
+    """バンクファイルが問題ファイルより古い、または問題ファイルの構成が変わったかどうか"""
+    try:
+        bank_mtime = os.path.getmtime(bank_path)
+        meta = read_meta(bank_path)
+    except (OSError, BankError):
+        return True
+    if meta["sources"] != [os.path.basename(p) for p in sources]:
+        return True
+    return any(os.path.getmtime(p) > bank_mtime for p in sources)
+
+
+# --- 読み込み ---
+
+def _unpack_header(buf):
+    if len(buf) < HEADER.size:
+        raise BankError("バンクファイルが短すぎます")
+    magic, version, index_offset = HEADER.unpack_from(buf, 0)
+    if magic != BANK_MAGIC or version != BANK_VERSION:
+        raise BankError("バンクファイルの形式が異なります")
+    return index_offset
+
+
+def read_meta(bank_path):
+    """バンクファイルの索引部分だけを読む"""
+    with open(bank_path, "rb") as f:
+        index_offset = _unpack_header(f.read(HEADER.size))
+        f.seek(index_offset)
+        return json.loads(f.read().decode("utf-8"))
+
+
+class QuizBank:
+    """mmap したバンクファイルから、必要な区間の問題だけを取り出すクラス
+
+    区間は patch で問題ファイルの新しい内容に差し替えられる。差し替えた区間は
+    ファイルではなくメモリ上のバイト列から読む (バンクファイルは次回の起動時に作り直される)。
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        index_offset = _unpack_header(self._mm)
+        meta = json.loads(self._mm[index_offset:].decode("utf-8"))
+        # 索引だけを保持する: {ジャンル: {難易度: (バッファ, 開始, 問題数, 終了, ハッシュ, 表)}}
+        # 表 (QuestionTable) はその区間からデコードした問題で選択肢などを共有するためのもの
+        self._index = {}
+        for genre, difficulty, start, count, end, digest in meta["sections"]:
+            self._index.setdefault(genre, {})[difficulty] = (self._mm, start, count, end, digest, QuestionTable())
+
+    def genres(self):
+        """ジャンルの一覧"""
+        return list(self._index)
+
+    def difficulties(self, genre):
+        """指定したジャンルの難易度の一覧"""
+        return list(self._index[genre])
+
+    def count(self, genre, difficulty):
+        """区間の問題数"""
+        return self._index[genre][difficulty][2]
+
+    def digests(self):
+        """{(ジャンル, 難易度): 区間の内容のハッシュ}"""
+        return {(genre, difficulty): entry[4]
+                for genre, difficulties in self._index.items() for difficulty, entry in difficulties.items()}
+
+    def patch(self, sections):
+        """区間を read_sections の結果に合わせて差し替え、(追加, 変更, 削除) の区間のリストを返す
+
+        内容のハッシュが同じ区間はそのまま使い続ける。すでに section() で取り出した区間や
+        走査中の区間は、差し替え前の内容を読み続ける。
+        """
+        old = self.digests()
+        index = {}
+        added, changed = [], []
+        for (genre, difficulty), (data, count, digest) in sections.items():
+            old_digest = old.pop((genre, difficulty), None)
+            if old_digest == digest:
+                entry = self._index[genre][difficulty]
+            else:
+                entry = (data, 0, count, len(data), digest, QuestionTable())
+                (added if old_digest is None else changed).append((genre, difficulty))
+            index.setdefault(genre, {})[difficulty] = entry
+        # 索引はまとめて入れ替える (途中の状態を他の処理から見せない)
+        self._index = index
+        return added, changed, list(old)
+
+    def iter_section(self, genre, difficulty):
+        """指定した区間の問題を1問ずつデコードして返す"""
+        for _, quiz in self.iter_records(genre, difficulty):
+            yield quiz
+
+    def iter_records(self, genre, difficulty, entry=None):
+        """指定した区間の (レコードのオフセット, 問題) を1問ずつ返す
+
+        entry を渡すと、今の索引ではなくその時点の区間の内容を読む。
+        """
+        buf, start, _, end, _, table = entry or self._index[genre][difficulty]
+        pos = start
+        while pos < end:
+            (size,) = RECORD_LEN.unpack_from(buf, pos)
+            # 記述式の正解はここで一度だけ正規化しておく
+            data = json.loads(buf[pos + RECORD_LEN.size:pos + RECORD_LEN.size + size])
+            yield pos, Question.from_dict(data, genre, difficulty, table)
+            pos += RECORD_LEN.size + size
+
+    def question_at(self, offset, genre, difficulty, entry=None):
+        """iter_records で得たオフセットの問題を1問だけデコードする
+
+        entry を渡すと、今の索引ではなくその時点の区間の内容を読む。
+        """
+        buf, _, _, _, _, table = entry or self._index[genre][difficulty]
+        (size,) = RECORD_LEN.unpack_from(buf, offset)
+        start = offset + RECORD_LEN.size
+        return Question.from_dict(json.loads(buf[start:start + size]), genre, difficulty, table)
+
+    def section(self, genre, difficulty):
+        """区間を出題元として返す (QuizSession にそのまま渡せる)
+
+        返した区間は、その時点の内容を読み続ける (後で patch しても変わらない)。
+        """
+        return BankSection(self, genre, difficulty, self._index[genre][difficulty])
+
+    def close(self):
+        self._mm.close()
+
+
+class BankSection:
+    """バンクの1区間。走査するたびに mmap から1問ずつデコードする"""
+    def __init__(self, bank, genre, difficulty, entry):
+        self.bank = bank
+        self.genre = genre
+        self.difficulty = difficulty
+        self._entry = entry
+
+    def __len__(self):
+        return self._entry[2]
+
+    def __iter__(self):
+        for _, quiz in self.bank.iter_records(self.genre, self.difficulty, self._entry):
+            yield quiz
+
+    def iter_records(self):
+        """(レコードのオフセット, 問題) を1問ずつ返す"""
+        return self.bank.iter_records(self.genre, self.difficulty, self._entry)
+
+    def question_at(self, offset):
+        """iter_records で得たオフセットの問題を1問だけデコードする"""
+        return self.bank.question_at(offset, self.genre, self.difficulty, self._entry)
+
+
+class SourceWatcher:
+    """問題ファイルの追加・削除・更新を見張る (changed() を定期的に呼ぶ)"""
+    def __init__(self, directory):
+        self.directory = directory
+        self.sources = find_sources(directory)
+        self._signature = self._stat()
+
+    def _stat(self):
+        signature = []
+        for path in self.sources:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return signature
+
+    def changed(self):
+        """前回から問題ファイルが変わっていれば True"""
+        self.sources = find_sources(self.directory)
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        self._signature = signature
+        return True
+
+
+def open_bank(bank_path, sources):
+    """必要ならコンパイルし直してからバンクを開く"""
+    if is_stale(bank_path, sources):
+        compile_bank(sources, bank_path)
+    return QuizBank(bank_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="問題バンクのコンパイルと確認")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_compile = sub.add_parser("compile", help="問題ファイルからバンクファイルを作る")
+    p_compile.add_argument("out")
+    p_compile.add_argument("sources", nargs="+")
+
+    p_list = sub.add_parser("list", help="バンクファイルの区間一覧を表示する")
+    p_list.add_argument("bank")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "compile":
+            index = compile_bank(args.sources, args.out)
+            total = sum(entry[3] for entry in index)
+            # 書き出したバンクを開き直し、索引どおりに全問題をデコードできるか確かめる
+            bank = QuizBank(args.out)
+            decoded = sum(1 for genre in bank.genres() for difficulty in bank.difficulties(genre)
+                          for _ in bank.iter_records(genre, difficulty))
+            bank.close()
+            if decoded != total:
+                raise BankError(f"{args.out}: 書き出した問題数が合いません ({decoded} / {total})")
+            print(f"{args.out}: {len(index)} 区間, {total} 問")
+        else:
+            bank = QuizBank(args.bank)
+            for genre in bank.genres():
+                for difficulty in bank.difficulties(genre):
+                    print(f"{genre}\t{difficulty}\t{bank.count(genre, difficulty)}")
+    except BankError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""問題ファイルの検証とバンクのコンパイル (CI 用)
+
+問題ファイルをプロセスプールで並列に読み込み、形式・選択肢の番号の範囲・
+正解の正規化を検査してから、実行時のバンクファイルにまとめる。
+ファイルごとの結果は内容のハッシュをキーにキャッシュし、再実行では
+変更されたファイルだけを読み直す。問題が1つでもあれば終了コード 1 を返す。
+
+    python quiz_build.py quizzes/kanzi --out quizzes/kanzi.bank
+    python quiz_build.py quizzes/kanzi quizzes/kanzi2 --check-only
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from quiz_bank import BankError, expand_paths, is_stale, read_source, write_bank
+from quiz_model import MAX_CHOICES
+from quiz_normalize import normalize_answer
+
+# 検査の内容を変えたら上げる (古いキャッシュを使わないようにする)
+VALIDATOR_VERSION = 4
+QUESTION_TYPES = ("choice", "fill_in")
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "quizzes", ".build-cache")
+
+
+def file_digest(path):
+    """ファイルの内容のハッシュ"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _is_text(value):
+    return isinstance(value, str) and value.strip() != ""
+
+
+def validate_question(quiz):
+    """1問を検査し、見つかった問題点のリストを返す"""
+    errors = []
+    if not _is_text(quiz.get("question")):
+        errors.append("question (問題文) がありません")
+    if "id" in quiz and not _is_text(quiz["id"]):
+        errors.append(f"id (問題ID) は空でない文字列にしてください: {quiz['id']!r}")
+    image = quiz.get("image")
+    if "image" in quiz and (not _is_text(image) or os.path.isabs(image) or ".." in image.replace("\\", "/").split("/")):
+        errors.append(f"image (画像) は画像フォルダからの相対パスにしてください: {image!r}")
+    question_type = quiz.get("type")
+    if question_type not in QUESTION_TYPES:
+        errors.append(f"type が不明です: {question_type!r}")
+    elif question_type == "choice":
+        choices = quiz.get("choices")
+        if not isinstance(choices, list) or len(choices) < 2 or not all(_is_text(c) for c in choices):
+            errors.append("choices (選択肢) は2つ以上の文字列のリストにしてください")
+        elif len(choices) > MAX_CHOICES:
+            errors.append(f"choices (選択肢) は {MAX_CHOICES} 個までにしてください ({len(choices)} 個)")
+        index = quiz.get("correct_choice_index")
+        if not isinstance(index, int) or isinstance(index, bool):
+            errors.append(f"correct_choice_index が整数ではありません: {index!r}")
+        elif isinstance(choices, list) and not 0 <= index < len(choices):
+            errors.append(f"correct_choice_index が範囲外です: {index} (選択肢 {len(choices)} 個)")
+    else: # "fill_in"
+        keep_symbols = quiz.get("keep_symbols", False)
+        if not isinstance(keep_symbols, bool):
+            errors.append(f"keep_symbols は true / false にしてください: {keep_symbols!r}")
+            keep_symbols = False
+        aliases = quiz.get("aliases", [])
+        if not isinstance(aliases, list) or not all(isinstance(a, str) for a in aliases):
+            errors.append("aliases (別解) は文字列のリストにしてください")
+            aliases = []
+        answer = quiz.get("answer")
+        if not _is_text(answer):
+            errors.append("answer (正解) がありません")
+        else:
+            # 正規化すると空になる正解には、どんな回答も一致しない
+            for text in [answer, *aliases]:
+                if not normalize_answer(text, keep_symbols):
+                    errors.append(f"正規化すると空になる正解があります: {text!r} (keep_symbols を指定してください)")
+    return errors
+
+
+def check_file(path, digest, cache_dir):
+    """1ファイルを読み込んで検査し、結果をキャッシュに書く (プロセスプールで実行する)
+
+    結果は {"errors": [...], "records": [[ジャンル, 難易度, 問題], ...]}。
+    """
+    errors = []
+    records = []
+    try:
+        for n, (genre, difficulty, quiz) in enumerate(read_source(path), 1):
+            for message in validate_question(quiz):
+                errors.append(f"{genre} / {difficulty} の {n} 問目: {message}")
+            records.append([genre, difficulty, quiz])
+    except BankError as e:
+        errors.append(str(e).removeprefix(f"{path}: "))
+    result = {"version": VALIDATOR_VERSION, "errors": errors, "records": records}
+    if cache_dir is not None:
+        _write_cache(os.path.join(cache_dir, digest + ".json"), result)
+    return result
+
+
+def _write_cache(path, result):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_path, path)
+    except OSError:
+        pass # キャッシュが書けなくても検査の結果は返す
+
+
+def _read_cache(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return result if result.get("version") == VALIDATOR_VERSION else None
+
+
+def build(sources, cache_dir=None, workers=None):
+    """全ファイルを検査して ({パス: 結果}, 再処理したファイル数) を返す"""
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    results = {}
+    pending = []
+    for path in sources:
+        digest = file_digest(path)
+        cached = _read_cache(os.path.join(cache_dir, digest + ".json")) if cache_dir else None
+        if cached is None:
+            pending.append((path, digest))
+        else:
+            results[path] = cached
+
+    if len(pending) == 1:
+        path, digest = pending[0]
+        results[path] = check_file(path, digest, cache_dir)
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            paths, digests = zip(*pending)
+            chunksize = max(1, len(pending) // ((workers or os.cpu_count() or 1) * 4))
+            for path, result in zip(paths, pool.map(check_file, paths, digests, [cache_dir] * len(paths),
+                                                    chunksize=chunksize)):
+                results[path] = result
+    return results, len(pending)
+
+
+def cross_file_errors(sources, results):
+    """全ファイルを通した検査 (同じ問題IDが複数ある)"""
+    errors = []
+    seen = {}
+    for path in sources:
+        for genre, difficulty, quiz in results[path]["records"]:
+            if not isinstance(quiz.get("id"), str):
+                continue
+            first = seen.get(quiz["id"])
+            if first is None:
+                seen[quiz["id"]] = path
+            else:
+                errors.append(f"{path}: {genre} / {difficulty} に同じ問題があります "
+                              f"(ID {quiz['id']}, 最初の出現: {first})")
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="問題ファイルの検証とバンクのコンパイル")
+    parser.add_argument("paths", nargs="+", help="問題ファイル、または問題ファイルのあるディレクトリ")
+    parser.add_argument("--out", help="書き出すバンクファイル")
+    parser.add_argument("--check-only", action="store_true", help="検査だけを行う")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="ファイルごとの検査結果のキャッシュ")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--workers", type=int, help="プロセス数 (省略時は CPU の数)")
+    args = parser.parse_args(argv)
+    if not args.check_only and not args.out:
+        parser.error("--out か --check-only を指定してください")
+
+    sources = expand_paths(args.paths)
+    results, processed = build(sources, None if args.no_cache else args.cache_dir, args.workers)
+    errors = [f"{path}: {message}" for path in sources for message in results[path]["errors"]]
+    errors += cross_file_errors(sources, results)
+    total = sum(len(results[path]["records"]) for path in sources)
+    print(f"{len(sources)} ファイル ({processed} ファイルを検査、残りはキャッシュ), {total} 問")
+    for message in errors:
+        print(f"エラー: {message}", file=sys.stderr)
+    if errors:
+        print(f"{len(errors)} 件のエラーがあります。", file=sys.stderr)
+        return 1
+
+    if not args.check_only:
+        if processed == 0 and not is_stale(args.out, sources):
+            print(f"{args.out} は最新です")
+            return 0
+        records = (record for path in sources for record in results[path]["records"])
+        write_bank(records, args.out, sources)
+        print(f"{args.out} を書き出しました")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""同梱フォントの登録と、使用するフォントの決定・キャッシュ
+
+起動時に同梱の美咲フォント (TTF) をこのプロセス専用に登録し、希望順のファミリーの
+うち使えるものを1つ選ぶ。選んだファミリーは小さな JSON ファイルに保存し、
+次回以降の起動ではフォントの一覧取得を省く。
+文字幅は折り返しのときに quiz_layout が実際のフォントで測るので、ここでは測らない。
+"""
+import json
+import os
+import sys
+from tkinter import font as tkfont
+
+FR_PRIVATE = 0x10
+
+
+def register_private_fonts(paths):
+    """フォントファイルをこのプロセスだけで使えるように登録し、登録できたパスを返す"""
+    # ctypes.util は subprocess などを読み込んで重いため、使うときに読み込む
+    import ctypes
+    import ctypes.util
+    registered = []
+    if sys.platform == "win32":
+        add_font = ctypes.windll.gdi32.AddFontResourceExW
+        for path in paths:
+            if add_font(path, FR_PRIVATE, 0):
+                registered.append(path)
+    else:
+        # X11 版の Tk は fontconfig 経由でフォントを探すため、アプリケーション用フォントとして追加する
+        library = ctypes.util.find_library("fontconfig")
+        if library is None:
+            return registered
+        try:
+            fontconfig = ctypes.CDLL(library)
+        except OSError:
+            return registered
+        fontconfig.FcConfigAppFontAddFile.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+        for path in paths:
+            if fontconfig.FcConfigAppFontAddFile(None, os.fsencode(path)):
+                registered.append(path)
+    return registered
+
+
+class FontInfo:
+    """決定したフォントファミリー"""
+    def __init__(self, family):
+        self.family = family
+
+
+def _cache_key(root, preferred, font_files):
+    files = []
+    for path in font_files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append([os.path.basename(path), stat.st_size, int(stat.st_mtime)])
+    return {
+        "tk": root.call("info", "patchlevel"),
+        "platform": sys.platform,
+        "preferred": list(preferred),
+        "files": files,
+    }
+
+
+def _probe(root, preferred):
+    # 一度だけフォントの一覧を取得し、希望順で最初に見つかったファミリーを使う
+    available = set(tkfont.families(root))
+    family = next((name for name in preferred if name in available), None)
+    if family is None:
+        family = tkfont.nametofont("TkDefaultFont", root).actual("family")
+    return family
+
+
+def load_fonts(root, preferred, font_files, cache_path):
+    """同梱フォントを登録し、使うフォントファミリーを返す
+
+    キャッシュが今の環境 (Tk のバージョン・フォントファイル・希望順) と一致すれば、
+    フォントの一覧取得は行わない。
+    """
+    register_private_fonts(font_files)
+    key = _cache_key(root, preferred, font_files)
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached["key"] == key:
+            return FontInfo(cached["family"])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    family = _probe(root, preferred)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "family": family}, f, ensure_ascii=False)
+    except OSError:
+        pass # キャッシュが書けなくても起動は続ける
+    return FontInfo(family)
@@ -0,0 +1,179 @@
+"""文字 n-gram による部分一致検索の索引
+
+日本語は単語の区切りが空白で表れないため、文字列を正規化してから
+1文字 (unigram) と2文字 (bigram) に分けた転置索引を作る。検索語の n-gram の
+出現リストを短い順に突き合わせて候補を絞り、最後に部分一致を確かめる。
+
+ジャンル名の絞り込みと、問題バンク全体の全文検索 (問題文・選択肢・正解) に使う。
+
+    python quiz_index.py quizzes/kanzi.bank IPアドレス
+"""
+import argparse
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from functools import partial
+from operator import add
+
+from quiz_bank import QuizBank
+from quiz_normalize import normalize_answer
+
+# 1文書の複数の文字列をつないで部分一致を確かめるときの区切り (正規化で取り除かれる文字なので検索語には現れない)
+FIELD_SEPARATOR = "\x00"
+
+
+def _ngrams(fields):
+    """各文字列に含まれる unigram と bigram の集合 (文字列をまたぐものは作らない)"""
+    grams = set()
+    for text in fields:
+        grams.update(text)
+        grams.update(map(add, text, text[1:]))
+    return grams
+
+
+def _contains(postings, doc_id):
+    i = bisect_left(postings, doc_id)
+    return i < len(postings) and postings[i] == doc_id
+
+
+class NgramIndex:
+    """文字列の部分一致検索のための転置索引
+
+    文書IDは add した順に 0 から振る。出現リストには文書IDを昇順に追記していくので、
+    索引は少しずつ (読み込みと並行して) 作ることができる。
+    """
+    def __init__(self):
+        self._texts = []      # 文書ID -> 正規化した文字列
+        self._postings = defaultdict(partial(array, "I"))   # n-gram -> 文書IDの配列 (昇順)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def add(self, *fields):
+        """文字列 (複数可) を1つの文書として追加し、文書IDを返す"""
+        doc_id = len(self._texts)
+        fields = [normalize_answer(field) for field in fields]
+        self._texts.append(FIELD_SEPARATOR.join(fields))
+        postings = self._postings
+        for gram in _ngrams(fields):
+            postings[gram].append(doc_id)
+        return doc_id
+
+    def search(self, query, limit=None, prefix_first=False):
+        """query を部分一致で含む文書IDのリストを返す
+
+        空の検索語ではすべての文書を返す。prefix_first が True の場合は、
+        先頭の文字列が query で始まる文書を前に並べる。
+        """
+        query = normalize_answer(query)
+        if not query:
+            return list(range(len(self._texts)))[:limit]
+
+        grams = {query} if len(query) == 1 else {query[i:i + 2] for i in range(len(query) - 1)}
+        lists = []
+        for gram in grams:
+            ids = self._postings.get(gram)
+            if ids is None:
+                return []
+            lists.append(ids)
+        lists.sort(key=len)
+        shortest, rest = lists[0], lists[1:]
+
+        # bigram がすべて含まれていても並びが違うことがあるので、3文字以上は部分一致を確かめる
+        verify = len(query) > 2
+        texts = self._texts
+        results = []
+        # 先頭一致を前に並べる場合は、件数で打ち切る前に全件を集める
+        cutoff = None if prefix_first else limit
+        for doc_id in shortest:
+            if all(_contains(ids, doc_id) for ids in rest) and (not verify or query in texts[doc_id]):
+                results.append(doc_id)
+                if cutoff is not None and len(results) >= cutoff:
+                    break
+        if prefix_first:
+            results.sort(key=lambda doc_id: not texts[doc_id].startswith(query))
+        return results[:limit]
+
+
+class QuestionIndex:
+    """問題バンクの全問題を対象にした全文検索の索引
+
+    問題文・選択肢・正解 (別解を含む) を1文書として索引に入れ、問題本体は持たない。
+    検索結果はバンク内のオフセットから必要な問題だけをデコードして返す。
+    """
+    def __init__(self, bank):
+        self.bank = bank
+        self.index = NgramIndex()
+        self.sections = []          # 区間番号 -> 区間 (BankSection。索引を作った時点の内容を読む)
+        self._section_of = array("I")   # 文書ID -> 区間番号
+        self._offsets = array("Q")      # 文書ID -> レコードのオフセット
+        self.complete = False
+
+    def __len__(self):
+        return len(self.index)
+
+    def add(self, section_no, offset, quiz):
+        """1問を索引に加える"""
+        fields = [quiz.question, *(quiz.choices or ()), *quiz.aliases]
+        if quiz.answer is not None:
+            fields.append(quiz.answer)
+        self.index.add(*fields)
+        self._section_of.append(section_no)
+        self._offsets.append(offset)
+
+    def build_steps(self, chunk_size=500):
+        """バンクの問題を chunk_size 問ずつ索引に加えるジェネレータ (区切りごとに yield する)
+
+        画面の空き時間に少しずつ進めれば、索引を作りながら操作を受け付けられる。
+        """
+        added = 0
+        for genre in self.bank.genres():
+            for difficulty in self.bank.difficulties(genre):
+                section_no = len(self.sections)
+                section = self.bank.section(genre, difficulty)
+                self.sections.append(section)
+                for offset, quiz in section.iter_records():
+                    self.add(section_no, offset, quiz)
+                    added += 1
+                    if added % chunk_size == 0:
+                        yield
+        self.complete = True
+
+    def build(self):
+        """索引をまとめて作る"""
+        for _ in self.build_steps():
+            pass
+        return self
+
+    def search(self, query, limit=100):
+        """query を含む問題を (ジャンル, 難易度, 問題) のリストで返す"""
+        hits = []
+        for doc_id in self.index.search(query, limit=limit):
+            section = self.sections[self._section_of[doc_id]]
+            hits.append((section.genre, section.difficulty, section.question_at(self._offsets[doc_id])))
+        return hits
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="問題バンクの全文検索")
+    parser.add_argument("bank")
+    parser.add_argument("query")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    index = QuestionIndex(QuizBank(args.bank)).build()
+    built = time.perf_counter()
+    hits = index.search(args.query, limit=args.limit)
+    searched = time.perf_counter()
+    for genre, difficulty, quiz in hits:
+        print(f"{quiz.id}\t{genre}\t{difficulty}\t{quiz.question}")
+    print(f"{len(index)} 問から {len(hits)} 件 (索引 {(built - start) * 1000:.0f} ms, "
+          f"検索 {(searched - built) * 1000:.2f} ms)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
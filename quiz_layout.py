@@ -0,0 +1,95 @@
+"""問題文の折り返し位置の計算とキャッシュ
+
+Tk のラベルの wraplength は空白でしか折り返さず、幅が変わるたびに測り直しになる。
+ここでは文字幅をフォントごとに覚えておき、指定の幅に収まるように行を分ける。
+英単語の途中では折り返さず、句読点や閉じ括弧は行頭に置かない (簡単な禁則処理)。
+
+分けた行は (文字列, フォント, 幅) をキーに LRU キャッシュに入れるので、同じ問題を
+同じ幅で表示し直すときは測定も計算もしない。フォントの設定を後から変える場合は、
+別の Font オブジェクトを使うか clear() を呼ぶこと。
+"""
+from collections import OrderedDict
+
+# 行頭に置かない文字 (直前の文字と一緒に次の行へ送る)
+NO_LINE_START = frozenset("、。，．,.:;!?)]}）］｝」』】〕〉》！？：；ー…・々"
+                          "ぁぃぅぇぉっゃゅょゎァィゥェォッャュョヮヵヶ")
+# 行末に置かない文字 (次の文字と一緒に次の行へ送る)
+NO_LINE_END = frozenset("([{（［｛「『【〔〈《")
+
+
+def _is_word_char(ch):
+    return ch.isascii() and not ch.isspace()
+
+
+def can_break_before(text, i):
+    """text[i] の前で改行してよいかどうか"""
+    prev, ch = text[i - 1], text[i]
+    if ch in NO_LINE_START or prev in NO_LINE_END:
+        return False
+    if prev == " " or ch == " ":
+        return True
+    # 英数字どうしの間 (単語の途中) では改行しない
+    return not (_is_word_char(prev) and _is_word_char(ch))
+
+
+class TextLayout:
+    """文字列を指定の幅 (ピクセル) で行に分ける"""
+    def __init__(self, cache_size=512):
+        self.cache_size = cache_size
+        self._layouts = OrderedDict()   # (文字列, フォント名, 幅) -> 行のタプル
+        self._char_widths = {}          # フォント名 -> {文字: 幅}
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._layouts.clear()
+        self._char_widths.clear()
+
+    def wrap(self, text, font, width):
+        """text を width に収まる行のタプルに分ける (font は tkinter.font.Font)"""
+        key = (text, str(font), width)
+        lines = self._layouts.get(key)
+        if lines is not None:
+            self._layouts.move_to_end(key)
+            self.hits += 1
+            return lines
+        self.misses += 1
+        lines = tuple(line for paragraph in text.split("\n")
+                      for line in self._wrap_paragraph(paragraph, font, width))
+        self._layouts[key] = lines
+        if len(self._layouts) > self.cache_size:
+            self._layouts.popitem(last=False)
+        return lines
+
+    def _char_width(self, font, widths, ch):
+        width = widths.get(ch)
+        if width is None:
+            width = widths[ch] = font.measure(ch)
+        return width
+
+    def _wrap_paragraph(self, text, font, width):
+        widths = self._char_widths.setdefault(str(font), {})
+        lines = []
+        start = 0          # 今の行の先頭
+        x = 0              # 今の行の幅
+        last_break = None  # 今の行で最後に見つけた改行できる位置
+        i = 0
+        while i < len(text):
+            if i > start and can_break_before(text, i):
+                last_break = i
+            w = self._char_width(font, widths, text[i])
+            if x + w > width and i > start:
+                # 改行できる位置がなければ、幅を超える文字の前で切る
+                cut = last_break if last_break is not None else i
+                lines.append(text[start:cut].rstrip(" "))
+                start = cut
+                while start < len(text) and text[start] == " ":
+                    start += 1
+                last_break = None
+                i = start
+                x = 0
+                continue
+            x += w
+            i += 1
+        lines.append(text[start:].rstrip(" "))
+        return lines
@@ -0,0 +1,209 @@
+"""問題の重複チェック (オフライン用、NumPy が必要)
+
+問題文と正解を正規化した文字列から MinHash の署名を作り、LSH (署名を帯に分けて
+同じ値の帯を持つものを候補にする) で似た問題の組を探す。全問題の組み合わせを
+比べないので、問題数にほぼ比例する時間で済む。ジャンル・難易度・ファイルを
+またいだ重複も見つかる。あわせて、同じジャンルで正解が同じ記述式の問題も報告する。
+
+    python quiz_lint.py quizzes/kanzi quizzes/kanzi2
+    python quiz_lint.py quizzes/kanzi --write quizzes/kanzi.bank --dedupe merge
+"""
+import argparse
+import os
+import sys
+from collections import defaultdict
+
+import numpy as np
+
+from quiz_bank import BankError, expand_paths, read_source, write_bank
+from quiz_normalize import build_answer_keys, normalize_answer
+
+NUM_PERM = 64         # 署名の長さ (ハッシュ関数の数)
+BANDS = 16            # LSH の帯の数 (1帯あたり NUM_PERM // BANDS 行)
+SHINGLE_SIZE = 3      # 何文字ずつ区切って比べるか
+THRESHOLD = 0.6       # これ以上の推定類似度 (Jaccard 係数) を重複とみなす
+CHUNK_SIZE = 1000     # 署名をまとめて計算する問題数
+
+
+def lint_text(quiz):
+    """重複の判定に使う文字列 (問題文と正解を正規化してつなげたもの)"""
+    if quiz.get("type") == "choice":
+        try:
+            answer = quiz["choices"][quiz["correct_choice_index"]]
+        except (KeyError, IndexError, TypeError):
+            answer = ""
+    else:
+        answer = quiz.get("answer", "")
+    return normalize_answer(quiz.get("question", "")) + normalize_answer(str(answer))
+
+
+def shingle_hashes(texts, size=SHINGLE_SIZE):
+    """各文字列を size 文字ずつずらして切り出した断片のハッシュ値
+
+    (全断片のハッシュ値の配列, 各文字列の断片の開始位置の配列) を返す。
+    文字列をつないだ1つの配列の上でまとめて計算する。size 文字に満たない文字列は詰め物をする。
+    """
+    texts = [text.ljust(size, "\0") for text in texts]
+    codes = np.frombuffer("".join(texts).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    lengths = np.array([len(text) for text in texts], dtype=np.int64)
+    text_starts = np.r_[0, np.cumsum(lengths)[:-1]]
+    counts = lengths - size + 1
+    offsets = np.r_[0, np.cumsum(counts)[:-1]]
+    positions = np.repeat(text_starts - offsets, counts) + np.arange(counts.sum())
+    mixed = np.zeros(len(positions), dtype=np.uint64)
+    for k in range(size):
+        mixed = mixed * np.uint64(0x100000001B3) + codes[positions + k]
+    return (mixed ^ (mixed >> np.uint64(32))) & np.uint64(0xFFFFFFFF), offsets
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, seed=1):
+    """各文字列の MinHash 署名を (文字列の数, num_perm) の配列で返す"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1) # 奇数
+    b = rng.integers(0, 1 << 63, num_perm, dtype=np.uint64)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for start in range(0, len(texts), CHUNK_SIZE):
+        chunk = texts[start:start + CHUNK_SIZE]
+        hashes, offsets = shingle_hashes(chunk)
+        # 断片ごとに num_perm 個のハッシュ関数 (a*x + b の上位32ビット) を計算し、問題ごとの最小値をとる
+        permuted = ((hashes[:, None] * a + b) >> np.uint64(32)).astype(np.uint32)
+        signatures[start:start + len(chunk)] = np.minimum.reduceat(permuted, offsets, axis=0)
+    return signatures
+
+
+def candidate_pairs(signatures, bands=BANDS):
+    """どれかの帯の値がすべて一致する問題の組を (組の数, 2) の配列で返す"""
+    n, num_perm = signatures.shape
+    rows = num_perm // bands
+    firsts, others = [], []
+    for band in range(bands):
+        # 帯の値を1つの整数にまとめて並べ替える (まとめた値の衝突は、後で類似度を確かめるので問題ない)
+        keys = np.zeros(n, dtype=np.uint64)
+        for column in signatures[:, band * rows:(band + 1) * rows].T:
+            keys = keys * np.uint64(0x9E3779B97F4A7C15) + column
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        # 同じ値が並んだ区間ごとに、先頭の問題と残りの問題を組にする
+        is_start = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        group_first = order[is_start][np.cumsum(is_start) - 1]
+        firsts.append(group_first[~is_start])
+        others.append(order[~is_start])
+    pairs = np.stack([np.concatenate(firsts), np.concatenate(others)], axis=1)
+    return np.unique(pairs, axis=0)
+
+
+def similarity(signatures, i, j):
+    """署名から推定した類似度 (Jaccard 係数)。i, j は配列でもよい"""
+    return (signatures[i] == signatures[j]).mean(axis=-1)
+
+
+def find_duplicates(texts, threshold=THRESHOLD):
+    """似た問題のまとまりを、問題の位置のリストのリストで返す (各まとまりは出現順)"""
+    if not texts:
+        return []
+    signatures = minhash_signatures(texts)
+    pairs = candidate_pairs(signatures)
+    pairs = pairs[similarity(signatures, pairs[:, 0], pairs[:, 1]) >= threshold]
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs.tolist():
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    clusters = defaultdict(list)
+    for i in range(len(texts)):
+        clusters[find(i)].append(i)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def same_answer_groups(records):
+    """同じジャンルで正規化した正解が同じ記述式の問題のまとまり"""
+    groups = defaultdict(list)
+    for i, (_, genre, _, quiz) in enumerate(records):
+        if quiz.get("type") == "fill_in" and "answer" in quiz:
+            keep_symbols = quiz.get("keep_symbols", False)
+            groups[(genre, normalize_answer(quiz["answer"], keep_symbols))].append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def merge_into(keeper, duplicate):
+    """重複した記述式の問題の正解を、残す問題の別解に加える"""
+    if keeper.get("type") != "fill_in" or duplicate.get("type") != "fill_in":
+        return
+    keys = build_answer_keys([keeper["answer"], *keeper.get("aliases", ())], keeper.get("keep_symbols", False))
+    aliases = list(keeper.get("aliases", ()))
+    for answer in [duplicate.get("answer", ""), *duplicate.get("aliases", ())]:
+        key = normalize_answer(answer, keeper.get("keep_symbols", False))
+        if answer and key not in keys:
+            aliases.append(answer)
+            keys |= {key}
+    if aliases:
+        keeper["aliases"] = aliases
+
+
+def deduplicate(records, clusters, mode):
+    """まとまりごとに最初の問題だけを残した (ジャンル, 難易度, 問題) の並びを返す
+
+    mode が "merge" の場合は、捨てる記述式の問題の正解を残す問題の別解に加える。
+    """
+    dropped = set()
+    for members in clusters:
+        keeper = records[members[0]][3]
+        for i in members[1:]:
+            if mode == "merge":
+                merge_into(keeper, records[i][3])
+            dropped.add(i)
+    return [(genre, difficulty, quiz) for i, (_, genre, difficulty, quiz) in enumerate(records)
+            if i not in dropped]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="問題の重複チェック")
+    parser.add_argument("paths", nargs="+", help="問題ファイル、または問題ファイルのあるディレクトリ")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="重複とみなす推定類似度")
+    parser.add_argument("--write", metavar="BANK", help="重複を除いたバンクファイルを書き出す")
+    parser.add_argument("--dedupe", choices=["drop", "merge"], default="merge",
+                        help="--write のときの重複の扱い (merge は記述式の正解を別解にまとめる)")
+    args = parser.parse_args(argv)
+
+    sources = expand_paths(args.paths)
+    try:
+        records = [(path, genre, difficulty, quiz)
+                   for path in sources for genre, difficulty, quiz in read_source(path)]
+    except BankError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+
+    clusters = find_duplicates([lint_text(quiz) for _, _, _, quiz in records], args.threshold)
+    print(f"{len(sources)} ファイル, {len(records)} 問")
+    print(f"似た問題の候補: {len(clusters)} 組")
+    for members in clusters:
+        print("  ----")
+        for i in members:
+            path, genre, difficulty, quiz = records[i]
+            print(f"  {os.path.relpath(path)}\t{genre} / {difficulty}\t{quiz['id']}\t{quiz['question'][:40]}")
+
+    groups = same_answer_groups(records)
+    print(f"同じジャンルで正解が同じ記述式の問題: {len(groups)} 組")
+    for members in groups:
+        print("  ----")
+        for i in members:
+            path, genre, difficulty, quiz = records[i]
+            print(f"  {genre} / {difficulty}\t{quiz['id']}\t{quiz['answer']}\t{quiz['question'][:40]}")
+
+    if args.write:
+        kept = deduplicate(records, clusters, args.dedupe)
+        write_bank(kept, args.write, sources)
+        print(f"{args.write}: {len(kept)} 問を書き出しました ({len(records) - len(kept)} 問を除外)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+"""回答イベントの追記専用ログ
+
+採点のたびにイベント (問題ID、選んだ選択肢/入力した文字列、正誤、回答時間) を
+キューに積み、書き込みスレッドがまとめてファイルに追記する。UI スレッドは
+キューに積むだけなので、ログの書き込みで画面遷移が遅れることはない。
+
+ファイルはバッチの連続で、各バッチは次の形式:
+    ヘッダ    <4sIII>  マジック "KZLB", イベント数, ペイロード長, ペイロードの CRC32
+    ペイロード  固定長レコード × イベント数 + 文字列領域 (UTF-8)
+書き込み途中でプロセスが落ちた場合、末尾の壊れたバッチは次回開いたときに切り詰める。
+"""
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+BATCH_MAGIC = b"KZLB"
+BATCH_HEADER = struct.Struct("<4sIII")
+# 時刻, セッションID, 問題ID, 回答時間(ms), 選択肢番号(記述式は -1), 正誤, (詰め物), 文字列の位置, 文字列の長さ
+RECORD = struct.Struct("<dQQIhBxIH")
+MAX_TEXT_BYTES = 0xFFFF
+FLUSH_TIMEOUT = 10.0    # flush・close が書き込みスレッドを待つ秒数
+
+_FLUSH = object()
+_CLOSE = object()
+
+
+class AnswerLogError(Exception):
+    """回答ログを書き込めなかった (書き込みスレッドの例外は __cause__ にある)"""
+
+
+def truncate_utf8(text, limit):
+    """text を UTF-8 で limit バイト以内に収める (文字の途中では切らない)"""
+    return text.encode("utf-8")[:limit].decode("utf-8", "ignore").encode("utf-8")
+
+
+def encode_batch(events):
+    """イベントのリストを1バッチ分のバイト列にする"""
+    records = bytearray()
+    texts = bytearray()
+    for timestamp, session_id, question_id, response_ms, choice_index, is_correct, text in events:
+        data = truncate_utf8(text, MAX_TEXT_BYTES)
+        records += RECORD.pack(timestamp, session_id, question_id, min(response_ms, 0xFFFFFFFF),
+                               choice_index, is_correct, len(texts), len(data))
+        texts += data
+    payload = bytes(records + texts)
+    return BATCH_HEADER.pack(BATCH_MAGIC, len(events), len(payload), zlib.crc32(payload)) + payload
+
+
+def iter_batches(f):
+    """ファイルから正しいバッチを順に返す: (イベント数, ペイロード, バッチ末尾の位置)
+
+    壊れたバッチや途中で切れたバッチに出会ったところで止まる。
+    """
+    while True:
+        header = f.read(BATCH_HEADER.size)
+        if len(header) < BATCH_HEADER.size:
+            return
+        magic, count, length, crc = BATCH_HEADER.unpack(header)
+        if magic != BATCH_MAGIC:
+            return
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc or count * RECORD.size > length:
+            return
+        yield count, payload, f.tell()
+
+
+def iter_events(path):
+    """ログの全イベントを辞書として返す"""
+    with open(path, "rb") as f:
+        for count, payload, _ in iter_batches(f):
+            texts = count * RECORD.size
+            for i in range(count):
+                (timestamp, session_id, question_id, response_ms, choice_index, is_correct,
+                 offset, length) = RECORD.unpack_from(payload, i * RECORD.size)
+                yield {
+                    "timestamp": timestamp,
+                    "session_id": session_id,
+                    "question_id": f"{question_id:016x}",
+                    "response_ms": response_ms,
+                    "choice_index": choice_index,
+                    "is_correct": bool(is_correct),
+                    "text": payload[texts + offset:texts + offset + length].decode("utf-8", "replace"),
+                }
+
+
+def recover(path):
+    """末尾の不完全なバッチを切り詰め、切り詰めたバイト数を返す"""
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        return 0
+    with f:
+        end = 0
+        for _, _, end in iter_batches(f):
+            pass
+        size = f.seek(0, 2)
+        if size > end:
+            f.truncate(end)
+        return size - end
+
+
+class AnswerLog:
+    """回答イベントをバッチにまとめて別スレッドで追記するログ
+
+    書き込みスレッドで例外が起きたら error に残してスレッドを止め、以降の flush で AnswerLogError にする。
+    """
+    def __init__(self, path, batch_size=256, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.recovered_bytes = recover(path)
+        self.error = None
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="AnswerLog", daemon=True)
+        self._thread.start()
+
+    def append(self, session_id, question_id, response_ms, choice_index, is_correct, text):
+        """イベントをキューに積む (書き込みは待たない)。question_id は整数の問題ID"""
+        self._queue.put((time.time(), session_id, question_id, response_ms,
+                         choice_index, is_correct, text))
+
+    def on_answer(self, session, quiz, result):
+        """QuizSession のリスナーとして回答イベントを記録する"""
+        choice_index = result.get("choice_index")
+        self.append(session.session_id, quiz.uid, int(result["response_time"] * 1000),
+                    -1 if choice_index is None else choice_index,
+                    result["is_correct"], result["player_answer"])
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """キューに積まれたイベントを書き終えるまで待つ (最大 timeout 秒)"""
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        # 書き込みスレッドは error を設定してからキューを空にするので、ここで error がなければ done は必ず設定される
+        if self.error is None and not done.wait(timeout):
+            raise AnswerLogError(f"{self.path}: 書き込みが {timeout} 秒で終わりませんでした")
+        self._raise_error()
+
+    def close(self, timeout=FLUSH_TIMEOUT):
+        """残りのイベントを書き出して書き込みスレッドを止める (最大 timeout 秒待つ。終了処理から呼ぶので例外は出さない)"""
+        if self._thread.is_alive():
+            self._queue.put((_CLOSE, None))
+            self._thread.join(timeout)
+
+    def _raise_error(self):
+        if self.error is not None:
+            raise AnswerLogError(f"{self.path}: 回答ログを書き込めませんでした ({self.error!r})") from self.error
+
+    def _run(self):
+        try:
+            self._write_loop()
+        except Exception as e:
+            self.error = e
+            # 待っている flush をすべて起こす (以降に積まれたイベントは書かない)
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    return
+                if item[0] is _FLUSH:
+                    item[1].set()
+
+    def _write_loop(self):
+        pending = []
+        deadline = None
+        with open(self.path, "ab") as f:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                control = item[0] if item is not None and item[0] in (_FLUSH, _CLOSE) else None
+                if item is not None and control is None:
+                    pending.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                    if len(pending) < self.batch_size:
+                        continue
+
+                # バッチが一杯になった・一定時間が過ぎた・明示的に要求されたときに書き出す
+                if pending:
+                    try:
+                        f.write(encode_batch(pending))
+                        f.flush()
+                        os.fsync(f.fileno())
+                    except Exception as e:
+                        # 要求した flush を起こす前に error を設定する
+                        self.error = e
+                        if control is _FLUSH:
+                            item[1].set()
+                        raise
+                    pending = []
+                deadline = None
+                if control is _FLUSH:
+                    item[1].set()
+                elif control is _CLOSE:
+                    return
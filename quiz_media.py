@@ -0,0 +1,294 @@
+"""問題に添える画像の非同期読み込みとキャッシュ
+
+画像ファイルの読み込み・デコード・縮小はスレッドプールで行い、結果をキューに積む。
+Tk のオブジェクトは画面のスレッドでしか扱えないため、PhotoImage の作成だけを
+画面のスレッドで行う (読み込み待ちの画像があるあいだだけ after でキューを見る)。
+
+画像はワーカーでデコード・縮小して PPM にしてから渡すので、画面のスレッドの処理は
+PPM の取り込みだけになる。Pillow があればどの形式でも Pillow でデコードする。
+Pillow がなければ、PNG と PPM / PGM だけを標準ライブラリでデコードし、整数分の1に間引いて縮小する
+(それ以外の形式は読めない画像として扱う)。
+
+画像の名前は画像フォルダからの相対パスで、フォルダの外を指す名前は読まない。
+
+デコードした画像は、画素数から見積もったバイト数の上限つきの LRU キャッシュに置く。
+"""
+import logging
+import os
+import queue
+import struct
+import tkinter as tk
+import zlib
+from collections import OrderedDict
+
+POLL_MS = 15   # 読み込み待ちのあいだ、キューを見る間隔 (ミリ秒)
+
+logger = logging.getLogger(__name__)
+
+
+def _pillow():
+    # Pillow の読み込みは重いので、最初の画像を読むときにワーカーで行う
+    try:
+        from PIL import Image
+    except ImportError: # Pillow は任意 (なければ PNG と PPM / PGM を標準ライブラリでデコードする)
+        return None
+    return Image
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_CHUNK = struct.Struct(">I4s")
+# PNG の色の種類 -> 1画素あたりのサンプル数 (0: グレー, 2: RGB, 3: パレット, 4: グレー+α, 6: RGBA)
+PNG_SAMPLES = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def decode_image(path, max_size):
+    """画像を読み込み、max_size (幅, 高さ) に収まるように縮小した PPM のバイト列を返す (ワーカーで実行する)"""
+    Image = _pillow()
+    if Image is not None:
+        with Image.open(path) as image:
+            image = image.convert("RGB")
+            image.thumbnail(max_size)
+            width, height = image.size
+            return _ppm(width, height, image.tobytes())
+    with open(path, "rb") as f:
+        data = f.read()
+    if data.startswith(PNG_SIGNATURE):
+        width, height, rows = _decode_png(data)
+    elif data[:2] in (b"P5", b"P6"):
+        width, height, rows = _decode_pnm(data)
+    else:
+        raise ValueError(f"{path}: Pillow がないため読めない形式です")
+    max_width, max_height = max_size
+    factor = max(1, -(-width // max_width), -(-height // max_height))
+    pixels = b"".join(row if factor == 1 else _every(row, factor) for row in rows[::factor])
+    return _ppm(-(-width // factor), -(-height // factor), pixels)
+
+
+def _ppm(width, height, pixels):
+    return b"P6 %d %d 255\n" % (width, height) + pixels
+
+
+def _every(row, factor):
+    # RGB の行から factor 画素ごとに1画素を取り出す
+    out = bytearray(len(row[::3 * factor]) * 3)
+    out[0::3] = row[0::3 * factor]
+    out[1::3] = row[1::3 * factor]
+    out[2::3] = row[2::3 * factor]
+    return bytes(out)
+
+
+def _decode_pnm(data):
+    """PPM (P6) / PGM (P5) の 8 ビットの画像を (幅, 高さ, RGB の行のリスト) にする"""
+    fields = []
+    pos = 2
+    while len(fields) < 3:
+        while data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] == b"#":
+            pos = data.index(b"\n", pos)
+            continue
+        end = pos
+        while not data[end:end + 1].isspace():
+            end += 1
+        fields.append(int(data[pos:end]))
+        pos = end
+    width, height, maxval = fields
+    if maxval != 255:
+        raise ValueError("8 ビット以外の PPM / PGM には対応していません")
+    pos += 1
+    samples = 3 if data[:2] == b"P6" else 1
+    stride = width * samples
+    rows = [data[pos + y * stride:pos + (y + 1) * stride] for y in range(height)]
+    if samples == 1:
+        rows = [_gray_to_rgb(row) for row in rows]
+    return width, height, rows
+
+
+def _gray_to_rgb(row):
+    out = bytearray(len(row) * 3)
+    out[0::3] = out[1::3] = out[2::3] = row
+    return bytes(out)
+
+
+def _decode_png(data):
+    """PNG (インターレースなし) を (幅, 高さ, RGB の行のリスト) にする。透明度は捨てる"""
+    pos = len(PNG_SIGNATURE)
+    idat = []
+    palette = None
+    while pos < len(data):
+        length, kind = PNG_CHUNK.unpack_from(data, pos)
+        body = data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+        if kind == b"IHDR":
+            width, height, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", body)
+        elif kind == b"PLTE":
+            palette = body
+        elif kind == b"IDAT":
+            idat.append(body)
+        elif kind == b"IEND":
+            break
+    if interlace or color not in PNG_SAMPLES or depth not in (1, 2, 4, 8, 16) or (color == 3 and palette is None):
+        raise ValueError("対応していない PNG です")
+    samples = PNG_SAMPLES[color]
+    bits = samples * depth
+    stride = -(-width * bits // 8)
+    bpp = max(1, bits // 8)   # フィルタで参照する左隣までのバイト数
+    raw = zlib.decompress(b"".join(idat))
+    rows = []
+    prev = bytes(stride)
+    for y in range(height):
+        start = y * (stride + 1)
+        row = _unfilter(raw[start], bytearray(raw[start + 1:start + 1 + stride]), prev, bpp)
+        rows.append(_png_row_to_rgb(row, width, color, depth, samples, palette))
+        prev = row
+    return width, height, rows
+
+
+def _unfilter(kind, row, prev, bpp):
+    n = len(row)
+    if kind == 1:     # Sub
+        for i in range(bpp, n):
+            row[i] = (row[i] + row[i - bpp]) & 0xFF
+    elif kind == 2:   # Up
+        row = bytearray((a + b) & 0xFF for a, b in zip(row, prev))
+    elif kind == 3:   # Average
+        for i in range(n):
+            left = row[i - bpp] if i >= bpp else 0
+            row[i] = (row[i] + ((left + prev[i]) >> 1)) & 0xFF
+    elif kind == 4:   # Paeth
+        for i in range(n):
+            a = row[i - bpp] if i >= bpp else 0
+            b = prev[i]
+            c = prev[i - bpp] if i >= bpp else 0
+            p = a + b - c
+            pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+            row[i] = (row[i] + (a if pa <= pb and pa <= pc else b if pb <= pc else c)) & 0xFF
+    elif kind != 0:
+        raise ValueError(f"PNG のフィルタの種類が不正です: {kind}")
+    return bytes(row)
+
+
+def _png_row_to_rgb(row, width, color, depth, samples, palette):
+    if depth == 16:
+        row = row[::2]   # 上位バイトだけを使う
+    elif depth < 8:
+        per_byte = 8 // depth
+        mask = (1 << depth) - 1
+        scale = 1 if color == 3 else 255 // mask
+        row = bytes((byte >> (8 - depth * (k + 1)) & mask) * scale
+                    for byte in row for k in range(per_byte))[:width]
+    if color == 3:   # パレットの番号を R, G, B それぞれの表で置き換える
+        table = palette.ljust(768, b"\0")
+        row = bytes(row[:width])
+        out = bytearray(width * 3)
+        out[0::3], out[1::3], out[2::3] = (row.translate(table[k::3]) for k in range(3))
+        return bytes(out)
+    if samples <= 2:   # グレー (とα)
+        return _gray_to_rgb(row[::samples])
+    if samples == 4:   # RGBA
+        out = bytearray(width * 3)
+        out[0::3], out[1::3], out[2::3] = row[0::4], row[1::4], row[2::4]
+        return bytes(out)
+    return bytes(row)
+
+
+class MediaLoader:
+    """画像を非同期に読み込み、PhotoImage をキャッシュする
+
+    request(名前, callback) で読み込みを頼むと、読み終わったときに画面のスレッドで
+    callback(PhotoImage) が呼ばれる (読めなかった場合は None)。キャッシュにあればすぐに呼ぶ。
+    名前は media_dir からの相対パスで、media_dir の外を指す名前は読めない画像として扱う。
+    """
+    def __init__(self, root, media_dir, max_size=(480, 200), cache_bytes=32 << 20, workers=2):
+        self.root = root
+        self.media_dir = os.path.realpath(media_dir)
+        self.max_size = max_size
+        self.cache_bytes = cache_bytes
+        from concurrent.futures import ThreadPoolExecutor
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="MediaLoader")
+        self._results = queue.SimpleQueue()    # ワーカー -> 画面のスレッド: (名前, 結果, 例外)
+        self._cache = OrderedDict()            # 名前 -> (PhotoImage, 見積もりバイト数)
+        self._used_bytes = 0
+        self._waiting = {}                     # 読み込み中の名前 -> callback のリスト
+        self._poll_job = None
+
+    def get(self, name):
+        """キャッシュにある画像 (なければ None)"""
+        entry = self._cache.get(name)
+        if entry is None:
+            return None
+        self._cache.move_to_end(name)
+        return entry[0]
+
+    def request(self, name, callback=None):
+        """画像の読み込みを頼む"""
+        image = self.get(name)
+        if image is not None:
+            if callback is not None:
+                callback(image)
+            return
+        callbacks = self._waiting.get(name)
+        if callbacks is None:
+            callbacks = self._waiting[name] = []
+            self._executor.submit(self._load, name)
+            if self._poll_job is None:
+                self._poll_job = self.root.after(POLL_MS, self._poll)
+        if callback is not None:
+            callbacks.append(callback)
+
+    def prefetch(self, names):
+        """これから表示する画像を先に読み込んでおく"""
+        for name in names:
+            self.request(name)
+
+    def close(self):
+        if self._poll_job is not None:
+            self.root.after_cancel(self._poll_job)
+            self._poll_job = None
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def resolve(self, name):
+        """画像の名前をファイルのパスにする (画像フォルダの外を指す名前は ValueError)"""
+        path = os.path.realpath(os.path.join(self.media_dir, name))
+        if os.path.commonpath([path, self.media_dir]) != self.media_dir:
+            raise ValueError(f"画像フォルダの外を指しています: {name!r}")
+        return path
+
+    def _load(self, name):
+        # ワーカーで実行する (Tk には触らない)
+        try:
+            self._results.put((name, decode_image(self.resolve(name), self.max_size), None))
+        except Exception as e: # 読めない画像は画面のスレッドで None として扱う
+            logger.warning("画像を読み込めませんでした: %s", name, exc_info=True)
+            self._results.put((name, None, e))
+
+    def _poll(self):
+        self._poll_job = None
+        while True:
+            try:
+                name, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            image = None
+            if error is None:
+                try:
+                    image = tk.PhotoImage(master=self.root, data=result, format="ppm")
+                except tk.TclError:
+                    logger.warning("画像を取り込めませんでした: %s", name, exc_info=True)
+                    image = None
+            if image is not None:
+                self._store(name, image)
+            for callback in self._waiting.pop(name, ()):
+                callback(image)
+        if self._waiting:
+            self._poll_job = self.root.after(POLL_MS, self._poll)
+
+    def _store(self, name, image):
+        # PhotoImage は1画素を4バイトで持つ
+        size = image.width() * image.height() * 4
+        self._cache[name] = (image, size)
+        self._used_bytes += size
+        # 表示中の画像はウィジェット側が参照を持つので、キャッシュから外しても消えない
+        while self._used_bytes > self.cache_bytes and len(self._cache) > 1:
+            _, (_, evicted) = self._cache.popitem(last=False)
+            self._used_bytes -= evicted
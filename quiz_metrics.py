@@ -0,0 +1,189 @@
+"""画面遷移やイベントループの所要時間の計測 (Tkinter に依存しない)
+
+所要時間はナノ秒単位でヒストグラムに数えるだけなので、計測を続けてもメモリは増えない。
+ヒストグラムの区間は2のべき乗をさらに SUB_BUCKETS 個に分けたもので、百分位数の
+誤差は区間の幅 (およそ 25%) に収まる。
+
+計測しない場合は NullMetrics を使う。timed() は何もしない共有のオブジェクトを返すので、
+計測箇所に残るのはメソッド呼び出し1回ぶんの負担だけになる。
+
+    metrics = Metrics()
+    with metrics.timed("grade"):
+        session.answer_choice(0)
+    print(metrics.report())
+"""
+import os
+import time
+from array import array
+
+SUB_BUCKETS = 4   # 2のべき乗の区間を何分割するか (2のべき乗にすること)
+_SUB_BITS = SUB_BUCKETS.bit_length() - 1
+_BUCKET_COUNT = (64 - _SUB_BITS + 1) * SUB_BUCKETS
+
+
+def _bucket(value):
+    """値 (0 以上の整数) が入る区間の番号"""
+    bits = value.bit_length()
+    if bits <= _SUB_BITS:
+        return value
+    # 上位 _SUB_BITS + 1 ビットで区間を決める (最上位のビットは常に 1)
+    return (bits - _SUB_BITS) * SUB_BUCKETS + (value >> (bits - _SUB_BITS - 1)) - SUB_BUCKETS
+
+
+def _bucket_upper(index):
+    """区間に入る値の上限"""
+    if index < SUB_BUCKETS:
+        return index
+    bits, sub = divmod(index, SUB_BUCKETS)
+    shift = bits - 1
+    return ((sub + SUB_BUCKETS + 1) << shift) - 1
+
+
+class Histogram:
+    """所要時間 (ナノ秒) の分布"""
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * _BUCKET_COUNT))
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def record(self, value):
+        value = max(0, int(value))
+        self.counts[_bucket(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """q (0〜100) 百分位数の推定値 (区間の上限。最大値を超えない)"""
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * q // 100))
+        seen = 0
+        for index, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(_bucket_upper(index), self.max)
+        return self.max
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.record(time.perf_counter_ns() - self.start)
+
+
+class Metrics:
+    """名前ごとのヒストグラムの集まり"""
+    enabled = True
+
+    def __init__(self):
+        self.histograms = {}
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def record(self, name, value):
+        """所要時間 (ナノ秒) を1件記録する"""
+        self.histogram(name).record(value)
+
+    def timed(self, name):
+        """with 文の中の処理の所要時間を記録するコンテキストマネージャ"""
+        return _Timer(self.histogram(name))
+
+    def report(self):
+        """計測結果の表 (時間はミリ秒)"""
+        lines = [f"{'name':<28}{'count':>8}{'mean':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}"]
+        for name in sorted(self.histograms):
+            h = self.histograms[name]
+            values = (h.mean(), h.percentile(50), h.percentile(90), h.percentile(99), h.max)
+            lines.append(f"{name:<28}{h.count:>8}" + "".join(f"{v / 1e6:>9.2f}" for v in values))
+        return "\n".join(lines)
+
+    def dump(self, path):
+        """計測結果を path に書き出す"""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(time.strftime("# %Y-%m-%d %H:%M:%S (ms)\n"))
+            f.write(self.report() + "\n")
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class NullMetrics:
+    """計測しないときに Metrics の代わりに使う (何も記録しない)"""
+    enabled = False
+    histograms = {}
+
+    def record(self, name, value):
+        pass
+
+    def timed(self, name):
+        return _NULL_TIMER
+
+    def report(self):
+        return ""
+
+    def dump(self, path):
+        pass
+
+
+class LagMonitor:
+    """イベントループの遅れを測る
+
+    widget.after で一定間隔の呼び出しを予約し、予定の時刻からどれだけ遅れて
+    呼ばれたかを "event_loop_lag" として記録する。遅れが大きいほど、その間の
+    キー入力や描画も待たされている。
+    """
+    def __init__(self, widget, metrics, interval_ms=50, name="event_loop_lag"):
+        self.widget = widget
+        self.metrics = metrics
+        self.interval_ms = interval_ms
+        self.name = name
+        self._job = None
+        self._expected = 0
+
+    def start(self):
+        self.stop()
+        self._schedule()
+
+    def stop(self):
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._job = None
+
+    def _schedule(self):
+        self._expected = time.perf_counter_ns() + self.interval_ms * 1_000_000
+        self._job = self.widget.after(self.interval_ms, self._beat)
+
+    def _beat(self):
+        self.metrics.record(self.name, time.perf_counter_ns() - self._expected)
+        self._schedule()
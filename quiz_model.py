@@ -0,0 +1,196 @@
+"""メモリを節約した問題の表現
+
+問題ファイルやバンクのレコード (dict) はデコード時に Question に変換する。
+Question は __slots__ で属性を固定し、形式は整数の列挙型、問題IDは整数で持つ。
+選択肢の文字列は問題どうしで共有する文字列表 (QuestionTable) にまとめ、問題は表の中の区間だけを持つ。
+同じ表を使う問題では、同じ選択肢 (「1. はい」など) や同じ並びの選択肢、同じ正解とその
+正規化済みの集合は、何問あっても1つしか保持しない。
+
+表はバンクの区間ごとに1つ持つ (QuizBank)。同じ区間を何度デコードしても表は大きくならず、
+問題ファイルを読み直して区間を差し替えると、古い区間の表は問題と一緒に解放される。
+"""
+import hashlib
+import sys
+from array import array
+from enum import IntEnum
+
+from quiz_normalize import build_answer_keys
+
+
+class QuestionType(IntEnum):
+    """問題の形式 (ファイル上の名前は "choice" / "fill_in")"""
+    CHOICE = 0
+    FILL_IN = 1
+
+    @property
+    def label(self):
+        return _TYPE_LABELS[self]
+
+
+_TYPE_LABELS = {QuestionType.CHOICE: "choice", QuestionType.FILL_IN: "fill_in"}
+_TYPES_BY_LABEL = {label: question_type for question_type, label in _TYPE_LABELS.items()}
+MAX_CHOICES = 0xFF  # 選択肢の数は区間の下位8ビットに入れる
+
+
+def parse_uid(question_id):
+    """問題ファイルの問題ID (文字列) を 64ビット整数にする
+
+    16桁までの16進文字列はそのまま読み、それ以外 ("q-1" など) は安定したハッシュで整数にする。
+    """
+    text = str(question_id)
+    if len(text) <= 16:
+        try:
+            return int(text, 16)
+        except ValueError:
+            pass
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ChoiceTable:
+    """選択肢の文字列表
+
+    文字列は1つずつ番号を振って保持し (strings)、各問題の選択肢の並びは番号の配列
+    (refs) の連続した区間として持つ。同じ並びは同じ区間を使い回すので、同じ問題を
+    何度デコードしても表は大きくならない。
+    """
+    def __init__(self):
+        self.strings = []
+        self._string_ids = {}
+        self.refs = array("I")
+        self._spans = {}    # 文字列番号の並び -> 区間 (開始位置 << 8 | 個数)
+
+    def add(self, choices):
+        """選択肢の並びを登録し、区間を表す整数を返す"""
+        if len(choices) > MAX_CHOICES:
+            raise ValueError(f"選択肢は {MAX_CHOICES} 個までです ({len(choices)} 個)")
+        ids = []
+        for text in choices:
+            string_id = self._string_ids.get(text)
+            if string_id is None:
+                string_id = self._string_ids[text] = len(self.strings)
+                self.strings.append(text)
+            ids.append(string_id)
+        key = tuple(ids)
+        span = self._spans.get(key)
+        if span is None:
+            span = self._spans[key] = len(self.refs) << 8 | len(ids)
+            self.refs.extend(ids)
+        return span
+
+    def get(self, span):
+        """区間の選択肢を文字列のタプルで返す"""
+        start, count = span >> 8, span & 0xFF
+        strings = self.strings
+        return tuple(strings[i] for i in self.refs[start:start + count])
+
+
+class QuestionTable:
+    """同じ出題元からデコードした問題で共有する表 (選択肢の文字列表と正規化済みの正解集合)"""
+    __slots__ = ("choices", "_answer_keys")
+
+    def __init__(self):
+        self.choices = ChoiceTable()
+        # 正解・別解が同じ問題は正規化済みの正解集合を共有する: (正解, 別解, keep_symbols) -> frozenset
+        self._answer_keys = {}
+
+    def answer_keys(self, answer, aliases, keep_symbols):
+        """正規化済みの正解集合 (同じ正解・別解なら同じ frozenset を返す)"""
+        key = (answer, aliases, keep_symbols)
+        answer_keys = self._answer_keys.get(key)
+        if answer_keys is None:
+            answer_keys = self._answer_keys[key] = build_answer_keys([answer, *aliases], keep_symbols)
+        return answer_keys
+
+
+class Question:
+    """1問ぶんのデータ
+
+    選択式: choices, correct_choice_index
+    記述式: answer, aliases, keep_symbols, answer_keys (正規化済みの正解集合)
+    どちらの形式にも、問題文に添える画像 (image: 画像フォルダからの相対パス) を付けられる。
+    table を省略すると、その問題だけの表を使う (他の問題とは共有しない)。
+    """
+    __slots__ = ("uid", "type", "question", "genre", "difficulty", "table", "_choices", "correct_choice_index",
+                 "answer", "aliases", "keep_symbols", "answer_keys", "image")
+
+    def __init__(self, uid, question_type, question, genre=None, difficulty=None, choices=None,
+                 correct_choice_index=None, answer=None, aliases=(), keep_symbols=False, image=None,
+                 table=None):
+        self.uid = uid            # 問題ID (64ビット整数。文字列の問題IDは id で得る)
+        self.type = question_type
+        self.question = question
+        self.genre = genre
+        self.difficulty = difficulty
+        self.table = table = table if table is not None else QuestionTable()
+        self._choices = table.choices.add(choices) if choices is not None else None
+        self.correct_choice_index = correct_choice_index
+        self.answer = sys.intern(answer) if answer is not None else None
+        self.aliases = tuple(aliases)
+        self.keep_symbols = keep_symbols
+        self.image = image
+        self.answer_keys = None
+        if question_type is QuestionType.FILL_IN and answer is not None:
+            self.answer_keys = table.answer_keys(self.answer, self.aliases, keep_symbols)
+
+    @classmethod
+    def from_dict(cls, data, genre=None, difficulty=None, table=None):
+        """問題ファイル・バンクのレコードの形式 (dict) から作る"""
+        question_id = data.get("id")
+        return cls(
+            parse_uid(question_id) if question_id else 0,
+            _TYPES_BY_LABEL[data["type"]],
+            data["question"],
+            genre=sys.intern(genre) if genre is not None else None,
+            difficulty=sys.intern(difficulty) if difficulty is not None else None,
+            choices=data.get("choices"),
+            correct_choice_index=data.get("correct_choice_index"),
+            answer=data.get("answer"),
+            aliases=data.get("aliases", ()),
+            keep_symbols=data.get("keep_symbols", False),
+            image=data.get("image"),
+            table=table,
+        )
+
+    @property
+    def id(self):
+        """問題ID (16桁の16進文字列。学習状態の保存などに使う)"""
+        return f"{self.uid:016x}"
+
+    @property
+    def choices(self):
+        """選択肢のタプル (記述式の問題では None)"""
+        return self.table.choices.get(self._choices) if self._choices is not None else None
+
+    def choice(self, index):
+        """index 番目の選択肢 (選択肢全体のタプルを作らずに1つだけ取り出す)"""
+        span = self._choices
+        if not 0 <= index < span & 0xFF:
+            raise IndexError(index)
+        choices = self.table.choices
+        return choices.strings[choices.refs[(span >> 8) + index]]
+
+    @property
+    def correct_answer(self):
+        """正解の表示用の文字列"""
+        if self.type is QuestionType.CHOICE:
+            return self.choice(self.correct_choice_index)
+        return self.answer
+
+    def to_dict(self):
+        """問題ファイル・バンクのレコードの形式 (dict) に戻す"""
+        data = {"id": self.id, "type": self.type.label, "question": self.question}
+        if self.type is QuestionType.CHOICE:
+            data["choices"] = list(self.choices)
+            data["correct_choice_index"] = self.correct_choice_index
+        else:
+            data["answer"] = self.answer
+            if self.aliases:
+                data["aliases"] = list(self.aliases)
+            if self.keep_symbols:
+                data["keep_symbols"] = True
+        if self.image is not None:
+            data["image"] = self.image
+        return data
+
+    def __repr__(self):
+        return f"Question({self.id}, {self.type.label}, {self.question[:20]!r})"
@@ -0,0 +1,70 @@
+"""記述式の回答を比較するための正規化
+
+全角・半角、カタカナ・ひらがな、大文字・小文字、空白や句読点の違いを吸収した
+「正規形」に変換する。問題の正解と別解はバンクの読み込み時に一度だけ正規化して
+集合にしておき、採点は回答を正規化して集合を引くだけにする。
+"""
+import unicodedata
+
+
+class _FoldTable(dict):
+    """str.translate 用の変換表。文字ごとの変換結果を初回に求めて覚えておく"""
+    def __init__(self, keep_symbols):
+        super().__init__()
+        self.keep_symbols = keep_symbols
+
+    def __missing__(self, code):
+        category = unicodedata.category(chr(code))
+        if category[0] == "Z" or category in ("Cc", "Cf"):
+            value = None # 空白・制御文字は取り除く
+        elif category[0] == "P" and not self.keep_symbols:
+            value = None # 句読点・括弧なども取り除く
+        elif 0x30A1 <= code <= 0x30F6 or code in (0x30FD, 0x30FE):
+            value = code - 0x60 # カタカナ (ァ〜ヶ, ヽ, ヾ) をひらがなに揃える
+        else:
+            value = code
+        self[code] = value
+        return value
+
+
+_FOLD = _FoldTable(keep_symbols=False)
+_FOLD_KEEP_SYMBOLS = _FoldTable(keep_symbols=True)
+
+
+def normalize_answer(text, keep_symbols=False):
+    """回答を比較用の正規形に変換する
+
+    keep_symbols が True の場合は句読点・記号を残す (コードを答える問題など)。
+    """
+    # NFKC で全角英数字・半角カナなどの幅の違いを揃え、大文字小文字を畳み込む
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return text.translate(_FOLD_KEEP_SYMBOLS if keep_symbols else _FOLD)
+
+
+def build_answer_keys(answers, keep_symbols=False):
+    """正解と別解を正規化した集合を作る"""
+    return frozenset(normalize_answer(answer, keep_symbols) for answer in answers)
+
+
+def within_distance(a, b, max_distance):
+    """a と b の編集距離が max_distance 以下かどうか
+
+    閾値を超えることが確定した時点で計算を打ち切る。
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    previous = list(range(len(a) + 1))
+    for i, cb in enumerate(b, 1):
+        current = [i]
+        row_min = i
+        for j, ca in enumerate(a, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            current.append(cost)
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return False
+        previous = current
+    return previous[-1] <= max_distance
@@ -0,0 +1,132 @@
+"""間隔反復 (SM-2) による出題順のスケジューラ
+
+問題ごとに次回の出題期限と易しさ (ease) を持ち、期限の近い問題から出題する。
+出題候補は期限順のヒープで管理するため、次の問題の選択は O(log n) で済む。
+カードは問題本体ではなくバンクのレコードのオフセットを持ち、出題するときに1問だけデコードする。
+QuizSession の出題元 (lookahead=0) とリスナーとして組み合わせて使う。
+"""
+import heapq
+import itertools
+import json
+import os
+import time
+
+DAY = 24 * 60 * 60
+RELEARN_DELAY = 60    # 間違えた問題を再出題するまでの秒数
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+
+
+class Card:
+    """1問ぶんの学習状態"""
+    __slots__ = ("offset", "due", "ease", "interval", "repetitions", "version")
+
+    def __init__(self, offset, due=0.0, ease=INITIAL_EASE, interval=0.0, repetitions=0):
+        self.offset = offset        # 区間でのレコードのオフセット
+        self.due = due
+        self.ease = ease
+        self.interval = interval    # 前回の出題間隔 (日)
+        self.repetitions = repetitions
+        self.version = 0            # ヒープ上の古いエントリを見分けるための番号
+
+    def review(self, quality, now):
+        """SM-2 に従って回答の出来 (0〜5) から次回の期限を決める"""
+        if quality < 3:
+            self.repetitions = 0
+            self.interval = 0.0
+            self.due = now + RELEARN_DELAY
+        else:
+            if self.repetitions == 0:
+                self.interval = 1.0
+            elif self.repetitions == 1:
+                self.interval = 6.0
+            else:
+                self.interval *= self.ease
+            self.repetitions += 1
+            self.due = now + self.interval * DAY
+        self.ease = max(MIN_EASE, self.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+
+class SpacedRepetitionScheduler:
+    """期限の来た問題を期限順に出題するスケジューラ
+
+    走査すると、期限を過ぎた問題がなくなるまで1問ずつ返す。
+    未出題の問題は期限 0 として元の並び順で出題される。
+    section は BankSection (iter_records と question_at を持つ出題元)。
+    """
+    def __init__(self, section, state=None, clock=time.time):
+        self.section = section
+        self.clock = clock
+        self._cards = {}
+        self._heap = []
+        self._counter = itertools.count()
+        state = state or {}
+        # 問題IDとオフセットだけを覚え、デコードした問題はすぐに捨てる
+        for offset, quiz in section.iter_records():
+            saved = state.get(quiz.id)
+            card = Card(offset, *saved) if saved else Card(offset)
+            self._cards[quiz.id] = card
+            self._heap.append((card.due, next(self._counter), card.version, quiz.id))
+        heapq.heapify(self._heap)
+
+    def __iter__(self):
+        while True:
+            card = self._peek()
+            if card is None or card.due > self.clock():
+                return
+            yield self.section.question_at(card.offset)
+
+    def _peek(self):
+        # 再スケジュール済みの古いエントリを捨てながら、期限の最も近いカードを返す
+        heap = self._heap
+        while heap:
+            _, _, version, question_id = heap[0]
+            card = self._cards[question_id]
+            if card.version == version:
+                return card
+            heapq.heappop(heap)
+        return None
+
+    def next_due(self):
+        """次に期限を迎える時刻 (問題がなければ None)"""
+        card = self._peek()
+        return card.due if card else None
+
+    def record(self, quiz, is_correct):
+        """回答結果を反映し、その問題を再スケジュールする"""
+        card = self._cards[quiz.id]
+        card.review(4 if is_correct else 1, self.clock())
+        card.version += 1
+        heapq.heappush(self._heap, (card.due, next(self._counter), card.version, quiz.id))
+
+    def on_answer(self, session, quiz, result):
+        """QuizSession のリスナーとして回答結果を受け取る"""
+        self.record(quiz, result["is_correct"])
+
+    def state(self):
+        """保存用の学習状態 {問題ID: [期限, ease, 間隔, 連続正解数]}"""
+        return {
+            question_id: [card.due, card.ease, card.interval, card.repetitions]
+            for question_id, card in self._cards.items()
+            if card.repetitions or card.due
+        }
+
+
+def load_state(path):
+    """保存済みの学習状態を読み込む (なければ空)"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(path, state):
+    """学習状態を保存する (既存の他の問題の状態は残す)"""
+    merged = load_state(path)
+    merged.update(state)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(merged, f)
+    os.replace(tmp_path, path)
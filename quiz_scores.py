@@ -0,0 +1,203 @@
+"""クイズの成績の保存とランキング (SQLite、WAL モード)
+
+終わったクイズの成績 (回答数・正解数・回答時間) をキューに積み、書き込みスレッドが
+そのときキューにあるものをまとめて1つのトランザクションで書き込む。書き込みと同じトランザクションで、
+(ジャンル, 難易度, 出題モード) ごとの集計 (プレイ回数・正解数の合計・自己ベスト) を
+差分で更新するので、集計のために成績を読み直すことはない。
+
+ランキングは (区分, 正解数の降順, 回答時間の昇順) の索引を先頭から読むだけなので、
+成績が何百万件あっても上位 N 件はすぐに取り出せる。
+WAL モードなので、書き込み中でも画面のスレッドから読める。
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS boards (
+    id INTEGER PRIMARY KEY,
+    genre TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    plays INTEGER NOT NULL DEFAULT 0,
+    answered_total INTEGER NOT NULL DEFAULT 0,
+    correct_total INTEGER NOT NULL DEFAULT 0,
+    best_session INTEGER,
+    best_correct INTEGER,
+    best_total_ms INTEGER,
+    UNIQUE (genre, difficulty, mode)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    board INTEGER NOT NULL REFERENCES boards (id),
+    finished_at REAL NOT NULL,
+    answered INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    total_ms INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_rank ON sessions (board, correct DESC, total_ms, id);
+"""
+
+# 1回分の成績 (is_best は記録した時点で自己ベストを更新したかどうか)
+Score = namedtuple("Score", "id genre difficulty mode finished_at answered correct total_ms is_best")
+# 区分ごとの集計
+BoardStats = namedtuple("BoardStats", "plays answered_total correct_total best_correct best_total_ms")
+
+CLOSE_TIMEOUT = 10.0   # close が書き込みスレッドを待つ秒数
+
+_CLOSE = object()
+
+logger = logging.getLogger(__name__)
+
+
+def _connect(path):
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode=WAL")
+    # WAL ではコミットのたびに fsync しなくても、電源断で失うのは最後のトランザクションだけ
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def _is_better(correct, total_ms, best_correct, best_total_ms):
+    if best_correct is None:
+        return True
+    return correct > best_correct or (correct == best_correct and total_ms < best_total_ms)
+
+
+class ScoreStore:
+    """成績の保存先
+
+    record() は成績をキューに積み、書き込み後に Score が入る Future を返す。
+    読み出し (leaderboard, stats) は呼び出したスレッドの接続で行う。
+    """
+    def __init__(self, path, batch_size=256):
+        self.path = path
+        self.batch_size = batch_size
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._reader = _connect(path)
+        self._reader.executescript(SCHEMA)
+        self._queue = queue.SimpleQueue()
+        self._writing = ()   # 書き込み中のバッチ
+        self._thread = threading.Thread(target=self._run, name="ScoreStore", daemon=True)
+        self._thread.start()
+
+    def record(self, genre, difficulty, mode, answered, correct, total_ms, finished_at=None):
+        """成績を書き込みキューに積む"""
+        future = Future()
+        self._queue.put((future, genre, difficulty, mode,
+                         time.time() if finished_at is None else finished_at, answered, correct, int(total_ms)))
+        return future
+
+    def leaderboard(self, genre, difficulty, mode, limit=10):
+        """区分の上位 limit 件の成績 (正解数の多い順、同じなら回答時間の短い順)"""
+        rows = self._reader.execute(
+            "SELECT s.id, s.finished_at, s.answered, s.correct, s.total_ms FROM sessions s"
+            " JOIN boards b ON s.board = b.id"
+            " WHERE b.genre = ? AND b.difficulty = ? AND b.mode = ?"
+            " ORDER BY s.correct DESC, s.total_ms, s.id LIMIT ?",
+            (genre, difficulty, mode, limit))
+        return [Score(session_id, genre, difficulty, mode, finished_at, answered, correct, total_ms,
+                      False) for session_id, finished_at, answered, correct, total_ms in rows]
+
+    def stats(self, genre, difficulty, mode):
+        """区分の集計 (まだ記録がなければ None)"""
+        row = self._reader.execute(
+            "SELECT plays, answered_total, correct_total, best_correct, best_total_ms FROM boards"
+            " WHERE genre = ? AND difficulty = ? AND mode = ?", (genre, difficulty, mode)).fetchone()
+        return BoardStats(*row) if row else None
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        """残りの成績を書き込んで書き込みスレッドを止める
+
+        ファイルがロックされているなどで timeout 秒以内に終わらなければ待つのをやめ、
+        まだ書き込んでいない成績は捨てて記録に残す (ウィンドウを閉じる処理を止めない)。
+        """
+        if self._thread.is_alive():
+            self._queue.put((_CLOSE,))
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                writing = len(self._writing)
+                dropped = 0
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item[0] is not _CLOSE:
+                        item[0].cancel()
+                        dropped += 1
+                logger.warning("%s: 書き込みが %s 秒で終わらないため、キューの成績 %d 件を捨てました"
+                               " (書き込み中の %d 件は保存されない可能性があります)",
+                               self.path, timeout, dropped, writing)
+        self._reader.close()
+
+    def _run(self):
+        connection = _connect(self.path)
+        boards = {}   # (ジャンル, 難易度, モード) -> 区分の id
+        try:
+            while True:
+                item = self._queue.get()
+                if item[0] is _CLOSE:
+                    return
+                # 書き込みを待つ間に積まれた成績は、まとめて1つのトランザクションで書く
+                # (1件だけならすぐに書くので、記録を待つ画面を遅らせない)
+                batch = [item]
+                closing = False
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item[0] is _CLOSE:
+                        closing = True
+                        break
+                    batch.append(item)
+                self._writing = batch
+                self._write(connection, boards, batch)
+                self._writing = ()
+                if closing:
+                    return
+        finally:
+            connection.close()
+
+    def _write(self, connection, boards, batch):
+        results = []
+        try:
+            with connection:
+                for future, genre, difficulty, mode, finished_at, answered, correct, total_ms in batch:
+                    board = boards.get((genre, difficulty, mode))
+                    if board is None:
+                        connection.execute("INSERT OR IGNORE INTO boards (genre, difficulty, mode) VALUES (?, ?, ?)",
+                                           (genre, difficulty, mode))
+                        (board,) = connection.execute(
+                            "SELECT id FROM boards WHERE genre = ? AND difficulty = ? AND mode = ?",
+                            (genre, difficulty, mode)).fetchone()
+                        boards[(genre, difficulty, mode)] = board
+                    session_id = connection.execute(
+                        "INSERT INTO sessions (board, finished_at, answered, correct, total_ms) VALUES (?, ?, ?, ?, ?)",
+                        (board, finished_at, answered, correct, total_ms)).lastrowid
+                    # 集計は差分で更新する (他のプロセスが同じファイルに書いても、今の値を読んでから比べる)
+                    best_correct, best_total_ms = connection.execute(
+                        "SELECT best_correct, best_total_ms FROM boards WHERE id = ?", (board,)).fetchone()
+                    is_best = _is_better(correct, total_ms, best_correct, best_total_ms)
+                    connection.execute(
+                        "UPDATE boards SET plays = plays + 1, answered_total = answered_total + ?,"
+                        " correct_total = correct_total + ? WHERE id = ?", (answered, correct, board))
+                    if is_best:
+                        connection.execute(
+                            "UPDATE boards SET best_session = ?, best_correct = ?, best_total_ms = ? WHERE id = ?",
+                            (session_id, correct, total_ms, board))
+                    results.append((future, Score(session_id, genre, difficulty, mode, finished_at,
+                                                  answered, correct, total_ms, is_best)))
+        except sqlite3.Error as e:
+            boards.clear() # 取り消された区分の id を使わないようにする
+            for future, *_ in batch:
+                future.set_exception(e)
+            return
+        for future, score in results:
+            future.set_result(score)
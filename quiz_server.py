@@ -0,0 +1,365 @@
+"""複数人で同時に遊べる asyncio ベースのクイズサーバ
+
+1台のマシンで教室全員ぶんのセッションを受け持つ。HTTP でブラウザ用の
+ページと問題一覧を返し、WebSocket の接続ごとに QuizSession を1つ作って
+QuizFrame / ResultFrame と同じ流れ (出題 → 回答 → 結果 → 次へ) で進める。
+問題はバンクから区間ごとに一度だけデコードし、全セッションで読み取り専用で共有する。
+
+    python quiz_server.py --port 8765
+
+WebSocket (/ws) でやり取りするメッセージ (JSON):
+    → {"op": "start", "genre": ..., "difficulty": ..., "mode": "normal" | "endless"}
+    ← {"op": "question", "index": n, "type": ..., "question": ..., "choices": [...]}
+    → {"op": "answer", "choice": i}  または  {"op": "answer", "text": "..."}
+    ← {"op": "result", "is_correct": ..., "player_answer": ..., "correct_answer": ..., "grade_us": ...}
+    → {"op": "next"}
+    ← {"op": "question", ...}  または  {"op": "final", "answered": n, "wrong": k}
+回答は1問につき1回だけ受け付け、回答する前の next は受け付けない (どちらも error を返す)。
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+import time
+
+from quiz_bank import find_sources, open_bank
+from quiz_model import QuestionType
+from quiz_session import QuizSession, endless
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+QUIZ_SOURCE_DIR = os.path.join(BASE_DIR, "quizzes", "kanzi")
+QUIZ_BANK_PATH = os.path.join(BASE_DIR, "quizzes", "kanzi.bank")
+FILL_IN_TYPO_TOLERANCE = 1
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+MAX_MESSAGE_BYTES = 64 * 1024
+# 切断するときに close フレームで送る理由のコード
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_INVALID_DATA = 1007
+CLOSE_TOO_BIG = 1009
+
+
+class ProtocolError(Exception):
+    """クライアントから不正なリクエスト・フレームを受け取った (close_code は切断の理由のコード)"""
+    def __init__(self, message, close_code=CLOSE_PROTOCOL_ERROR):
+        super().__init__(message)
+        self.close_code = close_code
+
+
+# --- WebSocket のフレーム処理 (サーバとロードテスト用クライアントで共用) ---
+
+def encode_frame(opcode, payload, mask=False):
+    """1フレームぶんのバイト列を作る (クライアントから送る場合は mask=True)"""
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", length)
+    if mask:
+        key = os.urandom(4)
+        header += key
+        payload = _apply_mask(payload, key)
+    return bytes(header) + payload
+
+
+def _apply_mask(payload, key):
+    # 4バイトのキーを繰り返して XOR する (int にまとめて一度に計算する)
+    repeated = (key * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")).to_bytes(len(payload), "big")
+
+
+async def read_frame(reader):
+    """1フレーム読んで (fin, opcode, payload) を返す"""
+    first, second = await reader.readexactly(2)
+    fin = bool(first & 0x80)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", await reader.readexactly(8))
+    if length > MAX_MESSAGE_BYTES:
+        raise ProtocolError("フレームが大きすぎます", CLOSE_TOO_BIG)
+    key = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if key:
+        payload = _apply_mask(payload, key)
+    return fin, opcode, payload
+
+
+async def read_message(reader, writer):
+    """テキストメッセージを1つ読む。ping には応答し、切断時は None を返す"""
+    parts = []
+    while True:
+        fin, opcode, payload = await read_frame(reader)
+        if opcode == OP_CLOSE:
+            return None
+        if opcode == OP_PING:
+            writer.write(encode_frame(OP_PONG, payload))
+            continue
+        if opcode == OP_PONG:
+            continue
+        parts.append(payload)
+        if sum(len(part) for part in parts) > MAX_MESSAGE_BYTES:
+            raise ProtocolError("メッセージが大きすぎます", CLOSE_TOO_BIG)
+        if fin:
+            try:
+                return b"".join(parts).decode("utf-8")
+            except UnicodeDecodeError as e:
+                raise ProtocolError("UTF-8 ではないテキストです", CLOSE_INVALID_DATA) from e
+
+
+def websocket_accept(key):
+    """Sec-WebSocket-Key から Sec-WebSocket-Accept を計算する"""
+    digest = hashlib.sha1((key + WS_GUID).encode("ascii")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+# --- サーバ本体 ---
+
+def parse_answer(quiz, message):
+    """answer メッセージを問題の形式に合わせて検証し、(選択肢番号, 記述の回答) を返す
+
+    使わない方は None。不正な回答は ValueError にする (問題の状態は変えない)。
+    """
+    if quiz.type is QuestionType.CHOICE:
+        choice = message.get("choice")
+        if isinstance(choice, bool) or not isinstance(choice, (int, str)):
+            raise ValueError("選択式の問題には choice (選択肢の番号) を送ってください")
+        try:
+            index = int(choice)
+        except ValueError:
+            raise ValueError(f"choice は整数にしてください: {choice!r}") from None
+        if not 0 <= index < len(quiz.choices):
+            raise ValueError(f"choice が範囲外です: {index}")
+        return index, None
+    text = message.get("text")
+    if not isinstance(text, str):
+        raise ValueError("記述式の問題には text (文字列) を送ってください")
+    return None, text
+
+
+class ClientState:
+    """1つの WebSocket 接続の進行状況"""
+    __slots__ = ("session", "awaiting_answer")
+
+    def __init__(self):
+        self.session = None
+        self.awaiting_answer = False   # 問題を送って、まだ回答を受け取っていない
+
+class QuizServer:
+    """HTTP と WebSocket でクイズを配信するサーバ"""
+    def __init__(self, bank):
+        self.bank = bank
+        self._sections = {}   # (ジャンル, 難易度) -> 問題のタプル (全セッションで共有)
+        self.active_sessions = 0
+
+    def questions(self, genre, difficulty):
+        """区間の問題を返す (初回だけデコードする)"""
+        key = (genre, difficulty)
+        questions = self._sections.get(key)
+        if questions is None:
+            questions = self._sections[key] = tuple(self.bank.iter_section(genre, difficulty))
+        return questions
+
+    async def handle(self, reader, writer):
+        """1つの接続を処理する"""
+        try:
+            request_line = (await reader.readline()).decode("latin-1").strip()
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            method, path, _ = (request_line.split(" ") + ["", "", ""])[:3]
+
+            if method == "GET" and path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                if "sec-websocket-key" in headers:
+                    await self._serve_websocket(reader, writer, headers)
+                else:
+                    self._respond(writer, 400, "text/plain; charset=utf-8", b"missing Sec-WebSocket-Key")
+            elif method == "GET" and path == "/":
+                self._respond(writer, 200, "text/html; charset=utf-8", INDEX_HTML.encode("utf-8"))
+            elif method == "GET" and path == "/api/genres":
+                catalog = {genre: self.bank.difficulties(genre) for genre in self.bank.genres()}
+                self._respond(writer, 200, "application/json", json.dumps(catalog, ensure_ascii=False).encode("utf-8"))
+            else:
+                self._respond(writer, 404, "text/plain; charset=utf-8", b"not found")
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, writer, status, content_type, body):
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}[status]
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body)
+
+    async def _serve_websocket(self, reader, writer, headers):
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {websocket_accept(headers['sec-websocket-key'])}\r\n\r\n")
+                     .encode("latin-1"))
+        self.active_sessions += 1
+        client = ClientState()
+        close_payload = b""
+        try:
+            while True:
+                try:
+                    text = await read_message(reader, writer)
+                except ProtocolError as e:
+                    # 不正なフレームには理由のコードを付けた close フレームを返して切断する
+                    close_payload = struct.pack("!H", e.close_code)
+                    break
+                if text is None:
+                    break
+                try:
+                    message = json.loads(text)
+                    reply = self._dispatch(client, message)
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    reply = {"op": "error", "message": f"不正なリクエストです ({e!r})"}
+                self._send(writer, reply)
+                await writer.drain()
+            writer.write(encode_frame(OP_CLOSE, close_payload))
+        finally:
+            self.active_sessions -= 1
+
+    def _dispatch(self, client, message):
+        """1つのメッセージを処理して返信を返す (client は接続の ClientState)"""
+        op = message["op"]
+        if op == "start":
+            questions = self.questions(message["genre"], message["difficulty"])
+            if message.get("mode") == "endless":
+                client.session = QuizSession(lambda: endless(questions), max_typos=FILL_IN_TYPO_TOLERANCE,
+                                             history_size=0)
+            else:
+                client.session = QuizSession(questions, max_typos=FILL_IN_TYPO_TOLERANCE, history_size=0)
+            return self._question_message(client)
+        session = client.session
+        if session is None:
+            return {"op": "error", "message": "start を先に送ってください"}
+        if op == "answer":
+            if session.is_finished():
+                return {"op": "error", "message": "問題は終了しています"}
+            if not client.awaiting_answer:
+                return {"op": "error", "message": "この問題には回答済みです (next で次の問題へ)"}
+            try:
+                choice, text = parse_answer(session.current, message)
+            except ValueError as e:
+                # 回答し直せるよう、問題は回答待ちのままにする
+                return {"op": "error", "message": f"不正な回答です ({e})"}
+            start = time.perf_counter_ns()
+            if choice is not None:
+                result = session.answer_choice(choice)
+            else:
+                result = session.answer_text(text)
+            grade_us = (time.perf_counter_ns() - start) / 1000
+            client.awaiting_answer = False
+            return {
+                "op": "result",
+                "is_correct": result["is_correct"],
+                "player_answer": result["player_answer"],
+                "correct_answer": result["correct_answer"],
+                "grade_us": grade_us,
+            }
+        if op == "next":
+            if client.awaiting_answer:
+                return {"op": "error", "message": "先に回答してください"}
+            session.advance()
+            return self._question_message(client)
+        return {"op": "error", "message": f"不明な op です: {op}"}
+
+    def _question_message(self, client):
+        session = client.session
+        if session.is_finished():
+            client.awaiting_answer = False
+            return {"op": "final", "answered": session.answered_count, "wrong": session.wrong_count}
+        client.awaiting_answer = True
+        quiz = session.current
+        session.mark_shown()
+        message = {"op": "question", "index": session.index, "type": quiz.type.label, "question": quiz.question}
+        if quiz.type is QuestionType.CHOICE:
+            message["choices"] = quiz.choices
+        return message
+
+    def _send(self, writer, message):
+        writer.write(encode_frame(OP_TEXT, json.dumps(message, ensure_ascii=False).encode("utf-8")))
+
+
+async def start_server(host="127.0.0.1", port=8765, bank=None):
+    """サーバを起動して (asyncio.Server, QuizServer) を返す"""
+    if bank is None:
+        bank = open_bank(QUIZ_BANK_PATH, find_sources(QUIZ_SOURCE_DIR))
+    quiz_server = QuizServer(bank)
+    server = await asyncio.start_server(quiz_server.handle, host, port, limit=MAX_MESSAGE_BYTES, backlog=1024)
+    return server, quiz_server
+
+
+INDEX_HTML = """<!DOCTYPE html>
+<html lang="ja"><head><meta charset="utf-8"><title>クイズ</title></head>
+<body style="font-family: sans-serif; max-width: 40em; margin: 2em auto">
+<h1>クイズ</h1>
+<div id="select"></div>
+<p id="question"></p><div id="answers"></div><p id="result"></p>
+<script>
+const $ = (id) => document.getElementById(id);
+const ws = new WebSocket(`ws://${location.host}/ws`);
+const send = (msg) => ws.send(JSON.stringify(msg));
+const button = (label, onclick) => { const b = document.createElement("button"); b.textContent = label; b.onclick = onclick; return b; };
+fetch("/api/genres").then((r) => r.json()).then((catalog) => {
+  for (const [genre, difficulties] of Object.entries(catalog))
+    for (const difficulty of difficulties)
+      $("select").append(button(`${genre} / ${difficulty}`, () => send({op: "start", genre, difficulty})));
+});
+ws.onmessage = (event) => {
+  const msg = JSON.parse(event.data);
+  $("answers").replaceChildren(); $("result").textContent = "";
+  if (msg.op === "question") {
+    $("question").textContent = msg.question;
+    if (msg.type === "choice") msg.choices.forEach((c, i) => $("answers").append(button(c, () => send({op: "answer", choice: i}))));
+    else { const input = document.createElement("input"); $("answers").append(input, button("決定", () => send({op: "answer", text: input.value}))); }
+  } else if (msg.op === "result") {
+    $("result").textContent = msg.is_correct ? "正解！" : `ざんねん… せいかいは: ${msg.correct_answer}`;
+    $("answers").append(button("次へ", () => send({op: "next"})));
+  } else if (msg.op === "final") {
+    $("question").textContent = `クイズ終了！ 全${msg.answered}問中、不正解は ${msg.wrong} 問でした。`;
+  } else {
+    $("result").textContent = msg.message;
+  }
+};
+</script></body></html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数人用クイズサーバ")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    async def serve():
+        server, _ = await start_server(args.host, args.port)
+        print(f"http://{args.host}:{args.port}/ で待ち受けています")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""クイズの進行と採点を行うエンジン (Tkinter に依存しない)
+
+kanzi.py / kanzi2.py の画面はこのクラスを操作して問題を表示し、回答を渡す。
+問題は出題元 (リスト、バンクの区間、ジェネレータ関数など) から1問ずつ取り出すため、
+問題数がいくら多くてもメモリ使用量は先読みバッファの分しか増えない。
+"""
+import random
+import time
+from collections import deque
+
+from quiz_normalize import normalize_answer, within_distance
+
+
+def grade_choice(quiz, choice_index):
+    """選択式の回答を採点する"""
+    return choice_index == quiz.correct_choice_index
+
+
+def grade_fill_in(quiz, player_answer, max_typos=0):
+    """記述式の回答を採点する
+
+    正規化した回答が正解集合にあれば正解。max_typos を指定した場合は、
+    編集距離がその範囲に収まる回答も正解とする。ただし keep_symbols の問題 (コードなど) は
+    1文字の違いで意味が変わるため、打ち間違いは許容しない。
+    """
+    keys = quiz.answer_keys
+    key = normalize_answer(player_answer, quiz.keep_symbols)
+    if key in keys:
+        return True
+    if max_typos and key and not quiz.keep_symbols:
+        for canonical in keys:
+            # 短い答えは1文字違いでも別の語になりやすいため、4文字につき1文字までに抑える
+            allowed = min(max_typos, len(canonical) // 4)
+            if allowed and within_distance(key, canonical, allowed):
+                return True
+    return False
+
+
+TIMEOUT_ANSWER = "(時間切れ)"
+HISTORY_SIZE = 200   # 最終結果に残す、直近の回答の数
+
+
+# --- 出題元 ---
+
+def shuffled(questions, buffer_size=32, rng=random):
+    """一定サイズのバッファ内で順番を入れ替えながら問題を返す"""
+    buffer = []
+    for quiz in questions:
+        if len(buffer) < buffer_size:
+            buffer.append(quiz)
+            continue
+        i = rng.randrange(buffer_size)
+        yield buffer[i]
+        buffer[i] = quiz
+    rng.shuffle(buffer)
+    yield from buffer
+
+
+def endless(questions, buffer_size=32, rng=random):
+    """問題を順番を入れ替えながら際限なく繰り返す (questions は繰り返し走査できること)"""
+    while True:
+        empty = True
+        for quiz in shuffled(questions, buffer_size, rng):
+            empty = False
+            yield quiz
+        if empty:
+            return
+
+
+class QuizSession:
+    """1回分のクイズの出題順・採点・成績を管理するクラス
+
+    source には繰り返し走査できるもの (リスト、バンクの区間) か、
+    呼ぶたびに新しいイテレータを返す関数を渡す。
+    採点のたびに listeners の各関数が listener(セッション, 問題, 結果) の形で呼ばれる。
+    回答結果によって次の問題が変わる出題元 (スケジューラなど) では lookahead=0 にする。
+
+    回答時間は問題を表示した時刻 (mark_shown) から perf_counter_ns で測る。
+    question_time_limit (1問あたり) と total_time_limit (回答時間の合計) を秒で指定すると、
+    期限を過ぎてからの回答は時間切れとして採点する。
+
+    history には直近 history_size 問ぶんの (問題, 結果) だけを残すので、エンドレスでも
+    メモリ使用量は増え続けない (回答数と回答時間の合計は全問ぶん数える)。
+    """
+    def __init__(self, source, lookahead=2, max_typos=0, listeners=(),
+                 question_time_limit=None, total_time_limit=None, history_size=HISTORY_SIZE):
+        self.source = source
+        self.lookahead = lookahead
+        self.max_typos = max_typos
+        self.listeners = list(listeners)
+        self.question_time_limit = question_time_limit
+        self.total_time_limit = total_time_limit
+        self.history_size = history_size
+        self.restart()
+
+    def restart(self):
+        """最初の問題から解き直す"""
+        self._questions = iter(self.source() if callable(self.source) else self.source)
+        self._buffer = deque()
+        self.session_id = random.getrandbits(63) # ログで同じ回の回答をまとめるためのID
+        self.index = 0
+        self.wrong_count = 0
+        self.answered_count = 0
+        self.used_ns = 0      # 回答時間の合計
+        self.history = deque(maxlen=self.history_size)   # 直近の回答の (問題, 結果) を回答した順に
+        self.current = self._pull()
+
+    @property
+    def total(self):
+        """出題数 (エンドレスなど事前に分からない場合は None)"""
+        try:
+            return len(self.source)
+        except TypeError:
+            return None
+
+    def peek(self):
+        """次の問題 (なければ None)"""
+        return self._buffer[0] if self._buffer else None
+
+    def upcoming(self):
+        """先読みしてある次以降の問題のタプル"""
+        return tuple(self._buffer)
+
+    def mark_shown(self):
+        """現在の問題が画面に表示された時刻を記録する (回答時間の起点)"""
+        self.shown_at = time.perf_counter_ns()
+
+    def deadline_ns(self):
+        """現在の問題の回答期限 (perf_counter_ns の値。制限時間がなければ None)"""
+        limits = []
+        if self.question_time_limit is not None:
+            limits.append(int(self.question_time_limit * 1e9))
+        if self.total_time_limit is not None:
+            limits.append(int(self.total_time_limit * 1e9) - self.used_ns)
+        return self.shown_at + min(limits) if limits else None
+
+    def time_over(self):
+        """回答時間の合計が制限時間に達したかどうか"""
+        return self.total_time_limit is not None and self.used_ns >= self.total_time_limit * 1e9
+
+    def answer_timeout(self):
+        """現在の問題を時間切れ (不正解) として記録し、結果を返す"""
+        quiz = self.current
+        return self._record(quiz, False, TIMEOUT_ANSWER, quiz.correct_answer, timed_out=True)
+
+    def is_finished(self):
+        """全問出題し終えたかどうか"""
+        return self.current is None
+
+    def answer_choice(self, choice_index):
+        """選択式の回答を採点し、結果を返す"""
+        if self._expired():
+            return self.answer_timeout()
+        quiz = self.current
+        is_correct = grade_choice(quiz, choice_index)
+        return self._record(quiz, is_correct, quiz.choice(choice_index),
+                            quiz.choice(quiz.correct_choice_index), choice_index)
+
+    def answer_text(self, player_answer):
+        """記述式の回答を採点し、結果を返す"""
+        if self._expired():
+            return self.answer_timeout()
+        quiz = self.current
+        is_correct = grade_fill_in(quiz, player_answer, self.max_typos)
+        return self._record(quiz, is_correct, player_answer, quiz.answer)
+
+    def advance(self):
+        """次の問題に進む。まだ問題が残っていれば True を返す"""
+        if self.current is None:
+            return False
+        self.index += 1
+        self.current = self._pull()
+        return self.current is not None
+
+    def _pull(self):
+        # 先読みバッファから1問取り出し、バッファを lookahead 問まで補充する
+        quiz = self._buffer.popleft() if self._buffer else next(self._questions, None)
+        self.shown_at = time.perf_counter_ns()
+        while len(self._buffer) < self.lookahead:
+            upcoming = next(self._questions, None)
+            if upcoming is None:
+                break
+            self._buffer.append(upcoming)
+        return quiz
+
+    def _expired(self):
+        deadline = self.deadline_ns()
+        return deadline is not None and time.perf_counter_ns() >= deadline
+
+    def _record(self, quiz, is_correct, player_answer, correct_answer, choice_index=None, timed_out=False):
+        elapsed_ns = time.perf_counter_ns() - self.shown_at
+        self.used_ns += elapsed_ns
+        self.answered_count += 1
+        if not is_correct:
+            self.wrong_count += 1
+        result = {
+            "is_correct": is_correct,
+            "player_answer": player_answer,
+            "correct_answer": correct_answer,
+            "choice_index": choice_index,
+            "response_time": elapsed_ns / 1e9,
+            "timed_out": timed_out,
+        }
+        self.history.append((quiz, result))
+        for listener in self.listeners:
+            listener(self, quiz, result)
+        return result
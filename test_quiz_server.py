@@ -0,0 +1,60 @@
+"""quiz_server の answer / next の処理のテスト (python -m unittest または pytest で実行する)"""
+import unittest
+
+from quiz_model import Question, QuestionType
+from quiz_server import ClientState, QuizServer
+
+GENRE, DIFFICULTY = "ジャンル", "初級"
+
+
+def make_server():
+    server = QuizServer(None)
+    server._sections[(GENRE, DIFFICULTY)] = (
+        Question(1, QuestionType.CHOICE, "選択式", choices=["1. はい", "2. いいえ"], correct_choice_index=0),
+        Question(2, QuestionType.FILL_IN, "記述式", answer="こたえ"),
+    )
+    return server
+
+
+class AnswerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = make_server()
+        self.client = ClientState()
+        reply = self.server._dispatch(self.client, {"op": "start", "genre": GENRE, "difficulty": DIFFICULTY})
+        self.assertEqual(reply["op"], "question")
+
+    def dispatch(self, **message):
+        return self.server._dispatch(self.client, message)
+
+    def assert_rejected_then_answerable(self, **message):
+        answered = self.client.session.answered_count
+        self.assertEqual(self.dispatch(op="answer", **message)["op"], "error")
+        self.assertTrue(self.client.awaiting_answer)
+        self.assertEqual(self.dispatch(op="next")["op"], "error")
+        self.assertEqual(self.client.session.answered_count, answered)
+
+    def test_malformed_choice_answers_keep_the_question_open(self):
+        for message in ({"choice": 2}, {"choice": -1}, {"choice": "a"}, {"choice": None}, {"choice": True},
+                        {"text": "はい"}, {}):
+            with self.subTest(message=message):
+                self.assert_rejected_then_answerable(**message)
+        self.assertEqual(self.dispatch(op="answer", choice=0)["is_correct"], True)
+        self.assertEqual(self.client.session.answered_count, 1)
+
+    def test_malformed_text_answers_keep_the_question_open(self):
+        self.dispatch(op="answer", choice=1)
+        self.assertEqual(self.dispatch(op="next")["op"], "question")
+        for message in ({"choice": 0}, {}, {"text": 3}):
+            with self.subTest(message=message):
+                self.assert_rejected_then_answerable(**message)
+        self.assertTrue(self.dispatch(op="answer", text="こたえ")["is_correct"])
+        self.assertEqual(self.dispatch(op="next"), {"op": "final", "answered": 2, "wrong": 1})
+
+    def test_second_answer_is_rejected(self):
+        self.dispatch(op="answer", choice=0)
+        self.assertEqual(self.dispatch(op="answer", choice=1)["op"], "error")
+        self.assertEqual(self.client.session.answered_count, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+"""quiz_session の採点のテスト (python -m unittest または pytest で実行する)"""
+import unittest
+
+from quiz_model import Question, QuestionType
+from quiz_session import grade_fill_in
+
+
+def fill_in(answer, keep_symbols=False, aliases=()):
+    return Question(1, QuestionType.FILL_IN, "問題", answer=answer, aliases=aliases, keep_symbols=keep_symbols)
+
+
+class GradeFillInTest(unittest.TestCase):
+    def test_typo_within_tolerance_is_accepted(self):
+        quiz = fill_in("コンパイラ")
+        self.assertTrue(grade_fill_in(quiz, "コンパイア", max_typos=1))
+        self.assertFalse(grade_fill_in(quiz, "コンパイア"))
+
+    def test_short_answer_requires_exact_match(self):
+        self.assertFalse(grade_fill_in(fill_in("int"), "ind", max_typos=1))
+
+    def test_code_answer_rejects_one_character_change(self):
+        quiz = fill_in("[x**2 for x in numbers]", keep_symbols=True)
+        self.assertTrue(grade_fill_in(quiz, "[x**2 for x in numbers]", max_typos=1))
+        for wrong in ("[x**3 for x in numbers]", "[x*2 for x in numbers]", "[x**2 for x in number]"):
+            with self.subTest(wrong=wrong):
+                self.assertFalse(grade_fill_in(quiz, wrong, max_typos=1))
+
+
+if __name__ == "__main__":
+    unittest.main()